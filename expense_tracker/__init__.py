@@ -0,0 +1,7 @@
+# Personal Expense Tracker. The data layer, importers and analytics load without
+# Tk or matplotlib; the GUI lives in expense_tracker.gui and is imported on demand.
+from .analytics import ExpenseAnalytics
+from .core import DATABASE_PATH, DEFAULT_STORAGE_PROFILE, STORAGE_PROFILES, ExpenseConflict, ExpenseTracker
+from .importers import read_expense_file, read_rate_file
+from .pool import TrackerPool
+from .values import LEDGER_CURRENCY, cents_to_text, format_amount, format_day, to_cents, to_currency, to_day
@@ -0,0 +1,270 @@
+import bisect
+import functools
+import itertools
+import math
+from array import array
+from datetime import date as dt_date
+
+from .values import month_key, to_currency, to_day
+
+# NumPy is optional and slow to import, so it is looked up the first time
+# ExpenseAnalytics loads its columns. None until then, or if it is not installed.
+numpy = None
+numpy_checked = False
+
+# Number of rows fetched at a time while ExpenseAnalytics loads its columns
+ANALYTICS_FETCH_SIZE = 10000
+
+# Groupings ExpenseAnalytics understands
+ANALYTICS_GROUPS = ("category", "location", "month", "year", "weekday")
+
+def load_numpy():
+    global numpy, numpy_checked
+    if not numpy_checked:
+        try:
+            import numpy as module
+            numpy = module
+        except ImportError:
+            pass
+        numpy_checked = True
+    return numpy
+
+# Percentile of an ascending list, interpolated linearly like numpy.percentile
+def percentile_of_sorted(values, percent):
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+# Decorator for ExpenseAnalytics methods: each result is kept, per arguments, until
+# the database changes, so drawing the same chart again does not recompute it.
+# Callers share the returned object and must not modify it.
+def remembered(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **options):
+        self.load()
+        key = (method.__name__, args, tuple(sorted(options.items())))
+        try:
+            return self.results[key]
+        except KeyError:
+            result = self.results[key] = method(self, *args, **options)
+            return result
+        except TypeError:
+            # Unhashable arguments such as a list of percents
+            return method(self, *args, **options)
+    return wrapper
+
+# Column arrays of my_expenses for charts and reports. The day, cents, month,
+# category and location columns are read once into int64 arrays sorted by day,
+# with categories and locations as codes, and read again only after the database
+# has changed. Totals, rolling averages, percentiles and month-over-month deltas
+# are then computed over the arrays: with NumPy when it is installed, otherwise
+# with the array module and plain loops, and remembered until the next change.
+# Amounts are in cents of the ledger currency, or of the reporting currency given
+# as currency, converted from the whole cents column at once by the tracker's
+# RateCache.
+class ExpenseAnalytics:
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.loaded_version = None
+        self.results = {}
+        self.columns = {}
+        self.names = {}
+        self.codes = {}
+
+    # Changes made through the tracker's connection and, by data_version, any other
+    def version(self):
+        data_version = self.tracker.db.execute("PRAGMA data_version").fetchone()[0]
+        return self.tracker.db.total_changes, data_version
+
+    def load(self):
+        version = self.version()
+        if version == self.loaded_version:
+            return
+        load_numpy()
+        columns = {name: array('q') for name in ("day", "cents", "month", "category", "location")}
+        codes = {"category": {}, "location": {}}
+        # Codes and months are looked up once per distinct value in each chunk
+        lookups = {"category": {}, "location": {}, "month": {}}
+        # Reading in table order and sorting here is about twice as fast as walking the day index
+        cursor = self.tracker.db.execute("SELECT day, cents, category, location FROM %s" % self.tracker.expense_source())
+        while True:
+            rows = cursor.fetchmany(ANALYTICS_FETCH_SIZE)
+            if not rows:
+                break
+            days, cents, categories, locations = zip(*rows)
+            for day in set(days).difference(lookups["month"]):
+                date = dt_date.fromordinal(day)
+                lookups["month"][day] = date.year * 12 + date.month - 1
+            for name, values in (("category", categories), ("location", locations)):
+                for value in set(values).difference(lookups[name]):
+                    lookups[name][value] = codes[name].setdefault(value or '', len(codes[name]))
+            columns["day"].extend(days)
+            columns["cents"].extend(cents)
+            columns["month"].extend(map(lookups["month"].__getitem__, days))
+            columns["category"].extend(map(lookups["category"].__getitem__, categories))
+            columns["location"].extend(map(lookups["location"].__getitem__, locations))
+        if numpy is not None:
+            columns = {name: numpy.frombuffer(column, dtype=numpy.int64) for name, column in columns.items()}
+            order = numpy.argsort(columns["day"], kind="stable")
+            columns = {name: column[order] for name, column in columns.items()}
+        else:
+            days = columns["day"]
+            order = sorted(range(len(days)), key=days.__getitem__)
+            columns = {name: array('q', map(column.__getitem__, order)) for name, column in columns.items()}
+        self.columns = columns
+        self.results = {}
+        self.codes = codes
+        self.names = {name: list(values) for name, values in codes.items()}
+        self.loaded_version = version
+
+    # The columns of the expenses matching the filters, with cents in currency
+    def select(self, start=None, end=None, category=None, location=None, currency=None):
+        self.load()
+        days = self.columns["day"]
+        low = 0 if start is None else bisect.bisect_left(days, to_day(start))
+        high = len(days) if end is None else bisect.bisect_left(days, to_day(end))
+        columns = {name: column[low:high] for name, column in self.columns.items()}
+        keep = None
+        for name, value in (("category", category), ("location", location)):
+            if value is None:
+                continue
+            code = self.codes[name].get(value, -1)
+            if numpy is not None:
+                match = columns[name] == code
+                keep = match if keep is None else keep & match
+            else:
+                match = [item == code for item in columns[name]]
+                keep = match if keep is None else [a and b for a, b in zip(keep, match)]
+        if keep is not None:
+            if numpy is not None:
+                columns = {name: column[keep] for name, column in columns.items()}
+            else:
+                columns = {name: array('q', itertools.compress(column, keep)) for name, column in columns.items()}
+        currency = to_currency(currency)
+        if currency is not None:
+            columns["cents"] = self.tracker.rates.from_ledger(currency, columns["day"], columns["cents"])
+        return columns
+
+    # Group codes of the selected rows as 0..size-1, with a function naming a code
+    def group(self, columns, group_by):
+        if group_by not in ANALYTICS_GROUPS:
+            raise ValueError("Cannot group expenses by %s" % group_by)
+        if group_by in ("category", "location"):
+            names = self.names[group_by]
+            return columns[group_by], len(names), names.__getitem__
+        if group_by == "weekday":
+            if numpy is not None:
+                return columns["day"] % 7, 7, str
+            return array('q', (day % 7 for day in columns["day"])), 7, str
+        months = columns["month"]
+        # Rows are sorted by day, so the first and last rows hold the month range
+        low, high = (int(months[0]), int(months[-1])) if len(months) else (0, -1)
+        if group_by == "month":
+            key = lambda code: month_key(low + code)
+            if numpy is not None:
+                return months - low, high - low + 1, key
+            return array('q', (month - low for month in months)), high - low + 1, key
+        first = low // 12
+        size = high // 12 - first + 1 if len(months) else 0
+        if numpy is not None:
+            return months // 12 - first, size, lambda code: "%04d" % (first + code)
+        return array('q', (month // 12 - first for month in months)), size, lambda code: "%04d" % (first + code)
+
+    # Total and count per code, as two lists of length size. Converted amounts
+    # are fractions of a cent, so totals are rounded to whole cents.
+    def sums(self, codes, cents, size):
+        if numpy is not None:
+            totals = numpy.floor(numpy.bincount(codes, weights=cents, minlength=size) + 0.5).astype(numpy.int64)
+            counts = numpy.bincount(codes, minlength=size)
+            return totals.tolist(), counts.tolist()
+        totals = [0] * size
+        counts = [0] * size
+        for code, amount in zip(codes, cents):
+            totals[code] += amount
+            counts[code] += 1
+        return [math.floor(total + 0.5) for total in totals], counts
+
+    # (group, total, count) for every group with expenses, ordered by group
+    @remembered
+    def totals(self, group_by, start=None, end=None, category=None, location=None, currency=None):
+        columns = self.select(start, end, category, location, currency)
+        codes, size, key = self.group(columns, group_by)
+        totals, counts = self.sums(codes, columns["cents"], size)
+        return sorted((key(code), totals[code], counts[code]) for code in range(size) if counts[code])
+
+    # (month, total) for every month from the first to the last expense, empty months included
+    @remembered
+    def monthly_totals(self, start=None, end=None, category=None, location=None, currency=None):
+        columns = self.select(start, end, category, location, currency)
+        codes, size, key = self.group(columns, "month")
+        totals, _ = self.sums(codes, columns["cents"], size)
+        return [(key(code), totals[code]) for code in range(size)]
+
+    # (month, average) of the monthly totals over each window of consecutive months
+    @remembered
+    def rolling_average(self, window=3, start=None, end=None, category=None, location=None, currency=None):
+        monthly = self.monthly_totals(start, end, category, location, currency)
+        if window < 1:
+            raise ValueError("The rolling window must be at least one month.")
+        if numpy is not None:
+            running = numpy.concatenate(([0], numpy.cumsum([total for _, total in monthly])))
+            averages = ((running[window:] - running[:-window]) / window).tolist()
+        else:
+            averages = []
+            running = 0
+            for index, (_, total) in enumerate(monthly):
+                running += total
+                if index >= window:
+                    running -= monthly[index - window][1]
+                if index >= window - 1:
+                    averages.append(running / window)
+        return [(month, average) for (month, _), average in zip(monthly[window - 1:], averages)]
+
+    # (month, total, change from the previous month, relative change) for every month.
+    # The first month has no change, and the relative change is None after an empty month.
+    @remembered
+    def month_over_month(self, start=None, end=None, category=None, location=None, currency=None):
+        monthly = self.monthly_totals(start, end, category, location, currency)
+        deltas = []
+        previous = None
+        for month, total in monthly:
+            if previous is None:
+                deltas.append((month, total, None, None))
+            else:
+                deltas.append((month, total, total - previous, (total - previous) / previous if previous else None))
+            previous = total
+        return deltas
+
+    # Percentiles of the expense amounts, as a list with one value per percent, or
+    # with group_by as (group, values) pairs ordered by group
+    @remembered
+    def percentiles(self, percents=(50, 90, 99), group_by=None, start=None, end=None, category=None, location=None, currency=None):
+        columns = self.select(start, end, category, location, currency)
+        cents = columns["cents"]
+        if group_by is None:
+            if not len(cents):
+                return []
+            if numpy is not None:
+                return numpy.percentile(cents, percents).tolist()
+            values = sorted(cents)
+            return [percentile_of_sorted(values, percent) for percent in percents]
+        codes, size, key = self.group(columns, group_by)
+        groups = []
+        if numpy is not None:
+            order = numpy.lexsort((cents, codes))
+            ends = numpy.cumsum(numpy.bincount(codes, minlength=size)).tolist()
+            cents = cents[order]
+            for code in range(size):
+                begin = ends[code - 1] if code else 0
+                if ends[code] > begin:
+                    groups.append((key(code), numpy.percentile(cents[begin:ends[code]], percents).tolist()))
+        else:
+            values = [[] for _ in range(size)]
+            for code, amount in zip(codes, cents):
+                values[code].append(amount)
+            for code in range(size):
+                if values[code]:
+                    values[code].sort()
+                    groups.append((key(code), [percentile_of_sorted(values[code], percent) for percent in percents]))
+        return sorted(groups)
@@ -0,0 +1,423 @@
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from contextlib import contextmanager
+from datetime import date as dt_date
+
+from .core import DEFAULT_BUSY_TIMEOUT, DEFAULT_STORAGE_PROFILE, STORAGE_PROFILES, ExpenseConflict, ExpenseTracker
+from .pool import TrackerPool
+from .values import month_range
+
+# Modules a headless command has no use for
+GUI_MODULES = ("tkinter", "tkcalendar", "matplotlib", "numpy")
+
+STARTUP_PROBE = """
+import sys, time
+started = time.perf_counter()
+import expense_tracker.cli
+print(time.perf_counter() - started)
+print(" ".join(name for name in %r if name in sys.modules))
+""" % (GUI_MODULES,)
+
+# Ledger sizes the benchmark suite runs at by default
+BENCHMARK_SIZES = (10000, 100000, 1000000)
+
+# Words synthetic descriptions are made of, so search has something to find
+DESCRIPTION_WORDS = (
+    "lunch", "dinner", "coffee", "groceries", "fuel", "train", "taxi", "rent", "power", "water",
+    "phone", "internet", "books", "cinema", "gym", "pharmacy", "clothes", "gift", "repair", "parking",
+)
+
+# A reproducible ledger of count expenses as (line number, record) pairs for
+# ExpenseTracker.import_expenses. Dates are spread over days days from start,
+# amounts are skewed towards small values like real spending, and the same
+# seed always gives the same ledger.
+def generate_ledger(count, seed=0, categories=12, locations=8, start="2020-01-01", days=3 * 365):
+    rng = random.Random(seed)
+    first_day = dt_date.fromisoformat(start).toordinal()
+    for line_no in range(1, count + 1):
+        cents = min(int(rng.lognormvariate(7.5, 1.0)) + 1, 10000000)
+        yield line_no, {
+            "date": dt_date.fromordinal(first_day + rng.randrange(days)).isoformat(),
+            "category": "Category %d" % rng.randrange(categories),
+            "amount": "%d.%02d" % divmod(cents, 100),
+            "description": " ".join(rng.sample(DESCRIPTION_WORDS, 2)),
+            "location": "Location %d" % rng.randrange(locations),
+        }
+
+# Expenses the stress benchmark's writers edit
+STRESS_HOT_ROWS = 20
+
+# Median wall time of repeat calls to function
+def timed(function, repeat=3):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+# Tk-free stand-in for every widget ExpenseTrackerGUI creates. Options and values
+# are remembered, Treeview items are kept in order, and anything else is a no-op.
+class HeadlessWidget:
+    def __init__(self, *args, **options):
+        self.options = dict(options)
+        self.value = ""
+        self.items = {}
+        self.order = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+    def __getitem__(self, key):
+        return self.options.get(key)
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    # Comboboxes and entries take one value, scrollbars a (first, last) pair
+    def set(self, *value):
+        self.value = value[0] if len(value) == 1 else value
+
+    def get(self):
+        return self.value
+
+    def insert(self, parent, index, iid=None, text="", values=()):
+        iid = str(iid if iid is not None else len(self.order))
+        self.items[iid] = {"text": text, "values": values}
+        if index == "end":
+            self.order.append(iid)
+        else:
+            self.order.insert(index, iid)
+        return iid
+
+    def delete(self, *iids):
+        for iid in map(str, iids):
+            if iid in self.items:
+                del self.items[iid]
+                self.order.remove(iid)
+
+    def get_children(self, item=""):
+        return tuple(self.order)
+
+    def exists(self, iid):
+        return str(iid) in self.items
+
+    def item(self, iid, **options):
+        if options:
+            self.items[str(iid)].update(options)
+        return self.items[str(iid)]
+
+    def selection(self):
+        return ()
+
+    def focus(self):
+        return ""
+
+# Root window of a headless GUI: after() callbacks wait until pump() runs them
+class HeadlessRoot(HeadlessWidget):
+    def __init__(self, *args, **options):
+        super().__init__(*args, **options)
+        self.scheduled = {}
+        self.after_ids = iter(range(1, sys.maxsize))
+
+    def after(self, delay, callback=None, *args):
+        after_id = "after#%d" % next(self.after_ids)
+        self.scheduled[after_id] = (callback, args)
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.scheduled.pop(after_id, None)
+
+    # Run scheduled callbacks until done() is true or timeout seconds have passed
+    def pump(self, done, timeout=600):
+        deadline = time.perf_counter() + timeout
+        while not done():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("The headless GUI did not finish in %d seconds." % timeout)
+            scheduled, self.scheduled = self.scheduled, {}
+            for callback, args in scheduled.values():
+                callback(*args)
+            time.sleep(0.001)
+
+class HeadlessMessages:
+    def __init__(self):
+        self.shown = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.shown.append((name,) + args)
+
+# An ExpenseTrackerGUI on database whose widgets are HeadlessWidgets, for timing
+# its refresh paths without a display. The gui module still needs tkinter and
+# tkcalendar to be importable.
+@contextmanager
+def headless_gui(database):
+    from . import gui
+    widgets = ("Button", "Label", "Combobox", "Treeview", "Scrollbar", "Entry", "Style", "Frame", "Progressbar")
+    replaced = {
+        "tk": types.SimpleNamespace(Tk=HeadlessRoot, Toplevel=HeadlessWidget, StringVar=HeadlessWidget, END="end"),
+        "ttk": types.SimpleNamespace(**{name: HeadlessWidget for name in widgets}),
+        "tkfont": types.SimpleNamespace(Font=HeadlessWidget),
+        "DateEntry": HeadlessWidget,
+        "messagebox": HeadlessMessages(),
+    }
+    original = {name: getattr(gui, name) for name in replaced}
+    for name, value in replaced.items():
+        setattr(gui, name, value)
+    app = None
+    try:
+        app = gui.ExpenseTrackerGUI(gui.tk.Tk(), database)
+        yield app
+    finally:
+        if app is not None:
+            app.worker.close()
+        for name, value in original.items():
+            setattr(gui, name, value)
+
+# Time the GUI's refresh paths: each call returns once the worker has delivered
+# the rows and the Treeview holds them
+def benchmark_gui(database, repeat=3):
+    results = {}
+    with headless_gui(database) as app:
+        root = app.root
+
+        def settle(action):
+            action()
+            root.pump(lambda: not app.worker.is_loading("view") and not app.worker.is_loading("dropdowns"))
+
+        settle(lambda: None)
+        categories = app.filter_category_combobox["values"]
+        months = app.filter_month_combobox["values"]
+        app.filter_category_combobox.set(categories[1] if len(categories) > 1 else "All Categories")
+        app.filter_month_combobox.set(months[1] if len(months) > 1 else "All Months")
+        results["filter_expenses"] = timed(lambda: settle(app.filter_expenses), repeat)
+        app.filter_category_combobox.set("All Categories")
+        app.filter_month_combobox.set("All Months")
+        settle(app.filter_expenses)
+        results["update_treeview_sort_date"] = timed(lambda: settle(lambda: app.update_treeview("Date")), repeat)
+        results["update_treeview_sort_amount"] = timed(lambda: settle(lambda: app.update_treeview("Amount")), repeat)
+
+        def jump_to_middle():
+            app.view_offset = app.view_count // 2
+            app.update_treeview()
+
+        results["update_treeview_middle"] = timed(lambda: settle(jump_to_middle), repeat)
+        results["treeview_rows"] = len(app.treeview.get_children())
+    return results
+
+# Time the tracker's hot paths on a synthetic ledger of each size, returning a
+# JSON-ready dict. Times are median seconds over repeat runs; rates are per second.
+def benchmark_suite(sizes=BENCHMARK_SIZES, seed=0, adds=1000, repeat=3, gui=True, **ledger):
+    results = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seed": seed,
+        "sizes": {},
+    }
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "bench.db")
+            tracker = ExpenseTracker(database)
+            timings = results["sizes"][str(size)] = {}
+
+            started = time.perf_counter()
+            tracker.import_expenses(generate_ledger(size, seed, **ledger))
+            timings["import_rows_per_sec"] = size / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for i in range(adds):
+                tracker.add_expense("2021-06-%02d" % (i % 28 + 1), "Category %d" % (i % 12), "12.50", "benchmark lunch", "Location %d" % (i % 8))
+            timings["add_expense_per_sec"] = adds / (time.perf_counter() - started)
+
+            first = tracker.query_page(order_by="date", limit=1)[0]
+            first_date = dt_date.fromordinal(first[1])
+            month_start, month_end = month_range(first_date.year, first_date.month)
+            queries = {
+                "get_expenses": lambda: tracker.get_expenses(),
+                "get_total_expenses": lambda: tracker.get_total_expenses(),
+                "get_expenses_by_category": lambda: tracker.get_expenses_by_category(first[2]),
+                "get_expenses_by_location": lambda: tracker.get_expenses_by_location(first[5]),
+                "get_expenses_by_date": lambda: tracker.get_expenses_by_date(first_date),
+                "get_expenses_by_month": lambda: tracker.get_expenses_by_month("%02d" % first_date.month),
+                "get_expenses_between": lambda: tracker.get_expenses_between(month_start, month_end),
+                "get_expense_trends": lambda: tracker.get_expense_trends(),
+                "get_summary_filtered": lambda: tracker.get_summary(category=first[2], start=month_start, end=month_end),
+                "query_page_filtered": lambda: tracker.query_page(category=first[2], start=month_start, end=month_end, order_by="-amount"),
+                "query_offset_middle": lambda: tracker.query(order_by="date", limit=50, offset=size // 2, with_total=False),
+                "search": lambda: tracker.search("lunch coffee"),
+                "aggregate_category": lambda: tracker.aggregate("category"),
+                "aggregate_month_filtered": lambda: tracker.aggregate("month", ("sum", "count"), location=first[5]),
+            }
+            for name, query in queries.items():
+                timings[name] = timed(query, repeat)
+
+            # Charts: the first call loads the analytics columns, later ones reuse them.
+            # Results are remembered until the next write, so the cold timings drop them first.
+            analytics = tracker.analytics
+            timings["analytics_load"] = timed(lambda: analytics.load(), 1)
+            timings["chart_category_totals"] = timed(lambda: (analytics.results.clear(), analytics.totals("category")), repeat)
+            timings["chart_monthly_trend"] = timed(lambda: (analytics.results.clear(), analytics.monthly_totals(), analytics.rolling_average(3)), repeat)
+            timings["chart_cached"] = timed(lambda: (analytics.totals("category"), analytics.monthly_totals(), analytics.rolling_average(3)), repeat)
+            tracker.close()
+
+            if gui:
+                try:
+                    timings["gui"] = benchmark_gui(database, repeat)
+                except ImportError as e:
+                    timings["gui"] = {"skipped": str(e)}
+    return results
+
+# Time count add_expense calls against a scratch database for every storage profile
+# and commit window, returning (profile, commit window, writes per second) rows
+def benchmark_writes(count, profiles=None, commit_windows=(0,)):
+    results = []
+    for profile in profiles or sorted(STORAGE_PROFILES):
+        for commit_window in commit_windows:
+            with tempfile.TemporaryDirectory() as directory:
+                tracker = ExpenseTracker(os.path.join(directory, "bench.db"), profile, commit_window)
+                started = time.perf_counter()
+                for i in range(count):
+                    tracker.add_expense("2023-01-%02d" % (i % 28 + 1), "Category %d" % (i % 10), "12.50", "Benchmark expense", "Location %d" % (i % 5))
+                tracker.close()
+                elapsed = time.perf_counter() - started
+            results.append((profile, commit_window, count / elapsed))
+    return results
+
+# Rows per second ExpenseTracker.import_expenses has to keep up when loading a
+# generated ledger into an empty database; bench-import and the tests check it
+IMPORT_RATE_FLOOR = 25000
+
+# Import a generated ledger of rows expenses into an empty scratch database and
+# return the rows imported per second. The records are generated beforehand, so
+# only the import itself is timed.
+def benchmark_import(rows, seed=0):
+    records = list(generate_ledger(rows, seed))
+    with tempfile.TemporaryDirectory() as directory:
+        with ExpenseTracker(os.path.join(directory, "bench.db")) as tracker:
+            started = time.perf_counter()
+            tracker.import_expenses(records)
+            return rows / (time.perf_counter() - started)
+
+# Start runs fresh interpreters and return the median time to import the command
+# line module, the median wall time of "python -m expense_tracker --help", and the
+# GUI_MODULES that got imported along the way
+def benchmark_startup(runs=10):
+    environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import_times = []
+    process_times = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE], env=environment, capture_output=True, text=True, check=True).stdout.split("\n")
+        import_times.append(float(output[0]))
+        loaded.update(output[1].split())
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "expense_tracker", "--help"], env=environment, stdout=subprocess.DEVNULL, check=True)
+        process_times.append(time.perf_counter() - started)
+    return statistics.median(import_times), statistics.median(process_times), sorted(loaded)
+
+# One stress worker's loop until the deadline. Writers add expenses and every
+# fifth time re-read and edit one of the first STRESS_HOT_ROWS expenses under
+# optimistic concurrency, so writers sometimes collide on the same row;
+# readers page, total and search. read and write are called with a job for a
+# tracker. Returns counts of each kind of operation and of errors by message.
+def stress_loop(role, seed, deadline, read, write, rows):
+    rng = random.Random(seed)
+    counts = {"writes": 0, "edits": 0, "conflicts": 0, "reads": 0, "errors": {}}
+    while time.time() < deadline:
+        try:
+            if role == "reader":
+                category = "Category %d" % rng.randrange(12)
+                job = rng.choice((
+                    lambda tracker: tracker.query_page(category=category, order_by="-amount"),
+                    lambda tracker: tracker.get_summary(category=category, start="2021-01-01", end="2021-07-01"),
+                    lambda tracker: tracker.search(rng.choice(DESCRIPTION_WORDS)),
+                ))
+                read(job)
+                counts["reads"] += 1
+            elif rng.randrange(5):
+                write(lambda tracker: tracker.add_expense("2023-01-%02d" % rng.randint(1, 28), "Category %d" % rng.randrange(12), "12.50", "stress lunch", "Location %d" % rng.randrange(8)))
+                counts["writes"] += 1
+            else:
+                expense = read(lambda tracker: tracker.get_expense_by_id(rng.randint(1, min(rows, STRESS_HOT_ROWS))))
+                try:
+                    write(lambda tracker: tracker.edit_expense(expense[0], expense[1], expense[2], "%.2f" % (expense[3] / 100 + 1), expense[4], expense[5], expense[7]))
+                    counts["edits"] += 1
+                except ExpenseConflict:
+                    counts["conflicts"] += 1
+        except sqlite3.OperationalError as e:
+            counts["errors"][str(e)] = counts["errors"].get(str(e), 0) + 1
+    return counts
+
+# Stress worker in a process of its own, with its own tracker as another program
+# using the same file would have
+def stress_process(role, seed, deadline, database, profile, busy_timeout, rows, results):
+    tracker = ExpenseTracker(database, profile, busy_timeout=busy_timeout)
+    job = lambda job: job(tracker)
+    results.put((role, stress_loop(role, seed, deadline, job, job, rows)))
+    tracker.close()
+
+# Run writers and readers concurrently against one scratch database of rows
+# expenses for seconds seconds, as separate processes or, with threads=True,
+# as threads of this process sharing a TrackerPool. Returns a JSON-ready dict
+# with each role's operation counts, the rates per second and any errors.
+def benchmark_concurrency(writers=4, readers=4, seconds=5.0, threads=False, profile=None, busy_timeout=DEFAULT_BUSY_TIMEOUT, rows=10000, seed=0):
+    profile = profile or DEFAULT_STORAGE_PROFILE
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "stress.db")
+        tracker = ExpenseTracker(database, profile)
+        tracker.import_expenses(generate_ledger(rows, seed))
+        tracker.close()
+
+        roles = ["writer"] * writers + ["reader"] * readers
+        results = []
+        if threads:
+            pool = TrackerPool(database, profile, busy_timeout=busy_timeout)
+            deadline = time.time() + seconds
+            workers = [
+                threading.Thread(target=lambda role=role, worker_seed=seed + i: results.append((role, stress_loop(role, worker_seed, deadline, pool.read, pool.write, rows))))
+                for i, role in enumerate(roles)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            pool.close()
+        else:
+            results_queue = multiprocessing.Queue()
+            # Leave the processes time to start so they all run for the whole period
+            deadline = time.time() + 1 + seconds
+            workers = [
+                multiprocessing.Process(target=stress_process, args=(role, seed + i, deadline, database, profile, busy_timeout, rows, results_queue))
+                for i, role in enumerate(roles)
+            ]
+            for worker in workers:
+                worker.start()
+            results = [results_queue.get(timeout=seconds + 60) for _ in workers]
+            for worker in workers:
+                worker.join()
+
+    report = {"writers": writers, "readers": readers, "seconds": seconds, "threads": threads, "profile": profile}
+    totals = {"writes": 0, "edits": 0, "conflicts": 0, "reads": 0, "errors": {}}
+    for _, counts in results:
+        for key in ("writes", "edits", "conflicts", "reads"):
+            totals[key] += counts[key]
+        for message, count in counts["errors"].items():
+            totals["errors"][message] = totals["errors"].get(message, 0) + count
+    report.update(totals)
+    report["writes_per_sec"] = (totals["writes"] + totals["edits"]) / seconds
+    report["reads_per_sec"] = totals["reads"] / seconds
+    return report
@@ -0,0 +1,122 @@
+import math
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+# Where every chart's axes sit in the figure: left, bottom, width, height
+CHART_AXES_RECT = (0.08, 0.22, 0.9, 0.68)
+
+# Most month labels the line chart shows before it starts skipping some
+LINE_CHART_MAX_TICKS = 24
+
+# Distances of pie labels and percentages from the centre, as matplotlib's pie()
+PIE_LABEL_DISTANCE = 1.1
+PIE_PERCENT_DISTANCE = 0.6
+
+# Line, bar and pie charts drawn on one Figure embedded in a Tk container. Each
+# chart keeps its axes and artists, and a new result only moves the points, bar
+# heights or wedge angles; artists are rebuilt only when the groups change. Data
+# equal to what a chart already shows is not drawn again, so switching between
+# charts only hides and shows axes.
+class ChartPanel:
+    def __init__(self, parent):
+        self.figure = Figure(figsize=(8, 3.5))
+        self.canvas = FigureCanvasTkAgg(self.figure, master=parent)
+        self.widget = self.canvas.get_tk_widget()
+        self.axes = {}
+        self.artists = {}
+        self.drawn = {}
+
+    # Axes for a chart kind, created hidden the first time
+    def chart_axes(self, kind):
+        if kind not in self.axes:
+            axes = self.figure.add_axes(CHART_AXES_RECT)
+            axes.set_visible(False)
+            self.axes[kind] = axes
+        return self.axes[kind]
+
+    # Show one chart ("line", "bar" or "pie"), drawing data on it unless that is
+    # what the chart already shows
+    def show(self, kind, data):
+        if self.drawn.get(kind) != data:
+            getattr(self, "update_%s" % kind)(self.chart_axes(kind), data)
+            self.drawn[kind] = data
+        for name, axes in self.axes.items():
+            axes.set_visible(name == kind)
+        self.canvas.draw_idle()
+
+    # data is (monthly totals, rolling averages), both (month, cents) lists
+    def update_line(self, axes, data):
+        trends, averages = data
+        months = [month for month, _ in trends]
+        if "line" not in self.artists:
+            monthly, = axes.plot([], [], marker='o', label="Monthly total")
+            average, = axes.plot([], [], linestyle='--', label="3-month average")
+            axes.legend()
+            axes.set_xlabel("Month")
+            axes.set_ylabel("Total Amount")
+            axes.set_title("Expense Trends Over Time")
+            self.artists["line"] = (monthly, average)
+        monthly, average = self.artists["line"]
+        monthly.set_data(range(len(trends)), [total / 100 for _, total in trends])
+        # The averages start once a whole window of months is in
+        offset = len(trends) - len(averages)
+        average.set_data(range(offset, len(trends)), [total / 100 for _, total in averages])
+        step = max(1, math.ceil(len(months) / LINE_CHART_MAX_TICKS))
+        axes.set_xticks(range(0, len(months), step))
+        axes.set_xticklabels(months[::step], rotation=45, ha="right")
+        axes.relim()
+        axes.autoscale_view()
+
+    # data is (category, cents, count) rows from ExpenseAnalytics.totals
+    def update_bar(self, axes, data):
+        labels = [category for category, _, _ in data]
+        heights = [total / 100 for _, total, _ in data]
+        bars, drawn_labels = self.artists.get("bar", (None, None))
+        if labels == drawn_labels:
+            for bar, height in zip(bars, heights):
+                bar.set_height(height)
+        else:
+            if bars is not None:
+                bars.remove()
+            else:
+                axes.set_xlabel('Category')
+                axes.set_ylabel('Total Expenses')
+                axes.set_title('Expense Distribution by Category')
+            bars = axes.bar(range(len(labels)), heights)
+            axes.set_xticks(range(len(labels)))
+            axes.set_xticklabels(labels, rotation=30, ha="right")
+            self.artists["bar"] = (bars, labels)
+        axes.relim()
+        axes.autoscale_view()
+
+    # data is (category, cents, count) rows from ExpenseAnalytics.totals. Wedges
+    # start at the top and go anticlockwise, like pie(startangle=90).
+    def update_pie(self, axes, data):
+        labels = [category for category, _, _ in data]
+        sizes = [total for _, total, _ in data]
+        wedges, texts, percents, drawn_labels = self.artists.get("pie", (None, None, None, None))
+        if labels != drawn_labels:
+            axes.clear()
+            axes.set_title("Expense Distribution by Category")
+            wedges, texts, percents = axes.pie(
+                sizes or [1], labels=labels or None, autopct='%1.1f%%', startangle=90,
+                labeldistance=PIE_LABEL_DISTANCE, pctdistance=PIE_PERCENT_DISTANCE,
+            )
+            # Set aspect ratio to be equal so that pie is drawn as a circle
+            axes.axis('equal')
+            self.artists["pie"] = (wedges, texts, percents, labels)
+            return
+        total = sum(sizes) or 1
+        angle = 90
+        for wedge, text, percent, size in zip(wedges, texts, percents, sizes):
+            share = size / total
+            wedge.set_theta1(angle)
+            wedge.set_theta2(angle + 360 * share)
+            middle = math.radians(angle + 180 * share)
+            x, y = math.cos(middle), math.sin(middle)
+            text.set_position((PIE_LABEL_DISTANCE * x, PIE_LABEL_DISTANCE * y))
+            text.set_horizontalalignment("left" if x >= 0 else "right")
+            percent.set_position((PIE_PERCENT_DISTANCE * x, PIE_PERCENT_DISTANCE * y))
+            percent.set_text('%1.1f%%' % (100 * share))
+            angle += 360 * share
@@ -0,0 +1,396 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import date as dt_date
+
+from .core import AGGREGATE_GROUPS, DATABASE_PATH, DEFAULT_BUSY_TIMEOUT, DEFAULT_STORAGE_PROFILE, IMPORT_BATCH_SIZE, RECURRING_FREQUENCIES, STORAGE_PROFILES, ExpenseTracker
+from .exporters import EXPORT_WRITERS, export_expenses
+from .importers import IMPORT_READERS, read_expense_file, read_rate_file
+from .profiling import DEFAULT_SLOW_QUERY_MS, Profiler, format_stats, load_stats
+from .reports import REPORT_TOP_LOCATIONS, REPORT_WRITERS, export_report, format_change, period_statements
+from .values import LEDGER_CURRENCY, PERIOD_MONTHS, format_amount, format_day, format_entered_amount, month_range, to_currency
+
+# --category, --location, --start, --end, --month and --text, shared by query, report and export
+def add_filter_arguments(parser):
+    parser.add_argument("--category")
+    parser.add_argument("--location")
+    parser.add_argument("--start", help="first date, YYYY-MM-DD")
+    parser.add_argument("--end", help="day after the last date, YYYY-MM-DD")
+    parser.add_argument("--month", help="a calendar month, YYYY-MM; overrides --start and --end")
+    parser.add_argument("--text", help="words the description must contain, matched as word prefixes")
+
+def filter_arguments(args):
+    start, end = args.start, args.end
+    if args.month:
+        try:
+            year, month = (int(part) for part in args.month.split("-"))
+            start, end = month_range(year, month)
+        except ValueError:
+            raise ValueError("Invalid month. Please use YYYY-MM.")
+    return {"category": args.category, "location": args.location, "start": start, "end": end, "text": args.text}
+
+# Command line entry point: each subcommand works on the database without loading
+# Tk or matplotlib; no arguments starts the GUI
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Personal Expense Tracker")
+    parser.add_argument("--database", default=DATABASE_PATH)
+    parser.add_argument("--profile", choices=sorted(STORAGE_PROFILES), default=DEFAULT_STORAGE_PROFILE, help="SQLite journal and cache settings")
+    parser.add_argument("--commit-window", type=float, default=0, help="seconds of writes to group into one commit")
+    parser.add_argument("--busy-timeout", type=float, default=DEFAULT_BUSY_TIMEOUT, help="seconds to wait for other programs using the database")
+    parser.add_argument("--trace-queries", action="store_true", help="time every query and add the results to the stats file")
+    parser.add_argument("--slow-query-ms", type=float, default=DEFAULT_SLOW_QUERY_MS, help="with --trace-queries, log queries at least this slow")
+    parser.add_argument("--stats-file", help="where traced runs collect their statistics, defaults to the database path + .stats.json")
+    subparsers = parser.add_subparsers(dest="command")
+
+    add_parser = subparsers.add_parser("add", help="add one expense")
+    add_parser.add_argument("category")
+    add_parser.add_argument("amount")
+    add_parser.add_argument("description")
+    add_parser.add_argument("location")
+    add_parser.add_argument("--date", default=dt_date.today().isoformat(), help="YYYY-MM-DD, defaults to today")
+    add_parser.add_argument("--currency", help="currency the amount is in, e.g. EUR; defaults to the ledger currency (%s)" % LEDGER_CURRENCY)
+
+    import_parser = subparsers.add_parser("import", help="bulk import expenses from CSV, JSONL or OFX")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=sorted(IMPORT_READERS), help="defaults to the file extension")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    rates_parser = subparsers.add_parser("import-rates", help="load daily exchange rates from CSV or JSONL with date, currency and rate fields")
+    rates_parser.add_argument("path")
+
+    query_parser = subparsers.add_parser("query", help="list matching expenses and their total")
+    add_filter_arguments(query_parser)
+    query_parser.add_argument("--order", default="id", help="column to sort by; --order=-amount sorts descending")
+    query_parser.add_argument("--limit", type=int)
+    query_parser.add_argument("--offset", type=int, default=0)
+    query_parser.add_argument("--currency", help="currency to report the total in, defaults to the ledger currency")
+
+    report_parser = subparsers.add_parser("report", help="totals of matching expenses per group")
+    add_filter_arguments(report_parser)
+    report_parser.add_argument("--by", choices=sorted(AGGREGATE_GROUPS), default="category")
+    report_parser.add_argument("--currency", help="currency to report totals in, defaults to the ledger currency")
+
+    statements_parser = subparsers.add_parser("statements", help="monthly, quarterly or yearly statements with changes from the period before")
+    statements_parser.add_argument("--period", choices=sorted(PERIOD_MONTHS), default="month")
+    statements_parser.add_argument("--start", help="a date in the first period, YYYY-MM-DD; defaults to the first expense")
+    statements_parser.add_argument("--end", help="day after the last date, YYYY-MM-DD; defaults to after the last expense")
+    statements_parser.add_argument("--currency", help="currency to report in, defaults to the ledger currency")
+    statements_parser.add_argument("--top", type=int, default=REPORT_TOP_LOCATIONS, help="locations listed per period")
+    statements_parser.add_argument("--output", help="write CSV or HTML to this file, or - for CSV on standard output, instead of printing a summary")
+    statements_parser.add_argument("--format", choices=sorted(REPORT_WRITERS), help="defaults to the output file extension, or csv")
+
+    export_parser = subparsers.add_parser("export", help="stream matching expenses to CSV, JSONL or Parquet")
+    export_parser.add_argument("path", help="output file, or - for standard output")
+    add_filter_arguments(export_parser)
+    export_parser.add_argument("--format", choices=sorted(EXPORT_WRITERS), help="defaults to the file extension, or csv")
+    export_parser.add_argument("--since-last", choices=("id", "modified"), help="only rows added (id) or added and edited (modified) since the last export")
+    export_parser.add_argument("--mark", help="name the incremental export is tracked under, defaults to the path")
+
+    summaries_parser = subparsers.add_parser("summaries", help="check the running totals against the expenses")
+    summaries_parser.add_argument("--rebuild", action="store_true", help="recompute the running totals")
+
+    subparsers.add_parser("undo", help="undo the last change made from any program")
+    subparsers.add_parser("redo", help="redo the last undone change")
+
+    recurring_parser = subparsers.add_parser("recurring", help="manage recurring expenses and write them out up to a date")
+    recurring_actions = recurring_parser.add_subparsers(dest="action", required=True)
+    recurring_add_parser = recurring_actions.add_parser("add", help="add a recurring expense")
+    recurring_add_parser.add_argument("category")
+    recurring_add_parser.add_argument("amount")
+    recurring_add_parser.add_argument("description")
+    recurring_add_parser.add_argument("location")
+    recurring_add_parser.add_argument("--start", default=dt_date.today().isoformat(), help="date of the first expense, defaults to today")
+    recurring_add_parser.add_argument("--every", choices=RECURRING_FREQUENCIES, default="monthly")
+    recurring_add_parser.add_argument("--interval", type=int, default=1, help="repeat every N days, weeks, months or years")
+    recurring_add_parser.add_argument("--until", help="last possible date, YYYY-MM-DD")
+    recurring_actions.add_parser("list", help="list the recurring expenses")
+    recurring_remove_parser = recurring_actions.add_parser("remove", help="stop a recurring expense")
+    recurring_remove_parser.add_argument("id", type=int)
+    recurring_run_parser = recurring_actions.add_parser("run", help="add the expenses that are due")
+    recurring_run_parser.add_argument("--through", default=dt_date.today().isoformat(), help="last date to add expenses for, defaults to today")
+
+    budget_parser = subparsers.add_parser("budget", help="set monthly budgets per category and check spending against them")
+    budget_actions = budget_parser.add_subparsers(dest="action", required=True)
+    budget_set_parser = budget_actions.add_parser("set", help="set a category's budget")
+    budget_set_parser.add_argument("category")
+    budget_set_parser.add_argument("amount")
+    budget_set_parser.add_argument("--month", help="YYYY-MM; without it the budget applies to every month")
+    budget_remove_parser = budget_actions.add_parser("remove", help="remove a category's budget")
+    budget_remove_parser.add_argument("category")
+    budget_remove_parser.add_argument("--month", help="YYYY-MM; without it the standing budget is removed")
+    budget_actions.add_parser("list", help="list the budgets")
+    budget_status_parser = budget_actions.add_parser("status", help="spending against budget for one month, exit 1 if over")
+    budget_status_parser.add_argument("--month", default=dt_date.today().isoformat()[:7], help="YYYY-MM, defaults to this month")
+
+    rollover_parser = subparsers.add_parser("rollover", help="move the expenses of past years into read-only yearly archives")
+    rollover_parser.add_argument("--through", type=int, default=dt_date.today().year - 2, help="last year to close, defaults to two years ago")
+
+    bench_parser = subparsers.add_parser("bench-writes", help="measure add_expense writes/sec under each storage profile")
+    bench_parser.add_argument("--count", type=int, default=2000)
+    bench_parser.add_argument("--commit-windows", type=float, nargs="+", default=[0, 0.05])
+
+    import_bench_parser = subparsers.add_parser("bench-import", help="measure bulk import rows/sec into an empty database, exit 1 if below --min-rate")
+    import_bench_parser.add_argument("--rows", type=int, default=1000000)
+    import_bench_parser.add_argument("--seed", type=int, default=0)
+    import_bench_parser.add_argument("--min-rate", type=float, help="rows/sec to reach, defaults to IMPORT_RATE_FLOOR")
+
+    suite_parser = subparsers.add_parser("bench", help="time the hot paths on synthetic ledgers and print JSON")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    suite_parser.add_argument("--seed", type=int, default=0)
+    suite_parser.add_argument("--adds", type=int, default=1000, help="add_expense calls timed per size")
+    suite_parser.add_argument("--repeat", type=int, default=3)
+    suite_parser.add_argument("--categories", type=int, default=12)
+    suite_parser.add_argument("--locations", type=int, default=8)
+    suite_parser.add_argument("--days", type=int, default=3 * 365, help="date span of the ledger")
+    suite_parser.add_argument("--no-gui", action="store_true", help="skip the headless GUI timings")
+    suite_parser.add_argument("--output", help="write the JSON here instead of standard output")
+
+    stress_parser = subparsers.add_parser("bench-concurrency", help="run concurrent writers and readers on a scratch database and report throughput")
+    stress_parser.add_argument("--writers", type=int, default=4)
+    stress_parser.add_argument("--readers", type=int, default=4)
+    stress_parser.add_argument("--seconds", type=float, default=5.0)
+    stress_parser.add_argument("--rows", type=int, default=10000, help="expenses in the scratch database")
+    stress_parser.add_argument("--threads", action="store_true", help="threads sharing a connection pool instead of separate processes")
+
+    stats_parser = subparsers.add_parser("stats", help="show the query and refresh timings collected by --trace-queries")
+    stats_parser.add_argument("--limit", type=int, default=20, help="number of queries to list")
+    stats_parser.add_argument("--reset", action="store_true", help="discard the collected statistics")
+
+    startup_parser = subparsers.add_parser("bench-startup", help="measure how long the command line takes to import")
+    startup_parser.add_argument("--runs", type=int, default=10)
+
+    args = parser.parse_args(argv)
+    args.stats_file = args.stats_file or args.database + ".stats.json"
+    args.profiler = None
+    if args.trace_queries:
+        logging.basicConfig(format="%(name)s: %(message)s")
+        args.profiler = Profiler(args.slow_query_ms)
+
+    try:
+        return run_command(args)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        # Bad input, unreadable files and unusable databases are reported, not raised
+        print("error: %s" % e, file=sys.stderr)
+        return 1
+    finally:
+        if args.profiler:
+            args.profiler.save(args.stats_file)
+
+def open_tracker(args):
+    return ExpenseTracker(args.database, args.profile, args.commit_window, args.profiler, args.busy_timeout)
+
+def run_command(args):
+    if args.command == "add":
+        with open_tracker(args) as tracker:
+            expense_id = tracker.add_expense(args.date, args.category, args.amount, args.description, args.location, args.currency)
+            over = tracker.over_budget(args.date, args.category)
+        print("Added expense %d" % expense_id)
+        for category, budget, spent, remaining in over:
+            print("warning: %s is %s over its %s budget" % (category, format_amount(-remaining), format_amount(budget)), file=sys.stderr)
+        return 0
+
+    if args.command == "query":
+        with open_tracker(args) as tracker:
+            filters = filter_arguments(args)
+            currency = to_currency(args.currency)
+            rows, _ = tracker.query(order_by=args.order, limit=args.limit, offset=args.offset, with_total=False, **filters)
+            count, total = tracker.get_summary(currency=currency, **filters)
+            for row in rows:
+                print("%6d  %s  %-15s %12s  %-30s %s" % (row[0], format_day(row[1], "%Y-%m-%d"), row[2], format_entered_amount(row[3], row[6], row[7]), row[4], row[5]))
+            print("%d expenses, total %s" % (count, format_amount(total or 0, currency)))
+            return 0
+
+    if args.command == "report":
+        with open_tracker(args) as tracker:
+            filters = filter_arguments(args)
+            currency = to_currency(args.currency)
+            count, total = tracker.get_summary(currency=currency, **filters)
+            for group, group_total, group_count in tracker.aggregate(args.by, ("sum", "count"), currency=currency, **filters):
+                share = 100.0 * group_total / total if total else 0
+                print("%-20s %8d %16s %6.1f%%" % (group, group_count, format_amount(group_total, currency), share))
+            print("%-20s %8d %16s" % ("Total", count, format_amount(total or 0, currency)))
+            return 0
+
+    if args.command == "statements":
+        with open_tracker(args) as tracker:
+            if args.output:
+                count = export_report(tracker, args.output, args.period, args.format, args.start, args.end, args.currency, args.top)
+            else:
+                statements = period_statements(tracker, args.period, args.start, args.end, args.currency, args.top)
+        if args.output:
+            if args.output != "-":
+                print("Wrote %d statements to %s" % (count, args.output))
+            return 0
+        for statement in statements:
+            currency = statement["currency"]
+            print("%-8s %8d expenses %16s  %14s per expense %14s per day  %s" % (
+                statement["period"], statement["count"], format_amount(statement["total"], currency),
+                format_amount(statement["average"], currency), format_amount(statement["daily_average"], currency),
+                format_change(statement["change"], currency, statement["change_percent"]),
+            ))
+            for name, count, amount, share, change in statement["categories"]:
+                print("    %-20s %8d %16s %6.1f%%  %s" % (name, count, format_amount(amount, currency), share, format_change(change, currency)))
+            if statement["locations"]:
+                print("    top locations: %s" % ", ".join("%s %s" % (name, format_amount(amount, currency)) for name, _, amount, _ in statement["locations"]))
+        return 0
+
+    if args.command == "export":
+        with open_tracker(args) as tracker:
+            count = export_expenses(tracker, args.path, args.format, args.since_last, args.mark, **filter_arguments(args))
+        if args.path != "-":
+            print("Exported %d expenses to %s" % (count, args.path))
+        return 0
+
+    if args.command == "import":
+        with open_tracker(args) as tracker:
+            started = time.perf_counter()
+            imported, rejects = tracker.import_expenses(read_expense_file(args.path, args.format), args.batch_size)
+            elapsed = time.perf_counter() - started
+            for line_no, error in rejects:
+                print("line %d: %s" % (line_no, error), file=sys.stderr)
+            rate = imported / elapsed if elapsed else 0
+            print("Imported %d expenses, rejected %d (%.1fs, %d rows/sec)" % (imported, len(rejects), elapsed, rate))
+            return 1 if rejects else 0
+
+    if args.command == "import-rates":
+        with open_tracker(args) as tracker:
+            stored, rejects, repriced = tracker.import_rates(read_rate_file(args.path))
+        for line_no, error in rejects:
+            print("line %d: %s" % (line_no, error), file=sys.stderr)
+        print("Imported %d exchange rates, rejected %d; converted %d expenses again" % (stored, len(rejects), repriced))
+        return 1 if rejects else 0
+
+    if args.command == "summaries":
+        with open_tracker(args) as tracker:
+            if args.rebuild:
+                tracker.rebuild_summaries()
+                print("Rebuilt expense summaries")
+                return 0
+            mismatches = tracker.check_summaries()
+            for dimension, key, stored, actual in mismatches:
+                print("%s %r: stored %s, actual %s" % (dimension, key, stored, actual))
+            print("%d summary rows differ from my_expenses" % len(mismatches))
+            return 1 if mismatches else 0
+
+    if args.command in ("undo", "redo"):
+        with open_tracker(args) as tracker:
+            label = getattr(tracker, args.command)()
+        if label is None:
+            print("Nothing to %s" % args.command)
+            return 1
+        print("%s: %s" % ("Undid" if args.command == "undo" else "Redid", label))
+        return 0
+
+    if args.command == "recurring":
+        with open_tracker(args) as tracker:
+            if args.action == "add":
+                recurring_id = tracker.add_recurring(args.start, args.every, args.category, args.amount, args.description, args.location, args.interval, args.until)
+                print("Added recurring expense %d" % recurring_id)
+            elif args.action == "list":
+                for recurring_id, frequency, interval, start_day, until_day, next_day, category, cents, description, location in tracker.get_recurring():
+                    every = frequency if interval == 1 else "%s x%d" % (frequency, interval)
+                    due = "done" if next_day is None else "next " + format_day(next_day, "%Y-%m-%d")
+                    print("%4d  %-12s %s  %-15s %12s  %-30s %-15s %s" % (
+                        recurring_id, every, format_day(start_day, "%Y-%m-%d"), category, format_amount(cents), description, location, due,
+                    ))
+            elif args.action == "remove":
+                tracker.remove_recurring(args.id)
+                print("Removed recurring expense %d" % args.id)
+            else:
+                count = tracker.materialize_recurring(args.through)
+                print("Added %d recurring expenses through %s" % (count, args.through))
+            return 0
+
+    if args.command == "budget":
+        with open_tracker(args) as tracker:
+            if args.action == "set":
+                tracker.set_budget(args.category, args.amount, args.month)
+                print("Set the %s budget for %s" % (args.category, args.month or "every month"))
+            elif args.action == "remove":
+                tracker.remove_budget(args.category, args.month)
+                print("Removed the %s budget for %s" % (args.category, args.month or "every month"))
+            elif args.action == "list":
+                for category, month, cents in tracker.get_budgets():
+                    print("%-20s %-8s %16s" % (category, month or "monthly", format_amount(cents)))
+            else:
+                status = tracker.budget_status(args.month)
+                for category, budget, spent, remaining in status:
+                    print("%-20s %16s %16s %16s%s" % (category, format_amount(budget), format_amount(spent), format_amount(remaining), "  OVER" if remaining < 0 else ""))
+                over = [row for row in status if row[3] < 0]
+                print("%d of %d budgets over in %s" % (len(over), len(status), args.month))
+                return 1 if over else 0
+            return 0
+
+    if args.command == "rollover":
+        with open_tracker(args) as tracker:
+            moved = tracker.rollover(args.through)
+        for year, count in moved:
+            print("Archived %d: %d expenses" % (year, count))
+        if not moved:
+            print("No expenses on or before %d to archive" % args.through)
+        return 0
+
+    if args.command == "bench-writes":
+        from .benchmarks import benchmark_writes
+        for profile, commit_window, rate in benchmark_writes(args.count, commit_windows=args.commit_windows):
+            print("%-12s commit window %5.3fs  %8.0f writes/sec" % (profile, commit_window, rate))
+        return 0
+
+    if args.command == "bench-import":
+        from .benchmarks import IMPORT_RATE_FLOOR, benchmark_import
+        rate = benchmark_import(args.rows, args.seed)
+        min_rate = IMPORT_RATE_FLOOR if args.min_rate is None else args.min_rate
+        print("import %d rows  %8.0f rows/sec  (at least %.0f expected)" % (args.rows, rate, min_rate))
+        return 0 if rate >= min_rate else 1
+
+    if args.command == "bench":
+        from .benchmarks import benchmark_suite
+        results = benchmark_suite(
+            args.sizes, args.seed, args.adds, args.repeat, not args.no_gui,
+            categories=args.categories, locations=args.locations, days=args.days,
+        )
+        text = json.dumps(results, indent=2, sort_keys=True)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                out.write(text + "\n")
+        else:
+            print(text)
+        return 0
+
+    if args.command == "bench-concurrency":
+        from .benchmarks import benchmark_concurrency
+        report = benchmark_concurrency(args.writers, args.readers, args.seconds, args.threads, args.profile, args.busy_timeout, args.rows)
+        print("%d writers, %d readers, %s, %s profile, %.0fs" % (args.writers, args.readers, "threads" if args.threads else "processes", args.profile, args.seconds))
+        print("writes    %8d  %8.0f/sec  (%d edits, %d conflicts)" % (report["writes"] + report["edits"], report["writes_per_sec"], report["edits"], report["conflicts"]))
+        print("reads     %8d  %8.0f/sec" % (report["reads"], report["reads_per_sec"]))
+        for message, count in sorted(report["errors"].items()):
+            print("error     %8d  %s" % (count, message))
+        return 1 if report["errors"] else 0
+
+    if args.command == "stats":
+        if args.reset:
+            if os.path.exists(args.stats_file):
+                os.remove(args.stats_file)
+            print("Cleared %s" % args.stats_file)
+            return 0
+        print(format_stats(load_stats(args.stats_file), args.limit))
+        return 0
+
+    if args.command == "bench-startup":
+        from .benchmarks import benchmark_startup
+        import_time, process_time, loaded = benchmark_startup(args.runs)
+        print("import expense_tracker.cli  %6.1f ms" % (import_time * 1000))
+        print("python -m expense_tracker   %6.1f ms" % (process_time * 1000))
+        if loaded:
+            print("loaded without need: %s" % ", ".join(loaded))
+            return 1
+        return 0
+
+    # Tk and matplotlib are only imported for the GUI
+    from .gui import run_gui
+    run_gui(args.database, args.profile, args.commit_window, args.profiler, args.busy_timeout)
+    return 0
@@ -0,0 +1,1935 @@
+import calendar
+import json
+import math
+import random
+import re
+import sqlite3
+import time
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime, date as dt_date
+
+from .analytics import ExpenseAnalytics
+from .rates import RATE_AS_OF, RateCache, no_rate_error
+from .values import LEDGER_CURRENCY, MAX_CENTS, cents_to_text, month_range, period_label, period_range, to_cents, to_currency, to_day
+
+# SQLite file the tracker reads and writes
+DATABASE_PATH = 'expenses.db'
+
+# Connection settings applied when a tracker opens the database. "compatible" is
+# SQLite's stock rollback journal with a sync on every commit; "wal" lets readers
+# run alongside the writer and only syncs at WAL checkpoints, with a larger page
+# cache, memory-mapped reads and in-memory temp tables for sorting.
+STORAGE_PROFILES = {
+    "compatible": (
+        ("journal_mode", "DELETE"),
+        ("synchronous", "FULL"),
+        ("cache_size", "-2000"),
+        ("mmap_size", "0"),
+        ("temp_store", "DEFAULT"),
+    ),
+    "wal": (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", "-65536"),
+        ("mmap_size", "268435456"),
+        ("temp_store", "MEMORY"),
+    ),
+}
+
+DEFAULT_STORAGE_PROFILE = "wal"
+
+# Seconds a connection waits for another one to release its lock before giving up
+# with "database is locked"
+DEFAULT_BUSY_TIMEOUT = 5.0
+
+# Further attempts to start a write transaction once the busy timeout has run out,
+# waiting BUSY_BACKOFF seconds before the first and twice as long before each
+# next one, with jitter so competing writers do not retry in step
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05
+
+# A row changed by someone else since it was read; raised instead of overwriting it
+class ExpenseConflict(ValueError):
+    pass
+
+# Whether an OperationalError only means another connection held the lock
+def is_busy_error(error):
+    return "locked" in str(error) or "busy" in str(error)
+
+# Number of rows sent to SQLite per executemany call during a bulk import
+IMPORT_BATCH_SIZE = 10000
+
+# Number of rows fetched at a time while streaming an export
+EXPORT_CHUNK_SIZE = 10000
+
+# Number of rows ExpenseTracker.search returns by default
+SEARCH_LIMIT = 100
+
+# FTS5 match expression for text typed into a search box: every word must start a
+# word of the description, so "caf lun" finds "Lunch at the cafe"
+def search_expression(text):
+    return " ".join('"%s"*' % word for word in re.findall(r"\w+", text))
+
+# Words of text as the search index splits them: runs of letters and digits,
+# lower-cased and without diacritics, like FTS5's unicode61 tokenizer with
+# remove_diacritics 2, so "Café" is indexed as "cafe"
+def search_words(text):
+    text = "".join(char for char in unicodedata.normalize("NFD", text or "") if not unicodedata.combining(char))
+    return re.findall(r"[^\W_]+", text.lower())
+
+# The same test in Python, for a row that has not been through the index
+def matches_search(text, description):
+    words = search_words(description)
+    return all(any(word.startswith(term) for word in words) for term in search_words(text))
+
+# Name of the trigger that indexes new descriptions; a bulk import drops it and
+# indexes its rows in one statement instead
+SEARCH_INSERT_TRIGGER = "my_expenses_search_insert"
+
+# Name of the trigger that unindexes removed descriptions; a rollover that moves
+# most of my_expenses drops it and rebuilds the index from the rows left instead
+SEARCH_DELETE_TRIGGER = "my_expenses_search_delete"
+
+# Keyset boundary of a row for query_page: its sort column value and its id
+def page_key(row, order_by="id"):
+    return row[QUERY_ORDER_COLUMNS.index(order_by.lstrip('-'))], row[0]
+
+# Groupings ExpenseTracker.aggregate understands, as SQL expressions.
+# Weekdays follow strftime('%w'): '0' is Sunday.
+AGGREGATE_GROUPS = {
+    "category": "category",
+    "location": "location",
+    "month": "strftime('%Y-%m', day + 1721424.5)",
+    "weekday": "CAST(day % 7 AS TEXT)",
+}
+
+AGGREGATE_FUNCTIONS = ("sum", "count", "avg", "min", "max")
+
+# Label of the statement period holding an expense's day, as values.period_label
+# gives it, and the same label worked out from a category_months month
+PERIOD_GROUPS = {
+    "month": "strftime('%Y-%m', day + 1721424.5)",
+    "quarter": "strftime('%Y', day + 1721424.5) || '-Q' || ((CAST(strftime('%m', day + 1721424.5) AS INTEGER) + 2) / 3)",
+    "year": "strftime('%Y', day + 1721424.5)",
+}
+MONTH_PERIOD_GROUPS = {
+    "month": "month",
+    "quarter": "substr(month, 1, 4) || '-Q' || ((CAST(substr(month, 6, 2) AS INTEGER) + 2) / 3)",
+    "year": "substr(month, 1, 4)",
+}
+
+# Count and total of the expenses from one day up to another per period and
+# {key}. They are summed per day first, so that the period of each day is worked
+# out once rather than for every expense.
+PERIOD_TOTALS = '''
+SELECT {period} AS grp, key, SUM(count), SUM(total)
+FROM (SELECT {key} AS key, day, COUNT(*) AS count, SUM(cents) AS total FROM {source} WHERE day >= ? AND day < ? GROUP BY key, day)
+GROUP BY grp, key
+'''
+
+# PERIOD_TOTALS converted at each day's rate, with the first day that has no rate
+CONVERTED_PERIOD_TOTALS = '''
+SELECT {period} AS grp, key, SUM(count), CAST(ROUND(SUM(total / rate)) AS INTEGER), MIN(day) FILTER (WHERE rate IS NULL)
+FROM (
+  SELECT {key} AS key, day, COUNT(*) AS count, SUM(cents) AS total, {rate} AS rate
+  FROM {source} WHERE day >= ? AND day < ? GROUP BY key, day
+)
+GROUP BY grp, key
+'''
+
+# Rows loaded into the Treeview at a time until its real height is known
+VIEW_PAGE_SIZE = 50
+
+# Columns ExpenseTracker.query may sort by
+QUERY_ORDER_COLUMNS = ("id", "date", "category", "amount", "description", "location")
+
+# The my_expenses columns behind those names, in row order
+EXPENSE_COLUMNS = ("id", "day", "category", "cents", "description", "location")
+
+# Every column of an expense row, in the order of my_expenses and the archive tables
+EXPENSE_ROW_COLUMNS = "id, day, category, cents, description, location, modified, version, currency, entered_cents"
+
+# Statements that move the expenses of one closed year, the days from {first} up to
+# {end}, out of my_expenses into a table of their own. The table, its search index
+# and its totals in archive_summary are never written again.
+ARCHIVE_STATEMENTS = (
+    '''
+    CREATE TABLE {table} (
+      id INTEGER PRIMARY KEY,
+      day INTEGER NOT NULL,
+      category TEXT,
+      cents INTEGER NOT NULL,
+      description TEXT,
+      location TEXT,
+      modified INTEGER NOT NULL,
+      version INTEGER NOT NULL,
+      currency TEXT,
+      entered_cents INTEGER
+    )
+    ''',
+    "INSERT INTO {table} SELECT " + EXPENSE_ROW_COLUMNS + " FROM my_expenses WHERE day >= {first} AND day < {end} ORDER BY day, id",
+    "CREATE INDEX idx_{table}_category_location_day ON {table} (category, location, day)",
+    "CREATE INDEX idx_{table}_location_day ON {table} (location, day)",
+    "CREATE INDEX idx_{table}_day ON {table} (day)",
+    "CREATE INDEX idx_{table}_day_cents ON {table} (day, cents)",
+    "CREATE INDEX idx_{table}_cents ON {table} (cents)",
+    '''
+    CREATE VIRTUAL TABLE {table}_search USING fts5(
+      description,
+      content='{table}',
+      content_rowid='id',
+      tokenize='unicode61 remove_diacritics 2',
+      prefix='1 2 3'
+    )
+    ''',
+    "INSERT INTO {table}_search ({table}_search) VALUES ('rebuild')",
+    "INSERT INTO archive_summary (year, dimension, key, count, total) SELECT {year}, 'all', '', COUNT(*), COALESCE(SUM(cents), 0) FROM {table}",
+    "INSERT INTO archive_summary (year, dimension, key, count, total) SELECT {year}, 'category', COALESCE(category, ''), COUNT(*), SUM(cents) FROM {table} GROUP BY 3",
+    "INSERT INTO archive_summary (year, dimension, key, count, total) SELECT {year}, 'location', COALESCE(location, ''), COUNT(*), SUM(cents) FROM {table} GROUP BY 3",
+    "INSERT INTO archive_summary (year, dimension, key, count, total) SELECT {year}, 'month', strftime('%Y-%m', day + 1721424.5), COUNT(*), SUM(cents) FROM {table} GROUP BY 3",
+    "INSERT INTO archive_years (year, count, total, last_modified) SELECT {year}, COUNT(*), COALESCE(SUM(cents), 0), COALESCE(MAX(modified), 0) FROM {table}",
+    "CREATE TRIGGER {table}_read_only_insert BEFORE INSERT ON {table} BEGIN SELECT RAISE(ABORT, 'Expenses in closed years cannot be changed.'); END",
+    "CREATE TRIGGER {table}_read_only_update BEFORE UPDATE ON {table} BEGIN SELECT RAISE(ABORT, 'Expenses in closed years cannot be changed.'); END",
+    "CREATE TRIGGER {table}_read_only_delete BEFORE DELETE ON {table} BEGIN SELECT RAISE(ABORT, 'Expenses in closed years cannot be changed.'); END",
+    "DELETE FROM my_expenses WHERE day >= {first} AND day < {end}",
+)
+
+# Triggers that keep expenses dated before {end}, the first day after the last
+# closed year, out of my_expenses; replaced at each rollover
+CLOSED_YEAR_STATEMENTS = (
+    "DROP TRIGGER IF EXISTS my_expenses_closed_insert",
+    "DROP TRIGGER IF EXISTS my_expenses_closed_update",
+    "CREATE TRIGGER my_expenses_closed_insert BEFORE INSERT ON my_expenses WHEN new.day < {end} BEGIN SELECT RAISE(ABORT, 'Expenses before {date} are in closed years and cannot be added or changed.'); END",
+    "CREATE TRIGGER my_expenses_closed_update BEFORE UPDATE OF day ON my_expenses WHEN new.day < {end} BEGIN SELECT RAISE(ABORT, 'Expenses before {date} are in closed years and cannot be added or changed.'); END",
+)
+
+# Most journal entries changes_since returns one by one; after more than this the
+# caller is told to reload instead
+JOURNAL_DELTA_LIMIT = 1000
+
+# A row kept in the journal as JSON, in the format of expense_row. Entries written
+# before expenses had a currency are in the ledger currency.
+def journal_values(text):
+    if text is None:
+        return None
+    values = json.loads(text)
+    return tuple(values) + (None,) * (9 - len(values))
+
+# How often a recurring expense repeats; each is a number of days or of months
+RECURRING_FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+# Day number of occurrence index (0 is the first) of a recurring expense starting
+# on start_day. Monthly and yearly dates keep the starting day of the month, or
+# the month's last day when it is shorter: Jan 31 repeats on Feb 28, then Mar 31.
+def recurrence_day(start_day, frequency, interval, index):
+    if frequency == "daily":
+        return start_day + index * interval
+    if frequency == "weekly":
+        return start_day + 7 * index * interval
+    start = dt_date.fromordinal(start_day)
+    months = index * interval * (12 if frequency == "yearly" else 1)
+    year, month = divmod(start.year * 12 + start.month - 1 + months, 12)
+    return dt_date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1])).toordinal()
+
+# Schema step that gives the archive of each closed year the currency columns and
+# the (day, cents) index of my_expenses, so the partitions still line up under
+# expense_source
+def add_archive_currency_columns(cursor):
+    for year, in cursor.execute("SELECT year FROM archive_years WHERE count > 0").fetchall():
+        cursor.execute("ALTER TABLE archive_%d ADD COLUMN currency TEXT" % year)
+        cursor.execute("ALTER TABLE archive_%d ADD COLUMN entered_cents INTEGER" % year)
+        cursor.execute("CREATE INDEX idx_archive_%d_day_cents ON archive_%d (day, cents)" % (year, year))
+
+# Open expenses in currency ? dated from day ? on whose ledger amount changes when
+# their entered amount is converted again at the rate of their day, as
+# (id, day, category, location, cents, converted cents)
+REPRICED_EXPENSES = '''
+SELECT * FROM (
+  SELECT id, day, category, location, cents, CAST(ROUND(entered_cents * {rate}) AS INTEGER) AS converted
+  FROM my_expenses WHERE currency = ? AND day >= ?
+) WHERE converted != cents
+'''.format(rate=RATE_AS_OF.format(currency="my_expenses.currency", day="my_expenses.day"))
+
+# Recomputes category_months from every partition, given as {source}
+CATEGORY_MONTHS_REBUILD_STATEMENTS = (
+    "DELETE FROM category_months",
+    "INSERT INTO category_months (month, category, count, total) SELECT strftime('%Y-%m', day + 1721424.5), COALESCE(category, ''), COUNT(*), SUM(cents) FROM {source} GROUP BY 1, 2",
+)
+
+# Statements that recompute expense_summary from my_expenses and the totals of
+# the closed years. The dimensions are 'all' (one row with key ''), 'category',
+# 'location' and 'month' (YYYY-MM); totals are in cents.
+SUMMARY_REBUILD_STATEMENTS = (
+    "DELETE FROM expense_summary",
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'all', '', COUNT(*), COALESCE(SUM(cents), 0) FROM my_expenses",
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'category', COALESCE(category, ''), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2",
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'location', COALESCE(location, ''), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2",
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'month', strftime('%Y-%m', day + 1721424.5), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2",
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT dimension, key, SUM(count), SUM(total) FROM archive_summary WHERE true GROUP BY 1, 2 ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count, total = total + excluded.total",
+)
+
+# Statements that fold the rows with id > ? into expense_summary and category_months
+# after a bulk insert
+SUMMARY_APPEND_STATEMENTS = (
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'all', '', COUNT(*), COALESCE(SUM(cents), 0) FROM my_expenses WHERE id > ? ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count, total = total + excluded.total",
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'category', COALESCE(category, ''), COUNT(*), SUM(cents) FROM my_expenses WHERE id > ? GROUP BY 2 ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count, total = total + excluded.total",
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'location', COALESCE(location, ''), COUNT(*), SUM(cents) FROM my_expenses WHERE id > ? GROUP BY 2 ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count, total = total + excluded.total",
+    "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'month', strftime('%Y-%m', day + 1721424.5), COUNT(*), SUM(cents) FROM my_expenses WHERE id > ? GROUP BY 2 ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count, total = total + excluded.total",
+    "INSERT INTO category_months (month, category, count, total) SELECT strftime('%Y-%m', day + 1721424.5), COALESCE(category, ''), COUNT(*), SUM(cents) FROM my_expenses WHERE id > ? GROUP BY 1, 2 ON CONFLICT (month, category) DO UPDATE SET count = count + excluded.count, total = total + excluded.total",
+)
+
+# Adds a count/amount delta to one expense_summary row
+SUMMARY_UPSERT = '''
+INSERT INTO expense_summary (dimension, key, count, total) VALUES (?, ?, ?, ?)
+ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count, total = total + excluded.total
+'''
+
+# Adds a count/amount delta to one category's total for one month
+CATEGORY_MONTH_UPSERT = '''
+INSERT INTO category_months (month, category, count, total) VALUES (?, ?, ?, ?)
+ON CONFLICT (month, category) DO UPDATE SET count = count + excluded.count, total = total + excluded.total
+'''
+
+# Budget and spending of each budgeted category in the month ?1 (YYYY-MM). A
+# budget set for the month replaces the category's standing budget, the one
+# stored with month ''.
+BUDGET_STATUS_QUERY = '''
+SELECT budgets.category, budgets.cents, COALESCE(category_months.total, 0)
+FROM budgets
+LEFT JOIN category_months ON category_months.month = ?1 AND category_months.category = budgets.category
+WHERE (budgets.month = ?1 OR (budgets.month = '' AND NOT EXISTS (
+  SELECT 1 FROM budgets AS monthly WHERE monthly.category = budgets.category AND monthly.month = ?1
+)))
+'''
+
+# Schema changes applied after the my_expenses table is created. Each entry is
+# one version step of SQL statements, or functions called with the cursor for
+# changes that depend on the data; never edit a released step, append a new one instead.
+SCHEMA_MIGRATIONS = [
+    # 1: indexes for the category/location filters, date lookups and month filter
+    (
+        "CREATE INDEX IF NOT EXISTS idx_my_expenses_category_location_date ON my_expenses (category, location, date)",
+        "CREATE INDEX IF NOT EXISTS idx_my_expenses_location_date ON my_expenses (location, date)",
+        "CREATE INDEX IF NOT EXISTS idx_my_expenses_date ON my_expenses (date)",
+        "CREATE INDEX IF NOT EXISTS idx_my_expenses_month ON my_expenses (strftime('%m', date))",
+    ),
+    # 2: index for sorting by amount; with the rowid it also serves (amount, id) keyset seeks
+    (
+        "CREATE INDEX IF NOT EXISTS idx_my_expenses_amount ON my_expenses (amount)",
+    ),
+    # 3: running count/total per dimension, kept current by ExpenseTracker's write path
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS expense_summary (
+          dimension TEXT NOT NULL,
+          key TEXT NOT NULL,
+          count INTEGER NOT NULL,
+          total REAL NOT NULL,
+          PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+        ''',
+        "DELETE FROM expense_summary",
+        "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'all', '', COUNT(*), COALESCE(SUM(amount), 0) FROM my_expenses",
+        "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'category', COALESCE(category, ''), COUNT(*), SUM(amount) FROM my_expenses GROUP BY 2",
+        "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'location', COALESCE(location, ''), COUNT(*), SUM(amount) FROM my_expenses GROUP BY 2",
+        "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'month', COALESCE(strftime('%Y-%m', date), ''), COUNT(*), SUM(amount) FROM my_expenses GROUP BY 2",
+    ),
+    # 4: day numbers and integer cents instead of date strings and REAL amounts
+    (
+        '''
+        CREATE TABLE my_expenses_v4 (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          day INTEGER NOT NULL,
+          category TEXT,
+          cents INTEGER NOT NULL,
+          description TEXT,
+          location TEXT
+        )
+        ''',
+        '''
+        -- Rounding to a millionth of a cent first drops the binary error of the REAL,
+        -- so 1.005 (stored as 1.00499...) rounds half up to 101 cents
+        INSERT INTO my_expenses_v4 (id, day, category, cents, description, location)
+        SELECT id, CAST(julianday(date) - 1721424.5 AS INTEGER), category, CAST(ROUND(ROUND(amount * 100, 6)) AS INTEGER), description, location
+        FROM my_expenses
+        ''',
+        # Carry the AUTOINCREMENT counter over so ids of deleted rows are never reused
+        "DELETE FROM sqlite_sequence WHERE name = 'my_expenses_v4'",
+        "UPDATE sqlite_sequence SET name = 'my_expenses_v4' WHERE name = 'my_expenses'",
+        "DROP TABLE my_expenses",
+        "ALTER TABLE my_expenses_v4 RENAME TO my_expenses",
+        "CREATE INDEX idx_my_expenses_category_location_day ON my_expenses (category, location, day)",
+        "CREATE INDEX idx_my_expenses_location_day ON my_expenses (location, day)",
+        "CREATE INDEX idx_my_expenses_day ON my_expenses (day)",
+        "CREATE INDEX idx_my_expenses_month ON my_expenses (strftime('%m', day + 1721424.5))",
+        "CREATE INDEX idx_my_expenses_cents ON my_expenses (cents)",
+        "DROP TABLE expense_summary",
+        '''
+        CREATE TABLE expense_summary (
+          dimension TEXT NOT NULL,
+          key TEXT NOT NULL,
+          count INTEGER NOT NULL,
+          total INTEGER NOT NULL,
+          PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+        ''',
+        "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'all', '', COUNT(*), COALESCE(SUM(cents), 0) FROM my_expenses",
+        "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'category', COALESCE(category, ''), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2",
+        "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'location', COALESCE(location, ''), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2",
+        "INSERT INTO expense_summary (dimension, key, count, total) SELECT 'month', strftime('%Y-%m', day + 1721424.5), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2",
+    ),
+    # 5: when each row was last written, in milliseconds since the epoch (0 for rows
+    # older than this step), and how far each named incremental export has got
+    (
+        "ALTER TABLE my_expenses ADD COLUMN modified INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX idx_my_expenses_modified ON my_expenses (modified)",
+        '''
+        CREATE TABLE export_marks (
+          name TEXT NOT NULL,
+          key TEXT NOT NULL,
+          value INTEGER NOT NULL,
+          PRIMARY KEY (name, key)
+        ) WITHOUT ROWID
+        ''',
+    ),
+    # 6: full-text index over descriptions, kept in step with my_expenses by triggers
+    (
+        '''
+        CREATE VIRTUAL TABLE expense_search USING fts5(
+          description,
+          content='my_expenses',
+          content_rowid='id',
+          tokenize='unicode61 remove_diacritics 2',
+          prefix='1 2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER my_expenses_search_insert AFTER INSERT ON my_expenses BEGIN
+          INSERT INTO expense_search (rowid, description) VALUES (new.id, new.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER my_expenses_search_delete AFTER DELETE ON my_expenses BEGIN
+          INSERT INTO expense_search (expense_search, rowid, description) VALUES ('delete', old.id, old.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER my_expenses_search_update AFTER UPDATE OF description ON my_expenses BEGIN
+          INSERT INTO expense_search (expense_search, rowid, description) VALUES ('delete', old.id, old.description);
+          INSERT INTO expense_search (rowid, description) VALUES (new.id, new.description);
+        END
+        ''',
+        "INSERT INTO expense_search (expense_search) VALUES ('rebuild')",
+    ),
+    # 7: number of times each row has been edited, for optimistic concurrency
+    (
+        "ALTER TABLE my_expenses ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+    ),
+    # 8: closed years moved out of my_expenses by rollover, and their totals
+    (
+        '''
+        CREATE TABLE archive_years (
+          year INTEGER PRIMARY KEY,
+          count INTEGER NOT NULL,
+          total INTEGER NOT NULL,
+          last_modified INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE archive_summary (
+          year INTEGER NOT NULL,
+          dimension TEXT NOT NULL,
+          key TEXT NOT NULL,
+          count INTEGER NOT NULL,
+          total INTEGER NOT NULL,
+          PRIMARY KEY (year, dimension, key)
+        ) WITHOUT ROWID
+        ''',
+    ),
+    # 9: recurring expenses, monthly budgets per category and the running total of
+    # each category in each month that budgets are checked against
+    (
+        '''
+        CREATE TABLE recurring_expenses (
+          id INTEGER PRIMARY KEY,
+          frequency TEXT NOT NULL,
+          interval INTEGER NOT NULL,
+          start_day INTEGER NOT NULL,
+          until_day INTEGER,
+          generated INTEGER NOT NULL DEFAULT 0,
+          next_day INTEGER,
+          category TEXT NOT NULL,
+          cents INTEGER NOT NULL,
+          description TEXT NOT NULL,
+          location TEXT NOT NULL
+        )
+        ''',
+        "CREATE INDEX idx_recurring_expenses_next_day ON recurring_expenses (next_day)",
+        '''
+        CREATE TABLE budgets (
+          category TEXT NOT NULL,
+          month TEXT NOT NULL,
+          cents INTEGER NOT NULL,
+          PRIMARY KEY (category, month)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE category_months (
+          month TEXT NOT NULL,
+          category TEXT NOT NULL,
+          count INTEGER NOT NULL,
+          total INTEGER NOT NULL,
+          PRIMARY KEY (month, category)
+        ) WITHOUT ROWID
+        ''',
+        "INSERT INTO category_months (month, category, count, total) SELECT strftime('%Y-%m', day + 1721424.5), COALESCE(category, ''), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 1, 2",
+    ),
+    # 10: append-only journal of expense changes. Each user action is one batch;
+    # kind is 'change', 'undo' or 'redo' (with the batch it reverts), or 'bulk'
+    # for imports that are journaled as a single entry with no expense. before and
+    # after are the row without its id as a JSON array, NULL when there is none.
+    (
+        '''
+        CREATE TABLE change_batches (
+          id INTEGER PRIMARY KEY,
+          kind TEXT NOT NULL,
+          label TEXT NOT NULL,
+          reverts INTEGER,
+          created INTEGER NOT NULL
+        )
+        ''',
+        "CREATE INDEX idx_change_batches_reverts ON change_batches (reverts)",
+        '''
+        CREATE TABLE change_journal (
+          seq INTEGER PRIMARY KEY AUTOINCREMENT,
+          batch INTEGER NOT NULL,
+          expense_id INTEGER,
+          before TEXT,
+          after TEXT
+        )
+        ''',
+        "CREATE INDEX idx_change_journal_batch ON change_journal (batch)",
+    ),
+    # 11: the currency an expense was entered in (NULL for the ledger currency) and
+    # the amount entered, cents holding it converted to the ledger currency, and
+    # daily exchange rates as ledger units per unit of each currency. Per-day sums
+    # for converting totals are read from a (day, cents) index with no table reads;
+    # the plain day index stays, its (day, rowid) order serving the date sorted pages.
+    (
+        "ALTER TABLE my_expenses ADD COLUMN currency TEXT",
+        "ALTER TABLE my_expenses ADD COLUMN entered_cents INTEGER",
+        "CREATE INDEX idx_my_expenses_currency_day ON my_expenses (currency, day) WHERE currency IS NOT NULL",
+        "CREATE INDEX idx_my_expenses_day_cents ON my_expenses (day, cents)",
+        add_archive_currency_columns,
+        '''
+        CREATE TABLE exchange_rates (
+          currency TEXT NOT NULL,
+          day INTEGER NOT NULL,
+          rate REAL NOT NULL,
+          PRIMARY KEY (currency, day)
+        ) WITHOUT ROWID
+        ''',
+    ),
+    # 12: figures of statement periods in closed years, per period kind and
+    # reporting currency, as the JSON array [count, total, categories, locations].
+    # They are written once and never changed; converted ones are dropped when a
+    # rate import changes the rates they were worked out with.
+    (
+        '''
+        CREATE TABLE report_snapshots (
+          kind TEXT NOT NULL,
+          currency TEXT NOT NULL,
+          period TEXT NOT NULL,
+          end_day INTEGER NOT NULL,
+          figures TEXT NOT NULL,
+          PRIMARY KEY (kind, currency, period)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE TRIGGER report_snapshots_read_only BEFORE UPDATE ON report_snapshots BEGIN SELECT RAISE(ABORT, 'Report snapshots cannot be changed.'); END",
+    ),
+]
+
+class ExpenseTracker:
+    # commit_window > 0 turns on group commit: writes made within that many seconds
+    # of the first uncommitted one share a single transaction. flush() or close()
+    # commits whatever is still pending. With a profiling.Profiler every statement
+    # is timed and counted. busy_timeout is how long to wait for other connections
+    # to the same file. A read_only tracker needs an up-to-date schema and refuses
+    # writes; it may be closed from another thread, as a TrackerPool does.
+    def __init__(self, database=DATABASE_PATH, profile=DEFAULT_STORAGE_PROFILE, commit_window=0, profiler=None, busy_timeout=DEFAULT_BUSY_TIMEOUT, read_only=False):
+        self.database = database
+        self.commit_window = commit_window
+        self.pending_since = None
+        self.profiler = profiler
+        options = {"timeout": busy_timeout, "check_same_thread": not read_only}
+        self.db = profiler.connect(database, **options) if profiler else sqlite3.connect(database, **options)
+        self.cursor = self.db.cursor()
+        for name, value in STORAGE_PROFILES[profile]:
+            self.cursor.execute("PRAGMA %s = %s" % (name, value))
+        self.analytics = ExpenseAnalytics(self)
+        self.rates = RateCache(self)
+        self.closed_before = None
+        self.read_only = read_only
+        if read_only:
+            if self.cursor.execute("PRAGMA user_version").fetchone()[0] != len(SCHEMA_MIGRATIONS):
+                raise ValueError("%s needs upgrading before it can be opened read-only." % database)
+            self.cursor.execute("PRAGMA query_only = ON")
+            return
+        # The original schema; SCHEMA_MIGRATIONS brings it up to date
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS my_expenses (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          date DATE,
+          category TEXT,
+          amount REAL,
+          description TEXT,
+          location TEXT
+        )
+        ''')
+        self.migrate()
+        self.load_closed_before()
+
+    # Bring the database schema up to date, one numbered step at a time.
+    # The applied step is stored in PRAGMA user_version and read under the write
+    # lock, so trackers opening the same file together apply each step once.
+    def migrate(self):
+        self.flush()
+        while True:
+            self.begin()
+            try:
+                version = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(SCHEMA_MIGRATIONS):
+                    self.db.commit()
+                    return
+                for statement in SCHEMA_MIGRATIONS[version]:
+                    if callable(statement):
+                        statement(self.cursor)
+                    else:
+                        self.cursor.execute(statement)
+                self.cursor.execute("PRAGMA user_version = %d" % (version + 1))
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+
+    # Start a write transaction. It takes the write lock straight away, so a busy
+    # database is waited for up front (the busy timeout, then BUSY_RETRIES backed
+    # off attempts) rather than failing on the first write after reads in a
+    # deferred transaction, which SQLite cannot wait out.
+    def begin(self):
+        delay = BUSY_BACKOFF
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                self.cursor.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == BUSY_RETRIES:
+                    raise
+            time.sleep(delay * random.uniform(1, 2))
+            delay *= 2
+
+    # Run one write as a unit. It is committed, or left for the next group commit,
+    # when the block succeeds, and undone on its own when the block raises.
+    @contextmanager
+    def write(self):
+        if not self.db.in_transaction:
+            self.begin()
+        self.cursor.execute("SAVEPOINT expense_write")
+        try:
+            yield
+        except BaseException:
+            self.cursor.execute("ROLLBACK TO expense_write")
+            self.cursor.execute("RELEASE expense_write")
+            if self.pending_since is None:
+                self.db.rollback()
+            raise
+        self.cursor.execute("RELEASE expense_write")
+        self.commit()
+
+    # Commit now, or once the group commit window has passed
+    def commit(self):
+        if not self.commit_window:
+            self.db.commit()
+            return
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        elif time.monotonic() - self.pending_since >= self.commit_window:
+            self.flush()
+
+    # Commit any writes waiting for the group commit window
+    def flush(self):
+        if self.db.in_transaction:
+            self.db.commit()
+        self.pending_since = None
+
+    # Seconds until pending writes are due to be committed, or None if there are none
+    def commit_delay(self):
+        if self.pending_since is None:
+            return None
+        return max(0, self.pending_since + self.commit_window - time.monotonic())
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    # "with ExpenseTracker(...) as tracker:" closes the tracker, committing any
+    # grouped writes, however the block ends
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Validate an expense and return it normalized for storage: (day number,
+    # category, cents, description, location, currency, entered cents). An amount
+    # in another currency is converted to the ledger currency at the rate of its
+    # day and also kept as entered; currency and entered cents are None otherwise.
+    def validate_expense(self, date, category, amount, description, location, currency=None):
+        if not date:
+            raise ValueError("Please select a date.")
+
+        try:
+            day = to_day(date)
+        except ValueError:
+            raise ValueError("Invalid date. Please use YYYY-MM-DD.")
+
+        if self.closed_before is not None and day < self.closed_before:
+            raise ValueError("Expenses before %s are in closed years and cannot be added or changed." % dt_date.fromordinal(self.closed_before).isoformat())
+
+        if not category:
+            raise ValueError("Please enter a category.")
+
+        if not amount:
+            raise ValueError("Please enter an amount.")
+
+        try:
+            cents = to_cents(amount)
+        except ValueError:
+            raise ValueError("Invalid amount. Please enter a number.")
+
+        if cents <= 0:
+            raise ValueError("Amount must be greater than zero.")
+
+        currency = to_currency(currency)
+        entered_cents = None
+        if currency is not None:
+            entered_cents = cents
+            cents = math.floor(entered_cents * self.rates.rate(currency, day) + 0.5)
+            if cents <= 0:
+                raise ValueError("Amount must be greater than zero.")
+            if cents > MAX_CENTS:
+                raise ValueError("Amount is too large once converted to %s." % LEDGER_CURRENCY)
+
+        if not description:
+            raise ValueError("Please enter a description.")
+
+        if not location:
+            raise ValueError("Please enter a location.")
+
+        return day, category, cents, description, location, currency, entered_cents
+
+    def add_expense(self, date, category, amount, description, location, currency=None):
+        # Validate the input data
+        row = self.validate_expense(date, category, amount, description, location, currency)
+
+        with self.write():
+            expense_id = self.write_change(self.start_batch("Add expense"), None, None, row)
+        return expense_id
+
+    # Start a journal batch for one user action, inside the caller's write
+    def start_batch(self, label, kind="change", reverts=None):
+        self.cursor.execute(
+            "INSERT INTO change_batches (kind, label, reverts, created) VALUES (?, ?, ?, ?)",
+            (kind, label, reverts, time.time_ns() // 1000000),
+        )
+        return self.cursor.lastrowid
+
+    # (day, category, cents, description, location, modified, version, currency,
+    # entered cents) of an expense in my_expenses, or None
+    def expense_row(self, expense_id):
+        self.cursor.execute("SELECT day, category, cents, description, location, modified, version, currency, entered_cents FROM my_expenses WHERE id = ?", (expense_id,))
+        return self.cursor.fetchone()
+
+    # Apply one change to an expense as part of a journal batch, inside the
+    # caller's write. before is the expense as read by expense_row, or None to
+    # add it (as a new expense when expense_id is None). values is the
+    # validated (day, category, cents, description, location, currency, entered
+    # cents) to store, stamped with version, or None to remove the expense. The
+    # running totals and the journal follow. Returns the expense id.
+    def write_change(self, batch, expense_id, before, values, version=0):
+        after = None
+        if values is not None:
+            after = tuple(values[:5]) + (self.next_modified(), version) + tuple(values[5:])
+            if before is None:
+                self.cursor.execute('''
+                INSERT INTO my_expenses (id, day, category, cents, description, location, modified, version, currency, entered_cents) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (expense_id,) + after)
+                expense_id = self.cursor.lastrowid
+            else:
+                self.cursor.execute('''
+                UPDATE my_expenses SET day = ?, category = ?, cents = ?, description = ?, location = ?, modified = ?, version = ?, currency = ?, entered_cents = ? WHERE id = ?
+                ''', after + (expense_id,))
+            self.update_summaries(after[0], after[1], after[2], after[4], 1)
+        else:
+            self.cursor.execute("DELETE FROM my_expenses WHERE id = ?", (expense_id,))
+        if before is not None:
+            self.update_summaries(before[0], before[1], before[2], before[4], -1)
+        self.cursor.execute(
+            "INSERT INTO change_journal (batch, expense_id, before, after) VALUES (?, ?, ?, ?)",
+            (batch, expense_id, None if before is None else json.dumps(before), None if after is None else json.dumps(after)),
+        )
+        return expense_id
+
+    # Journal a bulk write, such as an import, as one entry telling readers of the
+    # journal to reload; it cannot be undone
+    def journal_bulk(self, label):
+        self.cursor.execute("INSERT INTO change_journal (batch) VALUES (?)", (self.start_batch(label, "bulk"),))
+
+    # Modification stamp for rows written now: milliseconds since the epoch, kept
+    # strictly increasing so an incremental export never misses a row written in
+    # the same millisecond as the last one it saw. Call inside a write transaction.
+    def next_modified(self):
+        latest = self.cursor.execute(
+            "SELECT MAX(latest) FROM (SELECT MAX(modified) AS latest FROM my_expenses UNION ALL SELECT MAX(last_modified) FROM archive_years)"
+        ).fetchone()[0] or 0
+        return max(time.time_ns() // 1000000, latest + 1)
+
+    # Add (sign=1) or take away (sign=-1) one expense from the running totals in
+    # expense_summary and category_months, as part of the caller's transaction
+    def update_summaries(self, day, category, cents, location, sign):
+        month = dt_date.fromordinal(day).isoformat()[:7]
+        self.cursor.executemany(SUMMARY_UPSERT, [
+            ('all', '', sign, sign * cents),
+            ('category', category or '', sign, sign * cents),
+            ('location', location or '', sign, sign * cents),
+            ('month', month, sign, sign * cents),
+        ])
+        self.cursor.execute(CATEGORY_MONTH_UPSERT, (month, category or '', sign, sign * cents))
+        if sign < 0:
+            self.cursor.executemany(
+                "DELETE FROM expense_summary WHERE dimension = ? AND key = ? AND count = 0",
+                [('category', category or ''), ('location', location or ''), ('month', month)],
+            )
+            self.cursor.execute("DELETE FROM category_months WHERE month = ? AND category = ? AND count = 0", (month, category or ''))
+
+    # Add rows written in bulk to the running totals, as part of the caller's
+    # transaction. groups maps (YYYY-MM month, category, location) to [count,
+    # total cents].
+    def add_summary_groups(self, groups):
+        deltas = {}
+        month_deltas = {}
+        for (month, category, location), (count, total) in groups.items():
+            for delta, key in ((deltas, ('all', '')), (deltas, ('category', category)), (deltas, ('location', location)), (deltas, ('month', month)), (month_deltas, (month, category))):
+                entry = delta.setdefault(key, [0, 0])
+                entry[0] += count
+                entry[1] += total
+        self.cursor.executemany(SUMMARY_UPSERT, [(dimension, key, count, total) for (dimension, key), (count, total) in deltas.items()])
+        self.cursor.executemany(CATEGORY_MONTH_UPSERT, [(month, category, count, total) for (month, category), (count, total) in month_deltas.items()])
+
+    # Insert many expenses in one transaction using batched executemany calls.
+    # records is an iterable of (line number, dict) pairs such as the ones produced
+    # by read_expense_file; rows that fail validation are skipped and reported.
+    def import_expenses(self, records, batch_size=IMPORT_BATCH_SIZE):
+        imported = 0
+        rejects = []
+        batch = []
+        # Day numbers and months of the dates seen so far, and count and total of
+        # the rows imported per (month, category, location) for the running totals
+        days = {}
+        months = {}
+        groups = {}
+        self.flush()
+        try:
+            self.begin()
+            # Another tracker may have closed more years since this one opened
+            self.load_closed_before()
+            last_id = self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM my_expenses").fetchone()[0]
+            modified = (self.next_modified(),)
+            # Loading into an empty table is faster with the indexes built once at
+            # the end, and the search index always takes new rows faster in one go
+            self.cursor.execute(
+                "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'my_expenses' AND sql IS NOT NULL AND (type = 'index' AND ? OR name = ?)",
+                (last_id == 0, SEARCH_INSERT_TRIGGER),
+            )
+            deferred = self.cursor.fetchall()
+            for kind, name, _ in deferred:
+                self.cursor.execute("DROP %s %s" % (kind.upper(), name))
+            for line_no, record in records:
+                if record is None:
+                    rejects.append((line_no, "Malformed record."))
+                    continue
+                date = record.get("date")
+                if date in days:
+                    date = days[date]
+                else:
+                    try:
+                        days[date] = date = to_day(date)
+                    except (TypeError, ValueError):
+                        # validate_expense reports the bad date
+                        pass
+                try:
+                    values = self.validate_expense(
+                        date,
+                        record.get("category"),
+                        record.get("amount"),
+                        record.get("description"),
+                        record.get("location"),
+                        record.get("currency"),
+                    )
+                except ValueError as e:
+                    rejects.append((line_no, str(e)))
+                    continue
+                batch.append(values + modified)
+                month = months.get(values[0])
+                if month is None:
+                    month = months[values[0]] = dt_date.fromordinal(values[0]).isoformat()[:7]
+                key = (month, values[1], values[4])
+                group = groups.get(key)
+                if group is None:
+                    groups[key] = [1, values[2]]
+                else:
+                    group[0] += 1
+                    group[1] += values[2]
+                if len(batch) >= batch_size:
+                    self.cursor.executemany('''
+                    INSERT INTO my_expenses (day, category, cents, description, location, currency, entered_cents, modified) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', batch)
+                    imported += len(batch)
+                    batch = []
+            if batch:
+                self.cursor.executemany('''
+                INSERT INTO my_expenses (day, category, cents, description, location, currency, entered_cents, modified) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', batch)
+                imported += len(batch)
+            for _, _, sql in deferred:
+                self.cursor.execute(sql)
+            self.cursor.execute(
+                "INSERT INTO expense_search (rowid, description) SELECT id, description FROM my_expenses WHERE id > ?", (last_id,)
+            )
+            self.add_summary_groups(groups)
+            if imported:
+                self.journal_bulk("Import %d expenses" % imported)
+            self.db.commit()
+        except BaseException:
+            # Nothing from a failed import is kept
+            self.db.rollback()
+            raise
+        return imported, rejects
+
+    # Validate an exchange rate and return it normalized for storage: (currency,
+    # day number, ledger units per unit of the currency)
+    def validate_rate(self, date, currency, rate):
+        currency = to_currency(currency)
+        if currency is None:
+            raise ValueError("Please enter a currency other than the ledger currency.")
+        try:
+            day = to_day(date)
+        except ValueError:
+            raise ValueError("Invalid date. Please use YYYY-MM-DD.")
+        try:
+            rate = float(rate)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid rate. Please enter a number.")
+        if not math.isfinite(rate) or rate <= 0:
+            raise ValueError("Rate must be greater than zero.")
+        return currency, day, rate
+
+    # Store daily exchange rates in one transaction, replacing any already stored
+    # for the same currency and day. records are (line number, dict) pairs with
+    # date, currency and rate fields, as read by read_rate_file. Open expenses in
+    # those currencies from the first imported day on are converted again, and the
+    # running totals moved by the differences; closed years keep their amounts.
+    # Statement snapshots converted to those currencies are dropped from that day.
+    # Returns (rates stored, rejects, expenses converted again).
+    def import_rates(self, records):
+        rates = []
+        rejects = []
+        for line_no, record in records:
+            if record is None:
+                rejects.append((line_no, "Malformed record."))
+                continue
+            try:
+                rates.append(self.validate_rate(record.get("date"), record.get("currency"), record.get("rate")))
+            except ValueError as e:
+                rejects.append((line_no, str(e)))
+        first_days = {}
+        for currency, day, _ in rates:
+            first_days[currency] = min(day, first_days.get(currency, day))
+        repriced = []
+        self.flush()
+        self.begin()
+        try:
+            self.cursor.executemany('''
+            INSERT INTO exchange_rates (currency, day, rate) VALUES (?, ?, ?)
+            ON CONFLICT (currency, day) DO UPDATE SET rate = excluded.rate
+            ''', rates)
+            for currency, day in sorted(first_days.items()):
+                self.cursor.execute(REPRICED_EXPENSES, (currency, day))
+                repriced += self.cursor.fetchall()
+                self.cursor.execute("DELETE FROM report_snapshots WHERE currency = ? AND end_day > ?", (currency, day))
+            if repriced:
+                modified = self.next_modified()
+                self.cursor.executemany(
+                    "UPDATE my_expenses SET cents = ?, modified = ?, version = version + 1 WHERE id = ?",
+                    [(converted, modified, expense_id) for expense_id, _, _, _, _, converted in repriced],
+                )
+                # Only amounts change, so each running total moves by the sum of its differences
+                deltas = {}
+                month_deltas = {}
+                for _, day, category, location, cents, converted in repriced:
+                    month = dt_date.fromordinal(day).isoformat()[:7]
+                    for key in (('all', ''), ('category', category or ''), ('location', location or ''), ('month', month)):
+                        deltas[key] = deltas.get(key, 0) + converted - cents
+                    key = (month, category or '')
+                    month_deltas[key] = month_deltas.get(key, 0) + converted - cents
+                self.cursor.executemany(SUMMARY_UPSERT, [(dimension, key, 0, delta) for (dimension, key), delta in deltas.items()])
+                self.cursor.executemany(CATEGORY_MONTH_UPSERT, [(month, category, 0, delta) for (month, category), delta in month_deltas.items()])
+                self.journal_bulk("Convert %d expenses at new exchange rates" % len(repriced))
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return len(rates), rejects, len(repriced)
+
+    # Currencies with exchange rates, in code order
+    def get_currencies(self):
+        self.cursor.execute("SELECT DISTINCT currency FROM exchange_rates ORDER BY currency")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    # Retrieve all expenses from the database
+    def get_expenses(self):
+        self.cursor.execute('''
+        SELECT * FROM %s
+        ''' % self.expense_source())
+        expenses = self.cursor.fetchall()
+        return expenses
+
+    # Calculate the total amount of all expenses, in cents
+    def get_total_expenses(self):
+        self.cursor.execute('''
+        SELECT total FROM expense_summary WHERE dimension = 'all'
+        ''')
+        total_expenses = self.cursor.fetchone()[0]
+        return total_expenses
+
+    # Retrieve expenses that match the specified category
+    def get_expenses_by_category(self, category):
+        self.cursor.execute('''
+        SELECT * FROM %s WHERE category = ?
+        ''' % self.expense_source(), (category,))
+        expenses = self.cursor.fetchall()
+        return expenses
+
+    # Retrieve expenses that match the specified date
+    def get_expenses_by_date(self, date):
+        day = to_day(date)
+        self.cursor.execute('''
+        SELECT * FROM %s WHERE day = ?
+        ''' % self.expense_source(day, day + 1), (day,))
+        expenses = self.cursor.fetchall()
+        return expenses
+
+    # Retrieve expenses that match the specified location
+    def get_expenses_by_location(self, location):
+        self.cursor.execute('''
+        SELECT * FROM %s WHERE location = ?
+        ''' % self.expense_source(), (location,))
+        expenses = self.cursor.fetchall()
+        return expenses
+
+    # Remove an expense from the database based on its ID
+    def remove_expense(self, expense_id):
+        self.remove_expenses([expense_id])
+
+    # Remove several expenses in one transaction and one undoable batch. Ids that
+    # are not found are skipped; returns the number removed.
+    def remove_expenses(self, expense_ids):
+        with self.write():
+            expenses = []
+            for expense_id in expense_ids:
+                expense = self.expense_row(expense_id)
+                if expense is None:
+                    self.check_not_archived(expense_id)
+                else:
+                    expenses.append((expense_id, expense))
+            if expenses:
+                batch = self.start_batch("Remove %d expense%s" % (len(expenses), "" if len(expenses) == 1 else "s"))
+                for expense_id, expense in expenses:
+                    self.write_change(batch, expense_id, expense, None)
+        return len(expenses)
+        
+    # Retrieve expenses that match the specified month
+    # If a year is given only that month of that year is returned, as a date range
+    def get_expenses_by_month(self, month, year=None):
+        if year is not None:
+            start, end = month_range(int(year), int(month))
+            return self.get_expenses_between(start, end)
+        self.cursor.execute('''
+        SELECT * FROM %s WHERE strftime('%%m', day + 1721424.5) = ?
+        ''' % self.expense_source(), (month,))
+        expenses = self.cursor.fetchall()
+        return expenses
+
+    # Retrieve expenses dated from start up to but not including end (YYYY-MM-DD)
+    def get_expenses_between(self, start, end):
+        self.cursor.execute('''
+        SELECT * FROM %s WHERE day >= ? AND day < ?
+        ''' % self.expense_source(start, end), (to_day(start), to_day(end)))
+        expenses = self.cursor.fetchall()
+        return expenses
+
+    # Retrieve expenses matching every given filter together with their total,
+    # using one statement. start/end form a half-open date range and order_by
+    # is a column name from QUERY_ORDER_COLUMNS, prefixed with "-" for descending.
+    # The total covers all matching rows, not just the page picked by limit/offset.
+    # Pass with_total=False when paging through rows whose total is already known.
+    # Rows are (id, day, category, cents, description, location, currency, entered
+    # cents), cents being in the ledger currency, as is the total.
+    def query(self, category=None, location=None, start=None, end=None, order_by=None, limit=None, offset=None, with_total=True, text=None):
+        where, params = self.build_filter(category, location, start, end, text)
+        source = self.expense_source(start, end)
+        if with_total:
+            sql = '''
+            WITH matches AS (SELECT * FROM %s%s)
+            SELECT id, day, category, cents, description, location, currency, entered_cents, (SELECT SUM(cents) FROM matches)
+            FROM matches
+            ''' % (source, where)
+        else:
+            sql = "SELECT id, day, category, cents, description, location, currency, entered_cents FROM %s%s" % (source, where)
+        if order_by:
+            column = self.order_column(order_by)
+            direction = "DESC" if order_by.startswith('-') else "ASC"
+            sql += " ORDER BY %s %s, id %s" % (column, direction, direction)
+        paged = limit is not None or offset is not None
+        if paged:
+            sql += " LIMIT ? OFFSET ?"
+        self.cursor.execute(sql, params + [-1 if limit is None else limit, offset or 0] if paged else params)
+        rows = self.cursor.fetchall()
+        if not with_total:
+            return rows, None
+        if rows:
+            total = rows[0][8]
+        elif paged:
+            # The page is empty but rows before it may still match
+            self.cursor.execute("SELECT SUM(cents) FROM %s%s" % (source, where), params)
+            total = self.cursor.fetchone()[0]
+        else:
+            total = 0
+        expenses = [row[:8] for row in rows]
+        return expenses, total or 0
+
+    # Keyset (seek) pagination: one page of matching rows in order_by order that
+    # comes after, or before, a boundary row. Boundaries are (sort value, id)
+    # pairs from page_key, so each page is an index seek no matter how deep it is,
+    # where OFFSET has to step over every earlier row. last=True returns the final page.
+    def query_page(self, category=None, location=None, start=None, end=None, order_by="id", limit=VIEW_PAGE_SIZE, after=None, before=None, last=False, text=None):
+        column = self.order_column(order_by)
+        descending = order_by.startswith('-')
+        backwards = before is not None or last
+        where, params = self.build_filter(category, location, start, end, text)
+
+        boundary = before if before is not None else after
+        if boundary is not None:
+            operator = ">" if descending == backwards else "<"
+            if column == "id":
+                condition = "id %s ?" % operator
+                params.append(boundary[1])
+            else:
+                condition = "(%s, id) %s (?, ?)" % (column, operator)
+                params.extend(boundary)
+            where += (" AND " if where else " WHERE ") + condition
+
+        direction = "ASC" if descending == backwards else "DESC"
+        order = "id %s" % direction if column == "id" else "%s %s, id %s" % (column, direction, direction)
+        self.cursor.execute(
+            "SELECT id, day, category, cents, description, location, currency, entered_cents FROM %s%s ORDER BY %s LIMIT ?" % (self.expense_source(start, end), where, order),
+            params + [limit],
+        )
+        rows = self.cursor.fetchall()
+        if backwards:
+            rows.reverse()
+        return rows
+
+    # Stream the matching expenses in id order as lists of up to chunk_size rows,
+    # read with fetchmany on a cursor of their own so memory use does not grow
+    # with the table. after_id keeps rows added since an earlier export, and
+    # modified_after rows added or edited since then. Rows are (id, day, category,
+    # cents, description, location, modified, currency, entered cents).
+    def iter_expense_chunks(self, category=None, location=None, start=None, end=None, after_id=None, modified_after=None, chunk_size=EXPORT_CHUNK_SIZE, text=None):
+        where, params = self.build_filter(category, location, start, end, text)
+        for condition, value in (("id > ?", after_id), ("modified > ?", modified_after)):
+            if value is not None:
+                where += (" AND " if where else " WHERE ") + condition
+                params.append(value)
+        cursor = self.db.execute(
+            "SELECT id, day, category, cents, description, location, modified, currency, entered_cents FROM %s%s ORDER BY id" % (self.expense_source(start, end), where),
+            params,
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    # How far the named incremental export has got by key ("id" or "modified"),
+    # or None before its first run
+    def get_export_mark(self, name, key):
+        self.cursor.execute("SELECT value FROM export_marks WHERE name = ? AND key = ?", (name, key))
+        mark = self.cursor.fetchone()
+        return mark[0] if mark else None
+
+    def set_export_mark(self, name, key, value):
+        with self.write():
+            self.cursor.execute('''
+            INSERT INTO export_marks (name, key, value) VALUES (?, ?, ?)
+            ON CONFLICT (name, key) DO UPDATE SET value = excluded.value
+            ''', (name, key, value))
+
+    # Expenses whose descriptions match text, best matches first by FTS5's bm25
+    # rank, narrowed by the usual filters. Rows are shaped like query's.
+    def search(self, text, category=None, location=None, start=None, end=None, limit=SEARCH_LIMIT):
+        expression = search_expression(text)
+        if not expression:
+            return []
+        where, params = self.build_filter(category, location, start, end)
+        # One ranked match per table; archived years have search indexes of their own
+        matches = []
+        match_params = []
+        for table, search_table in self.partitions(start, end):
+            matches.append('''
+            SELECT {table}.id, day, category, cents, {table}.description, location, currency, entered_cents, {search}.rank AS rank
+            FROM {search} JOIN {table} ON {table}.id = {search}.rowid
+            WHERE {search} MATCH ?'''.format(table=table, search=search_table) + where.replace(" WHERE ", " AND ", 1))
+            match_params += [expression] + params
+        self.cursor.execute(
+            "SELECT id, day, category, cents, description, location, currency, entered_cents FROM (%s) ORDER BY rank LIMIT ?" % " UNION ALL ".join(matches),
+            match_params + [limit],
+        )
+        return self.cursor.fetchall()
+
+    # The my_expenses column behind an order_by name such as "-amount"
+    def order_column(self, order_by):
+        name = order_by.lstrip('-')
+        if name not in QUERY_ORDER_COLUMNS:
+            raise ValueError("Cannot order expenses by %s" % order_by)
+        return EXPENSE_COLUMNS[QUERY_ORDER_COLUMNS.index(name)]
+
+    # Number of matching expenses and their total amount in cents.
+    # Single-dimension filters are answered from expense_summary. With a
+    # reporting currency other than the ledger's, the total is converted in SQL:
+    # the expenses are summed per day, from the (day, cents) index alone when no
+    # other filter applies, and each day's sum is converted at its rate.
+    def get_summary(self, category=None, location=None, start=None, end=None, currency=None, text=None):
+        currency = to_currency(currency)
+        if currency is not None:
+            where, params = self.build_filter(category, location, start, end, text)
+            self.cursor.execute('''
+            SELECT COALESCE(SUM(count), 0), CAST(ROUND(COALESCE(SUM(total / rate), 0)) AS INTEGER), MIN(day) FILTER (WHERE rate IS NULL)
+            FROM (SELECT day, COUNT(*) AS count, SUM(cents) AS total, %s AS rate FROM %s%s GROUP BY day)
+            ''' % (RATE_AS_OF.format(currency="?", day="my_expenses.day"), self.expense_source(start, end), where), [currency] + params)
+            count, total, missing = self.cursor.fetchone()
+            if missing is not None:
+                raise no_rate_error(currency, missing)
+            return count, total
+
+        dimension = None
+        # Searches have no summary rows
+        if not text:
+            if category is None and location is None and start is None and end is None:
+                dimension, key = 'all', ''
+            elif location is None and start is None and end is None:
+                dimension, key = 'category', category
+            elif category is None and start is None and end is None:
+                dimension, key = 'location', location
+            elif category is None and location is None and start is not None and end is not None:
+                # Only a range covering exactly one calendar month has a summary row
+                first = dt_date.fromordinal(to_day(start))
+                last = dt_date.fromordinal(to_day(end))
+                if first.day == 1 and month_range(first.year, first.month) == (first.isoformat(), last.isoformat()):
+                    dimension, key = 'month', first.isoformat()[:7]
+        if dimension is not None:
+            self.cursor.execute("SELECT count, total FROM expense_summary WHERE dimension = ? AND key = ?", (dimension, key))
+            summary = self.cursor.fetchone()
+            return summary if summary else (0, 0)
+
+        # Closed years inside the range are counted from their totals, not their rows
+        count = total = 0
+        covered = []
+        if not text and (category is None or location is None):
+            covered = self.covered_years(start, end)
+        if covered:
+            dimension, key = ('category', category) if category is not None else ('location', location) if location is not None else ('all', '')
+            self.cursor.execute(
+                "SELECT COALESCE(SUM(count), 0), COALESCE(SUM(total), 0) FROM archive_summary WHERE dimension = ? AND key = ? AND year IN (%s)" % ", ".join("?" * len(covered)),
+                [dimension, key] + covered,
+            )
+            count, total = self.cursor.fetchone()
+
+        where, params = self.build_filter(category, location, start, end, text)
+        self.cursor.execute("SELECT COUNT(*), SUM(cents) FROM %s%s" % (self.expense_source(start, end, covered), where), params)
+        rows_count, rows_total = self.cursor.fetchone()
+        return count + rows_count, total + (rows_total or 0)
+
+    # WHERE clause and parameters shared by query-style methods. text keeps the
+    # expenses whose description has words starting with each word of it.
+    def build_filter(self, category=None, location=None, start=None, end=None, text=None):
+        clauses = []
+        params = []
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if location is not None:
+            clauses.append("location = ?")
+            params.append(location)
+        if start is not None:
+            clauses.append("day >= ?")
+            params.append(to_day(start))
+        if end is not None:
+            clauses.append("day < ?")
+            params.append(to_day(end))
+        if text and search_expression(text):
+            searches = [search_table for _, search_table in self.partitions(start, end)]
+            clauses.append("id IN (%s)" % " UNION ALL ".join("SELECT rowid FROM %s WHERE %s MATCH ?" % (search_table, search_table) for search_table in searches))
+            params.extend([search_expression(text)] * len(searches))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    # Retrieve expenses that match both the specified category and location
+    def get_expenses_by_category_and_location(self, category, location):
+        if category == 'All Categories' and location == 'All Locations':
+            return self.get_expenses()
+        elif category == 'All Categories':
+            return self.get_expenses_by_location(location)
+        elif location == 'All Locations':
+            return self.get_expenses_by_category(category)
+        else:
+            self.cursor.execute('''
+            SELECT * FROM %s WHERE category = ? AND location = ?
+            ''' % self.expense_source(), (category, location))
+            expenses = self.cursor.fetchall()
+            return expenses
+
+    # Retrieve an expense based on its ID
+    def get_expense_by_id(self, expense_id):
+        self.cursor.execute('''
+        SELECT * FROM %s WHERE id = ?
+        ''' % self.expense_source(), (expense_id,))
+        expense = self.cursor.fetchone()
+        return expense
+
+    # Retrieve distinct values from the specified column
+    # Categories, locations and months come from expense_summary, which only
+    # holds values that still have expenses, so this does not scan my_expenses
+    def get_distinct_values(self, column):
+        if column in ("category", "location", "month"):
+            self.cursor.execute("SELECT key FROM expense_summary WHERE dimension = ? ORDER BY key", (column,))
+        else:
+            self.cursor.execute(f"SELECT DISTINCT {column} FROM {self.expense_source()}")
+        distinct_values = [row[0] for row in self.cursor.fetchall()]
+        return distinct_values
+
+    # Retrieve the months that have expenses, formatted like "March 2023", oldest first
+    def get_distinct_months(self):
+        months = []
+        for month in self.get_distinct_values("month"):
+            if month:
+                months.append(datetime.strptime(month, "%Y-%m").strftime("%B %Y"))
+        return months
+
+    # Retrieve monthly expense trends (total cents per month), converted to a
+    # reporting currency as in aggregate
+    def get_expense_trends(self, currency=None):
+        if to_currency(currency) is not None:
+            return self.aggregate("month", currency=currency)
+        self.cursor.execute('''
+        SELECT key AS month, total AS total_amount
+        FROM expense_summary
+        WHERE dimension = 'month'
+        ORDER BY key
+        ''')
+        trends = self.cursor.fetchall()
+        return trends
+
+    # Group the matching expenses and aggregate their amounts in one statement.
+    # Returns (group, value, ...) rows ordered by group, one value per function;
+    # amounts are in cents.
+    # Unfiltered sums, counts and averages by category, location or month are
+    # read straight from expense_summary. With a reporting currency other than the
+    # ledger's, the expenses are first summed per group and day and those sums
+    # converted at the day's rate, so each day's rate is looked up once per group.
+    def aggregate(self, group_by, functions=("sum",), category=None, location=None, start=None, end=None, currency=None, text=None):
+        if group_by not in AGGREGATE_GROUPS:
+            raise ValueError("Cannot group expenses by %s" % group_by)
+        for function in functions:
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValueError("Unknown aggregate function %s" % function)
+
+        currency = to_currency(currency)
+        if currency is not None:
+            converted = {
+                "sum": "CAST(ROUND(SUM(total / rate)) AS INTEGER)",
+                "count": "SUM(count)",
+                "avg": "SUM(total / rate) / SUM(count)",
+                "min": "CAST(ROUND(MIN(low / rate)) AS INTEGER)",
+                "max": "CAST(ROUND(MAX(high / rate)) AS INTEGER)",
+            }
+            where, params = self.build_filter(category, location, start, end, text)
+            self.cursor.execute('''
+            SELECT grp, %s, MIN(day) FILTER (WHERE rate IS NULL)
+            FROM (
+              SELECT %s AS grp, day, COUNT(*) AS count, SUM(cents) AS total, MIN(cents) AS low, MAX(cents) AS high, %s AS rate
+              FROM %s%s GROUP BY %s
+            )
+            GROUP BY grp ORDER BY grp
+            ''' % (
+                ", ".join(converted[function] for function in functions),
+                AGGREGATE_GROUPS[group_by],
+                RATE_AS_OF.format(currency="?", day="my_expenses.day"),
+                self.expense_source(start, end),
+                where,
+                # Months and weekdays follow from the day, so per-day sums are enough
+                "day" if group_by in ("month", "weekday") else "grp, day",
+            ), [currency] + params)
+            rows = self.cursor.fetchall()
+            missing = [row[-1] for row in rows if row[-1] is not None]
+            if missing:
+                raise no_rate_error(currency, min(missing))
+            return [row[:-1] for row in rows]
+
+        unfiltered = category is None and location is None and start is None and end is None and not text
+        if unfiltered and group_by != "weekday" and set(functions) <= {"sum", "count", "avg"}:
+            summary_columns = {"sum": "total", "count": "count", "avg": "CAST(total AS REAL) / count"}
+            self.cursor.execute(
+                "SELECT key, %s FROM expense_summary WHERE dimension = ? ORDER BY key"
+                % ", ".join(summary_columns[function] for function in functions),
+                (group_by,),
+            )
+            return self.cursor.fetchall()
+
+        where, params = self.build_filter(category, location, start, end, text)
+        self.cursor.execute(
+            "SELECT %s AS grp, %s FROM %s%s GROUP BY grp ORDER BY grp" % (
+                AGGREGATE_GROUPS[group_by],
+                ", ".join("%s(cents)" % function.upper() for function in functions),
+                self.expense_source(start, end),
+                where,
+            ),
+            params,
+        )
+        return self.cursor.fetchall()
+
+    # Figures of every period of kind ("month", "quarter" or "year") from the one
+    # holding start to the one holding the day before end, which default to the
+    # first and last expense, empty periods included, as (period, first day, end
+    # day, count, total, categories, locations) in date order. categories and
+    # locations are [name, count, total] lists, largest total first; amounts are
+    # converted to a reporting currency as in aggregate. Periods in closed years
+    # never change, so their figures are stored as snapshots the first time they
+    # are worked out and only read after that.
+    def period_figures(self, kind, start=None, end=None, currency=None):
+        if kind not in PERIOD_GROUPS:
+            raise ValueError("Statements cover a month, quarter or year, not %s" % kind)
+        currency = to_currency(currency)
+        if start is None or end is None:
+            bounds = [self.db.execute("SELECT MIN(day), MAX(day) FROM %s" % table).fetchone() for table, _ in self.partitions()]
+            days = [day for bound in bounds for day in bound if day is not None]
+            if not days:
+                return []
+            start = min(days) if start is None else start
+            end = max(days) + 1 if end is None else end
+        periods = []
+        day, high = period_range(kind, to_day(start))[0], to_day(end)
+        while day < high:
+            first, after = period_range(kind, day)
+            periods.append((period_label(kind, first), first, after))
+            day = after
+        if not periods:
+            return []
+
+        key = currency or LEDGER_CURRENCY
+        self.load_closed_before()
+        closed_before = self.closed_before or 0
+        stored = {}
+        if periods[0][2] <= closed_before:
+            self.cursor.execute(
+                "SELECT period, figures FROM report_snapshots WHERE kind = ? AND currency = ? AND period >= ? AND period <= ?",
+                (kind, key, periods[0][0], periods[-1][0]),
+            )
+            stored = {period: json.loads(figures) for period, figures in self.cursor.fetchall()}
+        missing = [period for period in periods if period[0] not in stored]
+        if missing:
+            computed = self.compute_period_figures(kind, missing[0][1], missing[-1][2], currency)
+            snapshots = []
+            for period, _, after in missing:
+                stored[period] = computed.get(period, [0, 0, [], []])
+                if after <= closed_before:
+                    snapshots.append((kind, key, period, after, json.dumps(stored[period])))
+            if snapshots and not self.read_only:
+                with self.write():
+                    self.cursor.executemany(
+                        "INSERT OR IGNORE INTO report_snapshots (kind, currency, period, end_day, figures) VALUES (?, ?, ?, ?, ?)",
+                        snapshots,
+                    )
+        return [(period, first, after) + tuple(stored[period]) for period, first, after in periods]
+
+    # period_figures of the expenses from day low up to high, worked out in one
+    # grouped pass per breakdown, as {period: [count, total, categories, locations]}
+    # for the periods with expenses. Ledger category totals come from
+    # category_months; locations, and everything converted, from the expenses.
+    def compute_period_figures(self, kind, low, high, currency=None):
+        source = self.expense_source(low, high)
+        if currency is None:
+            self.cursor.execute(
+                "SELECT %s, category, SUM(count), SUM(total) FROM category_months WHERE month >= ? AND month < ? GROUP BY 1, 2 HAVING SUM(count) > 0"
+                % MONTH_PERIOD_GROUPS[kind],
+                (period_label("month", low), period_label("month", high)),
+            )
+            categories = self.cursor.fetchall()
+            self.cursor.execute(PERIOD_TOTALS.format(period=PERIOD_GROUPS[kind], key="COALESCE(location, '')", source=source), (low, high))
+            locations = self.cursor.fetchall()
+            totals = {}
+            for period, _, count, total in categories:
+                period_count, period_total = totals.get(period, (0, 0))
+                totals[period] = (period_count + count, period_total + total)
+        else:
+            breakdowns = []
+            for group in ("COALESCE(category, '')", "COALESCE(location, '')", "''"):
+                self.cursor.execute(CONVERTED_PERIOD_TOTALS.format(
+                    period=PERIOD_GROUPS[kind], key=group, rate=RATE_AS_OF.format(currency="?", day="my_expenses.day"), source=source,
+                ), (currency, low, high))
+                rows = self.cursor.fetchall()
+                missing = [row[-1] for row in rows if row[-1] is not None]
+                if missing:
+                    raise no_rate_error(currency, min(missing))
+                breakdowns.append([row[:-1] for row in rows])
+            categories, locations, period_totals = breakdowns
+            # Period totals are converted from their own day sums, as in get_summary
+            totals = {period: (count, total) for period, _, count, total in period_totals}
+
+        figures = {period: [count, total, [], []] for period, (count, total) in totals.items()}
+        for column, rows in ((2, categories), (3, locations)):
+            for period, name, count, total in rows:
+                figures[period][column].append([name, count, total])
+        for breakdown in figures.values():
+            for column in (2, 3):
+                breakdown[column].sort(key=lambda row: (-row[2], row[0]))
+        return figures
+
+    # Compare expense_summary with totals computed from my_expenses and the closed
+    # years' totals, and category_months with the expenses of every year, and
+    # return the rows that differ as
+    # (dimension, key, stored (count, total), actual (count, total))
+    def check_summaries(self):
+        self.cursor.execute("SELECT dimension, key, count, total FROM expense_summary")
+        stored = {(dimension, key): (count, total) for dimension, key, count, total in self.cursor.fetchall()}
+        self.cursor.execute('''
+        SELECT dimension, key, SUM(count), SUM(total) FROM (
+          SELECT 'all' AS dimension, '' AS key, COUNT(*) AS count, COALESCE(SUM(cents), 0) AS total FROM my_expenses
+          UNION ALL
+          SELECT 'category', COALESCE(category, ''), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2
+          UNION ALL
+          SELECT 'location', COALESCE(location, ''), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2
+          UNION ALL
+          SELECT 'month', strftime('%Y-%m', day + 1721424.5), COUNT(*), SUM(cents) FROM my_expenses GROUP BY 2
+          UNION ALL
+          SELECT dimension, key, count, total FROM archive_summary
+        )
+        GROUP BY dimension, key
+        ''')
+        actual = {(dimension, key): (count, total) for dimension, key, count, total in self.cursor.fetchall()}
+        # Category totals per month, keyed "YYYY-MM category"
+        self.cursor.execute("SELECT month || ' ' || category, count, total FROM category_months")
+        stored.update((("category month", key), (count, total)) for key, count, total in self.cursor.fetchall())
+        self.cursor.execute(
+            "SELECT strftime('%%Y-%%m', day + 1721424.5) || ' ' || COALESCE(category, ''), COUNT(*), SUM(cents) FROM %s GROUP BY 1" % self.expense_source()
+        )
+        actual.update((("category month", key), (count, total)) for key, count, total in self.cursor.fetchall())
+        mismatches = []
+        for summary_key in sorted(set(stored) | set(actual)):
+            expected = stored.get(summary_key)
+            found = actual.get(summary_key)
+            if expected != found:
+                mismatches.append(summary_key + (expected, found))
+        return mismatches
+
+    # Recompute expense_summary and category_months from scratch
+    def rebuild_summaries(self):
+        self.flush()
+        self.begin()
+        try:
+            for statement in SUMMARY_REBUILD_STATEMENTS:
+                self.cursor.execute(statement)
+            for statement in CATEGORY_MONTHS_REBUILD_STATEMENTS:
+                self.cursor.execute(statement.format(source=self.expense_source()))
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+    
+    # Load the first day after the last closed year, or None when no year is closed
+    def load_closed_before(self):
+        year = self.db.execute("SELECT MAX(year) FROM archive_years").fetchone()[0]
+        self.closed_before = None if year is None else dt_date(year + 1, 1, 1).toordinal()
+
+    # (table, search table) pairs holding the expenses dated from start up to end:
+    # my_expenses, where every open year lives, and the archive of each closed
+    # year with expenses in the range. Years listed in skip are left out.
+    def partitions(self, start=None, end=None, skip=()):
+        low = None if start is None else to_day(start)
+        high = None if end is None else to_day(end)
+        partitions = [("my_expenses", "expense_search")]
+        for year, in self.db.execute("SELECT year FROM archive_years WHERE count > 0 ORDER BY year"):
+            if year in skip:
+                continue
+            if (high is None or dt_date(year, 1, 1).toordinal() < high) and (low is None or dt_date(year + 1, 1, 1).toordinal() > low):
+                partitions.append(("archive_%d" % year, "archive_%d_search" % year))
+        return partitions
+
+    # FROM clause source of the expenses dated from start up to end: my_expenses
+    # itself, or, once the range reaches into closed years, my_expenses and their
+    # archives as one UNION ALL under the same name. SQLite pushes the filters and
+    # ORDER BY ... LIMIT of the outer query down into every table.
+    def expense_source(self, start=None, end=None, skip=()):
+        partitions = self.partitions(start, end, skip)
+        if len(partitions) == 1:
+            return "my_expenses"
+        return "(%s) AS my_expenses" % " UNION ALL ".join("SELECT %s FROM %s" % (EXPENSE_ROW_COLUMNS, table) for table, _ in partitions)
+
+    # Closed years with expenses that lie wholly inside the range from start up to end
+    def covered_years(self, start=None, end=None):
+        low = None if start is None else to_day(start)
+        high = None if end is None else to_day(end)
+        return [
+            year for year, in self.db.execute("SELECT year FROM archive_years WHERE count > 0 ORDER BY year")
+            if (low is None or dt_date(year, 1, 1).toordinal() >= low) and (high is None or dt_date(year + 1, 1, 1).toordinal() <= high)
+        ]
+
+    # Raise if an expense missing from my_expenses is in a closed year
+    def check_not_archived(self, expense_id):
+        for table, _ in self.partitions()[1:]:
+            if self.db.execute("SELECT 1 FROM %s WHERE id = ?" % table, (expense_id,)).fetchone():
+                raise ValueError("This expense is in the closed year %s and cannot be changed." % table.split("_")[1])
+
+    # Close every year up to and including through_year: move its expenses out of
+    # my_expenses in bulk into a read-only archive table with its own indexes and
+    # pre-computed totals, and refuse new expenses dated in it from then on. Runs
+    # as one transaction and returns (year, expenses moved) for each year closed.
+    def rollover(self, through_year):
+        if through_year >= dt_date.today().year:
+            raise ValueError("Only past years can be closed.")
+        self.flush()
+        self.begin()
+        try:
+            self.load_closed_before()
+            if self.closed_before is not None:
+                first_year = dt_date.fromordinal(self.closed_before).year
+            else:
+                first_day = self.cursor.execute("SELECT MIN(day) FROM my_expenses").fetchone()[0]
+                if first_day is None:
+                    self.db.commit()
+                    return []
+                first_year = dt_date.fromordinal(first_day).year
+            # Moving most of the table is faster with its indexes and search index
+            # rebuilt afterwards than updated row by row
+            total, moving = self.cursor.execute(
+                "SELECT COUNT(*), COUNT(*) FILTER (WHERE day < ?) FROM my_expenses", (dt_date(through_year + 1, 1, 1).toordinal(),)
+            ).fetchone()
+            self.cursor.execute(
+                "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'my_expenses' AND sql IS NOT NULL AND (type = 'index' OR name = ?) AND ?",
+                (SEARCH_DELETE_TRIGGER, moving * 2 > total),
+            )
+            deferred = self.cursor.fetchall()
+            for kind, name, _ in deferred:
+                self.cursor.execute("DROP %s %s" % (kind.upper(), name))
+            moved = []
+            for year in range(first_year, through_year + 1):
+                first = dt_date(year, 1, 1).toordinal()
+                end = dt_date(year + 1, 1, 1).toordinal()
+                for statement in ARCHIVE_STATEMENTS:
+                    self.cursor.execute(statement.format(table="archive_%d" % year, year=year, first=first, end=end))
+                count = self.cursor.execute("SELECT count FROM archive_years WHERE year = ?", (year,)).fetchone()[0]
+                if not count:
+                    # An empty year is recorded as closed but needs no table
+                    for name in ("archive_%d_search" % year, "archive_%d" % year):
+                        self.cursor.execute("DROP TABLE %s" % name)
+                moved.append((year, count))
+            for _, _, sql in deferred:
+                self.cursor.execute(sql)
+            if deferred:
+                self.cursor.execute("INSERT INTO expense_search (expense_search) VALUES ('rebuild')")
+            if moved:
+                end = dt_date(through_year + 1, 1, 1)
+                for statement in CLOSED_YEAR_STATEMENTS:
+                    self.cursor.execute(statement.format(end=end.toordinal(), date=end.isoformat()))
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        finally:
+            self.load_closed_before()
+        return moved
+
+    # Each edit adds one to the row's version (index 7 of get_expense_by_id). Pass
+    # the version the changes were based on as expected_version and the edit fails
+    # with ExpenseConflict if another writer has edited the expense since.
+    # currency is the one amount is in, None for the ledger currency.
+    def edit_expense(self, expense_id, date, category, amount, description, location, expected_version=None, currency=None):
+        # Validate the input data
+        row = self.validate_expense(date, category, amount, description, location, currency)
+
+        with self.write():
+            old_expense = self.expense_row(expense_id)
+            if old_expense is None:
+                self.check_not_archived(expense_id)
+                raise ValueError("Expense not found.")
+            if expected_version is not None and old_expense[6] != expected_version:
+                raise ExpenseConflict("This expense was changed elsewhere. Please reopen it and try again.")
+            self.write_change(self.start_batch("Edit expense"), expense_id, old_expense, row, old_expense[6] + 1)
+
+    # Change the same fields of several expenses in one transaction and one
+    # undoable batch, e.g. to re-categorize them; fields left as None keep each
+    # expense's own value. An amount is taken to be in each expense's own currency
+    # unless currency is given. expected_versions maps ids to the version the
+    # change was based on, as in edit_expense. Returns the number of expenses changed.
+    def edit_expenses(self, expense_ids, date=None, category=None, amount=None, description=None, location=None, expected_versions=None, currency=None):
+        expense_ids = list(expense_ids)
+        if not expense_ids:
+            return 0
+        with self.write():
+            batch = self.start_batch("Edit %d expense%s" % (len(expense_ids), "" if len(expense_ids) == 1 else "s"))
+            for expense_id in expense_ids:
+                old_expense = self.expense_row(expense_id)
+                if old_expense is None:
+                    self.check_not_archived(expense_id)
+                    raise ValueError("Expense %s not found." % expense_id)
+                if expected_versions and expected_versions.get(expense_id, old_expense[6]) != old_expense[6]:
+                    raise ExpenseConflict("Expense %s was changed elsewhere. Please reload and try again." % expense_id)
+                row = self.validate_expense(
+                    old_expense[0] if date is None else date,
+                    old_expense[1] if category is None else category,
+                    cents_to_text(old_expense[2] if old_expense[7] is None else old_expense[8]) if amount is None else amount,
+                    old_expense[3] if description is None else description,
+                    old_expense[4] if location is None else location,
+                    old_expense[7] if currency is None else currency,
+                )
+                self.write_change(batch, expense_id, old_expense, row, old_expense[6] + 1)
+        return len(expense_ids)
+
+    # Undo the latest change batch that is still in effect, as a new 'undo' batch
+    # in the journal. Returns the undone batch's label, or None if there is
+    # nothing to undo. Raises ExpenseConflict, and changes nothing, if any of its
+    # expenses no longer hold what the batch left in them.
+    def undo(self):
+        with self.write():
+            self.cursor.execute('''
+            SELECT id FROM change_batches AS done
+            WHERE kind IN ('change', 'redo') AND NOT EXISTS (SELECT 1 FROM change_batches WHERE reverts = done.id)
+            ORDER BY id DESC LIMIT 1
+            ''')
+            batch = self.cursor.fetchone()
+            return None if batch is None else self.revert_batch(batch[0], "undo")
+
+    # Redo the latest undone batch, as long as no new change has been made since.
+    # Returns its label, or None if there is nothing to redo.
+    def redo(self):
+        with self.write():
+            self.cursor.execute('''
+            SELECT id FROM change_batches AS undone
+            WHERE kind = 'undo' AND NOT EXISTS (SELECT 1 FROM change_batches WHERE reverts = undone.id)
+              AND NOT EXISTS (SELECT 1 FROM change_batches WHERE kind = 'change' AND id > undone.id)
+            ORDER BY id DESC LIMIT 1
+            ''')
+            batch = self.cursor.fetchone()
+            return None if batch is None else self.revert_batch(batch[0], "redo")
+
+    # Put back the expenses a batch changed, newest entry first, journaled as a new
+    # batch of the given kind. Each expense must still hold the values the batch
+    # wrote; versions are not compared, as undo and redo raise them too.
+    def revert_batch(self, batch, kind):
+        label = self.cursor.execute("SELECT label FROM change_batches WHERE id = ?", (batch,)).fetchone()[0]
+        entries = self.cursor.execute(
+            "SELECT expense_id, before, after FROM change_journal WHERE batch = ? ORDER BY seq DESC", (batch,)
+        ).fetchall()
+        revert = self.start_batch(label, kind, batch)
+        for expense_id, before, after in entries:
+            before = journal_values(before)
+            after = journal_values(after)
+            current = self.expense_row(expense_id)
+            if (current is None) != (after is None) or current is not None and tuple(current[:5]) != tuple(after[:5]):
+                raise ExpenseConflict("Cannot %s \"%s\": expense %s has been changed since." % (kind, label, expense_id))
+            if before is not None and self.closed_before is not None and before[0] < self.closed_before:
+                raise ValueError("Cannot %s \"%s\": expense %s is in a closed year." % (kind, label, expense_id))
+            self.write_change(revert, expense_id, current, None if before is None else before[:5] + before[7:], (current or before)[6] + 1)
+        return label
+
+    # Index of the latest journal entry; pass it to changes_since later
+    def journal_position(self):
+        return self.cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_journal").fetchone()[0]
+
+    # Expenses changed since the journal position seq, by this tracker or any other
+    # program, as (new position, changes). changes lists (old expense, new expense)
+    # pairs in the order they happened, in the row format of get_expense_by_id, with
+    # None for the old side of an added expense and the new side of a removed one.
+    # It is None when the journal holds a bulk change or more than limit entries,
+    # meaning the caller should reload instead.
+    def changes_since(self, seq, limit=JOURNAL_DELTA_LIMIT):
+        self.cursor.execute(
+            "SELECT seq, expense_id, before, after FROM change_journal WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit + 1)
+        )
+        entries = self.cursor.fetchall()
+        if not entries:
+            return seq, []
+        if len(entries) > limit or any(expense_id is None for _, expense_id, _, _ in entries):
+            return self.journal_position(), None
+        changes = [
+            tuple(None if side is None else (expense_id,) + journal_values(side) for side in (before, after))
+            for _, expense_id, before, after in entries
+        ]
+        return entries[-1][0], changes
+
+    # Add a recurring expense: the expense on date, repeated every interval days,
+    # weeks, months or years (frequency) up to and including until, or for good.
+    # Its expenses are only written by materialize_recurring.
+    def add_recurring(self, date, frequency, category, amount, description, location, interval=1, until=None):
+        day, category, cents, description, location = self.validate_expense(date, category, amount, description, location)[:5]
+        if frequency not in RECURRING_FREQUENCIES:
+            raise ValueError("Frequency must be one of %s." % ", ".join(RECURRING_FREQUENCIES))
+        if int(interval) < 1:
+            raise ValueError("Interval must be at least 1.")
+        until_day = None
+        if until:
+            until_day = to_day(until)
+            if until_day < day:
+                raise ValueError("A recurring expense cannot end before it starts.")
+
+        with self.write():
+            self.cursor.execute('''
+            INSERT INTO recurring_expenses (frequency, interval, start_day, until_day, next_day, category, cents, description, location)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (frequency, int(interval), day, until_day, day, category, cents, description, location))
+            return self.cursor.lastrowid
+
+    # Stop a recurring expense; the expenses already written from it are kept
+    def remove_recurring(self, recurring_id):
+        with self.write():
+            self.cursor.execute("DELETE FROM recurring_expenses WHERE id = ?", (recurring_id,))
+            if self.cursor.rowcount == 0:
+                raise ValueError("Recurring expense not found.")
+
+    # Recurring expenses as (id, frequency, interval, start day, until day or None,
+    # next day to be written or None once finished, category, cents, description,
+    # location) rows
+    def get_recurring(self):
+        self.cursor.execute('''
+        SELECT id, frequency, interval, start_day, until_day, next_day, category, cents, description, location
+        FROM recurring_expenses ORDER BY id
+        ''')
+        return self.cursor.fetchall()
+
+    # Write every occurrence of the recurring expenses dated up to and including
+    # through that has not been written yet. The expenses go in with one
+    # executemany and the running totals are updated once, all in one transaction.
+    # Occurrences in closed years are skipped. Returns the number of expenses added.
+    def materialize_recurring(self, through):
+        high = to_day(through)
+        # Nothing due is the usual case at start-up, and needs no write lock
+        if self.db.execute("SELECT 1 FROM recurring_expenses WHERE next_day <= ? LIMIT 1", (high,)).fetchone() is None:
+            return 0
+        self.flush()
+        self.begin()
+        try:
+            self.load_closed_before()
+            last_id = self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM my_expenses").fetchone()[0]
+            modified = self.next_modified()
+            self.cursor.execute('''
+            SELECT id, frequency, interval, start_day, until_day, generated, category, cents, description, location
+            FROM recurring_expenses WHERE next_day <= ?
+            ''', (high,))
+            expenses = []
+            progress = []
+            for recurring_id, frequency, interval, start_day, until_day, index, category, cents, description, location in self.cursor.fetchall():
+                last = high if until_day is None else min(high, until_day)
+                day = recurrence_day(start_day, frequency, interval, index)
+                while day <= last:
+                    if self.closed_before is None or day >= self.closed_before:
+                        expenses.append((day, category, cents, description, location, modified))
+                    index += 1
+                    day = recurrence_day(start_day, frequency, interval, index)
+                progress.append((index, day if until_day is None or day <= until_day else None, recurring_id))
+            if expenses:
+                # The search index takes the new rows faster in one go, as in import_expenses
+                trigger = self.cursor.execute("SELECT sql FROM sqlite_master WHERE name = ?", (SEARCH_INSERT_TRIGGER,)).fetchone()[0]
+                self.cursor.execute("DROP TRIGGER %s" % SEARCH_INSERT_TRIGGER)
+                self.cursor.executemany('''
+                INSERT INTO my_expenses (day, category, cents, description, location, modified) VALUES (?, ?, ?, ?, ?, ?)
+                ''', expenses)
+                self.cursor.execute(trigger)
+                self.cursor.execute(
+                    "INSERT INTO expense_search (rowid, description) SELECT id, description FROM my_expenses WHERE id > ?", (last_id,)
+                )
+                for statement in SUMMARY_APPEND_STATEMENTS:
+                    self.cursor.execute(statement, (last_id,))
+                self.journal_bulk("Add %d recurring expenses" % len(expenses))
+            self.cursor.executemany("UPDATE recurring_expenses SET generated = ?, next_day = ? WHERE id = ?", progress)
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return len(expenses)
+
+    # Set the budget of a category for one month (YYYY-MM), or its standing budget
+    # for every month that has none of its own when month is None
+    def set_budget(self, category, amount, month=None):
+        if not category:
+            raise ValueError("Please enter a category.")
+        cents = to_cents(amount)
+        if cents <= 0:
+            raise ValueError("Budget must be greater than zero.")
+        month = self.budget_month(month)
+        with self.write():
+            self.cursor.execute('''
+            INSERT INTO budgets (category, month, cents) VALUES (?, ?, ?)
+            ON CONFLICT (category, month) DO UPDATE SET cents = excluded.cents
+            ''', (category, month, cents))
+
+    def remove_budget(self, category, month=None):
+        with self.write():
+            self.cursor.execute("DELETE FROM budgets WHERE category = ? AND month = ?", (category, self.budget_month(month)))
+            if self.cursor.rowcount == 0:
+                raise ValueError("Budget not found.")
+
+    # Budgets as (category, month or '' for standing budgets, cents) rows
+    def get_budgets(self):
+        self.cursor.execute("SELECT category, month, cents FROM budgets ORDER BY category, month")
+        return self.cursor.fetchall()
+
+    # Checked YYYY-MM text of a budget month, or '' for None
+    def budget_month(self, month):
+        if month is None:
+            return ''
+        try:
+            return datetime.strptime(month, "%Y-%m").strftime("%Y-%m")
+        except ValueError:
+            raise ValueError("Invalid month. Please use YYYY-MM.")
+
+    # (category, budget, spent, remaining) in cents for each category with a
+    # budget in month (YYYY-MM, or a date in it), or only for category. Spending
+    # is read from the running totals, so this does not look at any expenses.
+    def budget_status(self, month, category=None):
+        if not isinstance(month, str) or len(month) != 7:
+            month = dt_date.fromordinal(to_day(month)).isoformat()[:7]
+        query = BUDGET_STATUS_QUERY
+        params = [self.budget_month(month)]
+        if category is not None:
+            query += " AND budgets.category = ?2"
+            params.append(category)
+        self.cursor.execute(query + " ORDER BY budgets.category", params)
+        return [(category, budget, spent, budget - spent) for category, budget, spent in self.cursor.fetchall()]
+
+    # The rows of budget_status that have gone over budget
+    def over_budget(self, month, category=None):
+        return [status for status in self.budget_status(month, category) if status[3] < 0]
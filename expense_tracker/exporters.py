@@ -0,0 +1,145 @@
+import csv
+import json
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone, date as dt_date
+from decimal import Decimal
+
+from .core import EXPORT_CHUNK_SIZE
+from .values import LEDGER_CURRENCY, cents_to_text
+
+# Fields of an exported expense, in order. amount is as entered, in currency, and
+# ledger_amount the same amount in the ledger currency, so a file imported again
+# gets its expenses back in the currencies they were entered in.
+EXPORT_FIELDS = ("id", "date", "category", "amount", "description", "location", "modified", "currency", "ledger_amount")
+
+# Day number of 1970-01-01, the epoch of Parquet dates
+EPOCH_DAY = 719163
+
+# ISO 8601 UTC text of a modification stamp, or "" for rows written before stamps existed
+def format_modified(modified):
+    if not modified:
+        return ""
+    return datetime.fromtimestamp(modified / 1000, timezone.utc).isoformat(timespec="milliseconds")
+
+# The EXPORT_FIELDS of an expense row from iter_expense_chunks, with the date,
+# amounts and modification time as plain text
+def export_values(row):
+    return (
+        row[0], dt_date.fromordinal(row[1]).isoformat(), row[2], cents_to_text(row[3] if row[7] is None else row[8]), row[4], row[5],
+        format_modified(row[6]), row[7] or LEDGER_CURRENCY, cents_to_text(row[3]),
+    )
+
+# A text file opened for writing, or standard output for "-". A file is written
+# under a temporary name and only replaces path once the export has finished.
+@contextmanager
+def open_output(path):
+    if path == "-":
+        yield sys.stdout
+        return
+    partial = path + ".partial"
+    try:
+        with open(partial, "w", newline="", encoding="utf-8") as out:
+            yield out
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+def write_csv(chunks, path):
+    with open_output(path) as out:
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_FIELDS)
+        for rows in chunks:
+            writer.writerows(map(export_values, rows))
+
+def write_jsonl(chunks, path):
+    with open_output(path) as out:
+        for rows in chunks:
+            out.writelines(json.dumps(dict(zip(EXPORT_FIELDS, export_values(row)))) + "\n" for row in rows)
+
+# Parquet needs pyarrow. Each chunk becomes one row group, with dates as date32,
+# amounts as decimal(18, 2) and modification times as UTC timestamps.
+def write_parquet(chunks, path):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow).")
+    if path == "-":
+        raise ValueError("Parquet export needs a file to write to.")
+    schema = pyarrow.schema([
+        ("id", pyarrow.int64()),
+        ("date", pyarrow.date32()),
+        ("category", pyarrow.string()),
+        ("amount", pyarrow.decimal128(18, 2)),
+        ("description", pyarrow.string()),
+        ("location", pyarrow.string()),
+        ("modified", pyarrow.timestamp("ms", tz="UTC")),
+        ("currency", pyarrow.string()),
+        ("ledger_amount", pyarrow.decimal128(18, 2)),
+    ])
+    partial = path + ".partial"
+    try:
+        with pyarrow.parquet.ParquetWriter(partial, schema) as writer:
+            for rows in chunks:
+                ids, days, categories, cents, descriptions, locations, modified, currencies, entered = zip(*rows)
+                writer.write_batch(pyarrow.record_batch([
+                    pyarrow.array(ids, pyarrow.int64()),
+                    pyarrow.array([day - EPOCH_DAY for day in days], pyarrow.int32()).cast(pyarrow.date32()),
+                    pyarrow.array(categories, pyarrow.string()),
+                    pyarrow.array([Decimal(amount if currency is None else entered_amount).scaleb(-2) for amount, currency, entered_amount in zip(cents, currencies, entered)], pyarrow.decimal128(18, 2)),
+                    pyarrow.array(descriptions, pyarrow.string()),
+                    pyarrow.array(locations, pyarrow.string()),
+                    pyarrow.array(modified, pyarrow.int64()).cast(pyarrow.timestamp("ms", tz="UTC")),
+                    pyarrow.array([currency or LEDGER_CURRENCY for currency in currencies], pyarrow.string()),
+                    pyarrow.array([Decimal(amount).scaleb(-2) for amount in cents], pyarrow.decimal128(18, 2)),
+                ], schema=schema))
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+EXPORT_WRITERS = {
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+    "parquet": write_parquet,
+}
+
+# Stream the expenses matching the filters to path and return how many were written.
+# since="id" exports only rows added since the last export under the same mark
+# name (the path by default), since="modified" rows added or edited since then.
+# The first run exports everything, and the mark only moves once the file is
+# complete. Removed rows are not reported by either mode.
+def export_expenses(tracker, path, file_format=None, since=None, mark=None, category=None, location=None, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE, text=None):
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lower().lstrip(".")
+        if file_format not in EXPORT_WRITERS:
+            file_format = "csv"
+    if file_format not in EXPORT_WRITERS:
+        raise ValueError("Cannot export to %s" % file_format)
+    if since not in (None, "id", "modified"):
+        raise ValueError("Incremental exports follow id or modified, not %s" % since)
+
+    name = mark or path
+    last = tracker.get_export_mark(name, since) if since else None
+    progress = {"count": 0, "id": last or 0, "modified": last or 0}
+
+    def chunks():
+        for rows in tracker.iter_expense_chunks(
+            category, location, start, end,
+            after_id=last if since == "id" else None,
+            modified_after=last if since == "modified" else None,
+            chunk_size=chunk_size,
+            text=text,
+        ):
+            progress["count"] += len(rows)
+            progress["id"] = max(progress["id"], rows[-1][0])
+            progress["modified"] = max(progress["modified"], max(row[6] for row in rows))
+            yield rows
+
+    EXPORT_WRITERS[file_format](chunks(), path)
+    if since and (last is None or progress[since] != last):
+        tracker.set_export_mark(name, since, progress[since])
+    return progress["count"]
@@ -0,0 +1,987 @@
+import tkinter as tk
+from tkinter import filedialog
+from tkinter import messagebox
+from tkinter import ttk
+import tkinter.font as tkfont
+import itertools
+import queue
+import threading
+import time
+from datetime import datetime, date as dt_date
+from tkcalendar import DateEntry
+
+from .core import DEFAULT_BUSY_TIMEOUT, DEFAULT_STORAGE_PROFILE, DATABASE_PATH, VIEW_PAGE_SIZE, ExpenseTracker, matches_search, page_key
+from .exporters import export_expenses
+from .profiling import format_stats
+from .values import LEDGER_CURRENCY, cents_to_text, format_amount, format_day, format_entered_amount, month_range, to_currency, to_day
+
+# How often the GUI collects finished database work, in milliseconds
+WORKER_POLL_MS = 20
+
+# matplotlib takes a while to import, so it is loaded for the first chart
+def chart_panel(parent):
+    from .charts import ChartPanel
+    return ChartPanel(parent)
+
+# How often the GUI checks the change journal for writes by other programs, in milliseconds
+JOURNAL_POLL_MS = 2000
+
+# Pause in typing, in milliseconds, before the search box filters the view
+SEARCH_DEBOUNCE_MS = 250
+
+# Space taken by the Treeview column headings, in pixels
+TREEVIEW_HEADING_HEIGHT = 25
+
+# Whether a widget edits text, so that its keys, undo and redo among them, are its own
+def edits_text(widget):
+    return isinstance(widget, (tk.Entry, ttk.Entry, tk.Text, tk.Spinbox))
+
+# Runs database work on a dedicated thread so the Tk mainloop never waits on SQLite.
+# sqlite3 connections belong to the thread that opened them, so the worker opens its
+# own ExpenseTracker and every job is a function called with that tracker. Results
+# are queued and handed to their callbacks on the Tk thread by a root.after poll.
+class DatabaseWorker:
+    def __init__(self, root, database=DATABASE_PATH, on_busy=None, on_error=None, profile=DEFAULT_STORAGE_PROFILE, commit_window=0, profiler=None, busy_timeout=DEFAULT_BUSY_TIMEOUT):
+        self.root = root
+        self.database = database
+        self.busy_timeout = busy_timeout
+        self.profile = profile
+        self.commit_window = commit_window
+        self.profiler = profiler
+        self.on_busy = on_busy
+        self.on_error = on_error
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.request_ids = itertools.count(1)
+        # Newest request for each key; older requests with the same key are superseded
+        self.latest = {}
+        self.outstanding = set()
+        self.pending = 0
+        self.running = None
+        self.running_lock = threading.Lock()
+        self.connection = None
+        self.open_error = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="expense-db", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        # A database that cannot be opened or upgraded fails here, not in a job
+        if self.open_error is not None:
+            self.thread.join()
+            raise self.open_error
+        self.poll_id = self.root.after(WORKER_POLL_MS, self.poll)
+
+    # Queue job(tracker) to run on the database thread. on_done gets its return value
+    # and on_error any exception it raised, both on the Tk thread. Submitting a job
+    # with the same key as an unfinished one cancels the older job, interrupting its
+    # query if it is already running.
+    def submit(self, job, on_done=None, on_error=None, key=None):
+        request_id = next(self.request_ids)
+        if key is not None:
+            superseded = self.latest.get(key)
+            self.latest[key] = request_id
+            with self.running_lock:
+                if superseded is not None and self.running == superseded:
+                    self.connection.interrupt()
+        self.outstanding.add(request_id)
+        self.pending += 1
+        if self.pending == 1 and self.on_busy:
+            self.on_busy(True)
+        self.requests.put((request_id, key, job, on_done, on_error or self.on_error))
+        return request_id
+
+    def is_current(self, request_id, key):
+        return key is None or self.latest.get(key) == request_id
+
+    # Whether the newest job submitted with this key has not delivered its result yet
+    def is_loading(self, key):
+        return self.latest.get(key) in self.outstanding
+
+    # Database thread: run queued jobs in order until close() is called
+    def run(self):
+        try:
+            tracker = ExpenseTracker(self.database, self.profile, self.commit_window, self.profiler, self.busy_timeout)
+        except Exception as e:
+            self.open_error = e
+            self.ready.set()
+            return
+        self.connection = tracker.db
+        self.ready.set()
+        while True:
+            try:
+                # Wake up to commit grouped writes once their window has passed
+                request = self.requests.get(timeout=tracker.commit_delay())
+            except queue.Empty:
+                tracker.flush()
+                continue
+            if request is None:
+                break
+            request_id, key, job, on_done, on_error = request
+            if not self.is_current(request_id, key):
+                self.results.put((request_id, key, None, None))
+                continue
+            with self.running_lock:
+                self.running = request_id
+            try:
+                result = job(tracker)
+                callback = on_done
+            except Exception as e:
+                # Tracker writes undo their own partial changes when they fail
+                result = e
+                callback = on_error
+            with self.running_lock:
+                self.running = None
+            self.results.put((request_id, key, callback, result))
+        tracker.close()
+
+    # Tk thread: hand finished results to their callbacks
+    def poll(self):
+        while True:
+            try:
+                request_id, key, callback, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.outstanding.discard(request_id)
+            self.pending -= 1
+            if self.pending == 0 and self.on_busy:
+                self.on_busy(False)
+            if callback is not None and self.is_current(request_id, key):
+                callback(result)
+        self.poll_id = self.root.after(WORKER_POLL_MS, self.poll)
+
+    # Finish the queued work, including any pending writes, and close the connection
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+        self.root.after_cancel(self.poll_id)
+
+class ExpenseTrackerGUI:
+    # With a profiling.Profiler, queries and view refreshes are timed and F12 opens
+    # a window with the statistics
+    def __init__(self, root, database=DATABASE_PATH, profile=DEFAULT_STORAGE_PROFILE, commit_window=0, profiler=None, busy_timeout=DEFAULT_BUSY_TIMEOUT):
+        self.root = root
+        self.root.title("Expense Tracker")
+        bold_font = tkfont.Font(weight="bold")
+        self.profiler = profiler
+        
+        # All database work runs on a background thread with its own ExpenseTracker
+        self.worker = DatabaseWorker(
+            self.root, database, on_busy=self.set_busy, on_error=self.show_error,
+            profile=profile, commit_window=commit_window, profiler=profiler, busy_timeout=busy_timeout,
+        )
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        if profiler:
+            self.root.bind("<F12>", self.show_stats)
+        
+        # Button to open the Line Chart visualization
+        self.line_chart_button = ttk.Button(self.root, text="Show Line Chart", style='Accent.TButton', command=self.show_line_chart)
+        self.line_chart_button.grid(row=7, column=0, padx=5, pady=10)
+
+        # Button to open the bar chart visualization
+        self.bar_chart_button = ttk.Button(self.root, text="Show Bar Chart", style='Accent.TButton', command=self.show_bar_chart)
+        self.bar_chart_button.grid(row=7, column=1, padx=5, pady=10)
+        
+        # Button to open the pie chart visualization
+        self.pie_chart_button = ttk.Button(self.root, text="Show Pie Chart", style='Accent.TButton', command=self.show_pie_chart)
+        self.pie_chart_button.grid(row=7, column=2, pady=10) 
+
+        # Button to export the expenses matching the current filters
+        self.export_button = ttk.Button(self.root, text="Export View", style='Accent.TButton', command=self.export_view)
+        self.export_button.grid(row=7, column=3, padx=5, pady=10)
+        self.charts = None
+
+        # Undo and redo the last changes, from this window or any other program
+        self.undo_button = ttk.Button(self.root, text="Undo", style='Accent.TButton', command=self.undo)
+        self.undo_button.grid(row=7, column=4, padx=5, pady=10)
+        self.redo_button = ttk.Button(self.root, text="Redo", style='Accent.TButton', command=self.redo)
+        self.redo_button.grid(row=7, column=5, padx=5, pady=10)
+        self.root.bind("<Control-z>", self.undo)
+        self.root.bind("<Control-y>", self.redo)
+
+        # Currency the total and the charts are shown in; None for the ledger currency
+        self.report_currency = None
+        self.shown_chart = None
+        self.report_currency_combobox = ttk.Combobox(self.root, state="readonly", width=6, values=[LEDGER_CURRENCY])
+        self.report_currency_combobox.grid(row=7, column=6, padx=5, pady=10)
+        self.report_currency_combobox.set(LEDGER_CURRENCY)
+        self.report_currency_combobox.bind("<<ComboboxSelected>>", self.set_report_currency)
+
+        #Label to display total expenses
+        self.total_expenses_label = ttk.Label(self.root, text="Total Expenses: $0.00", font=bold_font)
+        self.total_expenses_label.grid(row=0, column=0, padx=5, pady=5, sticky='w')
+        
+        #Filter options: Category, location, and month
+        self.filter_category_label = ttk.Label(self.root, text="Category:", font=bold_font)
+        self.filter_category_label.grid(row=0, column=0, padx=5, pady=5, sticky="e")
+        self.filter_category_combobox = ttk.Combobox(self.root, state="readonly")
+        self.filter_category_combobox.grid(row=0, column=1, padx=(0, 5), pady=5, sticky="w")
+        self.filter_category_combobox.set("All Categories")
+
+        self.filter_location_label = ttk.Label(self.root, text="Location:", font=bold_font)
+        self.filter_location_label.grid(row=0, column=2, padx=5, pady=5, sticky="e")
+        self.filter_location_combobox = ttk.Combobox(self.root, state="readonly")
+        self.filter_location_combobox.grid(row=0, column=3, padx=5, pady=5)
+        self.filter_location_combobox.set("All Locations")
+
+        self.filter_month_label = ttk.Label(self.root, text="Month:", font=bold_font)
+        self.filter_month_label.grid(row=0, column=4, padx=5, pady=5, sticky="e")
+        self.filter_month_combobox = ttk.Combobox(self.root, state="readonly")
+        self.filter_month_combobox.grid(row=0, column=5, padx=5, pady=5)
+        self.filter_month_combobox.set("All Months")
+
+        self.filter_button = ttk.Button(self.root, text="Filter", style='Accent.TButton', command=self.filter_expenses)
+        self.filter_button.grid(row=0, column=6, padx=5, pady=5)
+
+        #Treeview to display the expenses 
+        self.treeview = ttk.Treeview(self.root, columns=("Date", "Category", "Amount", "Description", "Location"))
+        
+        #Define column headings for the treeview
+        self.treeview.heading("#0", text="ID")
+        self.treeview.heading("Date", text="Date")
+        self.treeview.heading("Category", text="Category")
+        self.treeview.heading("Amount", text="Amount")
+        self.treeview.heading("Description", text="Description")
+        self.treeview.heading("Location", text="Location")
+        self.treeview.column("#0", width=50, anchor="center")
+        self.treeview.column("Date", width=100)
+        self.treeview.column("Category", width=100)
+        self.treeview.column("Amount", width=100)
+        self.treeview.column("Description", width=200)
+        self.treeview.column("Location", width=100)
+        self.treeview.grid(row=1, column=0, columnspan=7, sticky="nsew")
+
+        # Only the visible window of rows is loaded; the scrollbar maps it onto the whole result
+        self.scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=self.scroll_treeview)
+        self.scrollbar.grid(row=1, column=7, sticky="ns")
+        self.treeview.bind("<MouseWheel>", self.on_mousewheel)
+        self.treeview.bind("<Button-4>", self.on_mousewheel)
+        self.treeview.bind("<Button-5>", self.on_mousewheel)
+        self.treeview.bind("<Configure>", self.on_treeview_resize)
+        self.view_filter = {}
+        self.view_order = None
+        self.view_offset = 0
+        self.view_count = 0
+        self.view_total = 0
+        self.view_rows = []
+        self.scroll_step = 0
+        self.page_size = VIEW_PAGE_SIZE
+
+        #Buttons that allow user to add/delete expenses  
+        self.add_expense_button = ttk.Button(self.root, text="Add Expense", style='Accent.TButton', command=self.open_add_expense_window)
+        self.add_expense_button.grid(row=2, column=0, pady=10)
+        self.remove_expense_button = ttk.Button(self.root, text="Remove Expense", style='Accent.TButton', command=self.remove_selected_expense)
+        self.remove_expense_button.grid(row=2, column=1, pady=10)
+        
+        # Creates a button that allows user to edit expenses 
+        edit_button = ttk.Button(self.root, text="Edit Expense", style='Accent.TButton', command=self.edit_selected_expense)
+        edit_button.grid(row=2, column=2, pady=10)
+
+        # Busy indicator, animated while database work is pending
+        self.busy_indicator = ttk.Progressbar(self.root, mode="indeterminate", length=100)
+        self.busy_indicator.grid(row=2, column=6, padx=5, pady=10)
+
+        # Search box over descriptions, applied as the user types
+        self.search_label = ttk.Label(self.root, text="Search:", font=bold_font)
+        self.search_label.grid(row=2, column=3, padx=5, pady=10, sticky="e")
+        self.search_text = tk.StringVar()
+        self.search_entry = ttk.Entry(self.root, textvariable=self.search_text)
+        self.search_entry.grid(row=2, column=4, columnspan=2, padx=5, pady=10, sticky="ew")
+        self.search_pending = None
+        self.search_text.trace_add("write", self.on_search_changed)
+        
+        #Ability to sort the data by ascending/descending order
+        self.data_sort_order = None
+        self.price_sort_order = None
+        self.treeview.heading("Date", text="Date", command=self.sort_by_data)
+        self.treeview.heading("Amount", text="Amount", command=self.sort_by_price)
+
+        self.root.grid_rowconfigure(1, weight=1)
+        self.root.grid_columnconfigure((0, 1), weight=1)
+
+        # Recurring expenses due by today are written before the first view loads,
+        # which then follows the change journal from its current end
+        self.journal_seq = None
+
+        def start(tracker):
+            tracker.materialize_recurring(dt_date.today())
+            self.journal_seq = tracker.journal_position()
+
+        self.worker.submit(start)
+        self.update_dropdown_menus()
+        self.update_expenses()
+        self.journal_poll_id = self.root.after(JOURNAL_POLL_MS, self.poll_journal)
+    
+    def update_dropdown_menus(self):
+        # Retrieve distinct values for categories, locations, and months from the tracker
+        self.worker.submit(
+            lambda tracker: (
+                tracker.get_distinct_values("category"),
+                tracker.get_distinct_values("location"),
+                tracker.get_distinct_months(),
+                tracker.get_currencies(),
+            ),
+            self.set_dropdown_values,
+            key="dropdowns",
+        )
+
+    def set_dropdown_values(self, values):
+        categories, locations, months, currencies = values
+        # Insert "All Categories", "All Locations", and "All Months" at the beginning of the respective lists
+        categories.insert(0, "All Categories")
+        locations.insert(0, "All Locations")
+        months.insert(0, "All Months")
+        # Update the dropdown menus with the retrieved values
+        self.filter_category_combobox['values'] = categories
+        self.filter_location_combobox['values'] = locations
+        self.filter_month_combobox['values'] = months
+        self.report_currency_combobox['values'] = [LEDGER_CURRENCY] + currencies
+
+    def filter_expenses(self):
+        # Retrieve selected category, location, and month from the dropdown menus
+        category = self.filter_category_combobox.get()
+        location = self.filter_location_combobox.get()
+        month = self.filter_month_combobox.get()
+        # Convert the selected month to a date range if it is not "All Months"
+        start = end = None
+        if month != "All Months":
+            selected = datetime.strptime(month, "%B %Y")
+            start, end = month_range(selected.year, selected.month)
+        # Remember the filter so paging, sorting and edits keep applying it
+        self.view_filter = {
+            "category": None if category == "All Categories" else category,
+            "location": None if location == "All Locations" else location,
+            "start": start,
+            "end": end,
+            "text": self.search_text.get().strip() or None,
+        }
+        self.update_expenses()
+
+    # Filter again once typing in the search box pauses. Each new view request
+    # supersedes the previous one, so a slow search is interrupted, not waited for.
+    def on_search_changed(self, *args):
+        if self.search_pending is not None:
+            self.root.after_cancel(self.search_pending)
+        self.search_pending = self.root.after(SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        self.search_pending = None
+        self.filter_expenses()
+
+    def update_expenses(self):
+        # Count and total the expenses matching the current filter, then show the first window
+        view_filter = dict(self.view_filter)
+        order_by = self.view_order or "id"
+        page_size = self.page_size
+        currency = self.report_currency
+
+        def load(tracker):
+            count, total = tracker.get_summary(currency=currency, **view_filter)
+            return count, total, tracker.query_page(order_by=order_by, limit=page_size, **view_filter)
+
+        self.worker.submit(load, self.timed_refresh("update_expenses", self.show_expenses), key="view")
+
+    def show_expenses(self, result):
+        self.view_count, self.view_total, expenses = result
+        self.view_offset = 0
+        self.show_window(expenses)
+        self.update_total_expenses(self.view_total)
+        
+    # Function to load the visible window of expenses into the Treeview
+    def update_treeview(self, sort_column=None):
+        # Sorting is done by the database; each click flips between ascending and descending
+        if sort_column == "Date":
+            self.view_order = "-date" if self.data_sort_order == "desc" else "date"
+            self.data_sort_order = "asc" if self.data_sort_order == "desc" else "desc"
+            self.view_offset = 0
+            
+        # Sort expenses based on the amount column
+        elif sort_column == "Amount":
+            self.view_order = "-amount" if self.price_sort_order == "desc" else "amount"
+            self.price_sort_order = "asc" if self.price_sort_order == "desc" else "desc"
+            self.view_offset = 0
+
+        self.view_offset = max(0, min(self.view_offset, self.view_count - self.page_size))
+        view_filter = dict(self.view_filter)
+        order_by = self.view_order or "id"
+        page_size = self.page_size
+        offset = self.view_offset
+        if offset == 0:
+            # First and last pages are index seeks, so flipping the sort order stays cheap
+            load = lambda tracker: tracker.query_page(order_by=order_by, limit=page_size, **view_filter)
+        elif offset == self.view_count - page_size:
+            load = lambda tracker: tracker.query_page(order_by=order_by, limit=page_size, last=True, **view_filter)
+        else:
+            load = lambda tracker: tracker.query(order_by=order_by, limit=page_size, offset=offset, with_total=False, **view_filter)[0]
+        self.worker.submit(load, self.timed_refresh("update_treeview", self.show_window), key="view")
+
+    # When profiling, wrap a view callback so the refresh is timed from the request
+    # until its rows are on screen. Superseded refreshes are never shown or counted.
+    def timed_refresh(self, name, callback):
+        if not self.profiler:
+            return callback
+        started = time.perf_counter()
+
+        def done(result):
+            callback(result)
+            self.profiler.record_timer(name, time.perf_counter() - started)
+        return done
+
+    # Replace the rows of the previous window
+    def show_window(self, expenses):
+        self.treeview.delete(*self.treeview.get_children())
+        for expense in expenses:
+            self.treeview.insert("", "end", iid=expense[0], text=expense[0], values=self.format_expense(expense))
+        self.view_rows = expenses
+        self.update_scrollbar()
+        # Update the root window to reflect the changes
+        self.root.update_idletasks()
+        self.scroll_pending()
+
+    # Values shown in the Treeview columns for an expense row. Rows from query_page
+    # and from the journal both end with the currency and the entered amount.
+    def format_expense(self, expense):
+        return (format_day(expense[1]), expense[2], format_entered_amount(expense[3], expense[-2], expense[-1]), expense[4], expense[5])
+
+    # Check whether an expense belongs in the current filtered view
+    def matches_view(self, expense):
+        category = self.view_filter.get("category")
+        location = self.view_filter.get("location")
+        start = self.view_filter.get("start")
+        end = self.view_filter.get("end")
+        text = self.view_filter.get("text")
+        if category is not None and expense[2] != category:
+            return False
+        if location is not None and expense[5] != location:
+            return False
+        if start is not None and expense[1] < to_day(start):
+            return False
+        if end is not None and expense[1] >= to_day(end):
+            return False
+        if text and not matches_search(text, expense[4]):
+            return False
+        return True
+
+    # Database-thread half of every write: the journal entries since the last pull,
+    # the write's own and those of other programs. Only the database thread moves
+    # journal_seq, so each entry is pulled once whatever order jobs are queued in.
+    def pull_changes(self, tracker):
+        self.journal_seq, changes = tracker.changes_since(self.journal_seq)
+        return changes
+
+    # Look for changes made by other programs. Pulls are never superseded, since
+    # a pull that ran but was not shown would lose its entries.
+    def poll_journal(self):
+        self.worker.submit(self.pull_changes, self.apply_changes)
+        self.journal_poll_id = self.root.after(JOURNAL_POLL_MS, self.poll_journal)
+
+    # Apply (old expense, new expense) pairs from changes_since to the view without
+    # reloading it; None means too much changed, so the view is loaded again
+    def apply_changes(self, changes):
+        if changes is None:
+            self.update_dropdown_menus()
+            self.update_expenses()
+            return
+        if not changes:
+            return
+        reload_window = False
+        for old_expense, new_expense in changes:
+            shown = len(self.treeview.get_children())
+            at_tail = self.view_offset + shown >= self.view_count
+            if old_expense is not None and self.matches_view(old_expense):
+                self.view_count -= 1
+                self.view_total -= old_expense[3]
+            if new_expense is None or not self.matches_view(new_expense):
+                if old_expense is not None and self.treeview.exists(old_expense[0]):
+                    self.treeview.delete(old_expense[0])
+                    self.view_rows = [row for row in self.view_rows if row[0] != old_expense[0]]
+                continue
+            self.view_count += 1
+            self.view_total += new_expense[3]
+            if self.treeview.exists(new_expense[0]):
+                # Edited in place
+                self.treeview.item(new_expense[0], values=self.format_expense(new_expense))
+                self.view_rows = [new_expense if row[0] == new_expense[0] else row for row in self.view_rows]
+            elif old_expense is None and self.view_order is None and at_tail and shown < self.page_size and (not self.view_rows or new_expense[0] > self.view_rows[-1][0]):
+                # New ids sort last, so it goes at the end of a window showing the tail
+                self.treeview.insert("", "end", iid=new_expense[0], text=new_expense[0], values=self.format_expense(new_expense))
+                self.view_rows.append(new_expense)
+            elif self.view_order is not None or at_tail and shown < self.page_size or self.view_rows and new_expense[0] < self.view_rows[-1][0]:
+                # Its position depends on the sort order, or it joins the filter inside
+                # the window (an edit, or an expense put back by undo), so reload just
+                # the visible window
+                reload_window = True
+        if reload_window:
+            self.update_treeview()
+        self.update_dropdown_menus()
+        self.update_scrollbar()
+        if self.report_currency is None:
+            self.update_total_expenses(self.view_total)
+        else:
+            # The changes are in the ledger currency, so the converted total is read again
+            self.refresh_total()
+
+    # Position the scrollbar thumb to show where the window sits in the whole result
+    def update_scrollbar(self):
+        if self.view_count:
+            first = self.view_offset / self.view_count
+            last = min(1.0, (self.view_offset + self.page_size) / self.view_count)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    # Scrollbar command: ("moveto", fraction) or ("scroll", n, "units"/"pages")
+    def scroll_treeview(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.view_count))
+        else:
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.page_size
+            self.scroll_by(step)
+
+    # Jump to an arbitrary position, e.g. when the scrollbar thumb is dragged
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, self.view_count - self.page_size))
+        if offset != self.view_offset:
+            self.view_offset = offset
+            self.update_treeview()
+
+    # Move the window by a number of rows, fetching only the rows that come into view
+    # with a keyset seek from the first or last visible row
+    def scroll_by(self, step):
+        if self.worker.is_loading("view"):
+            # Wait for the window being loaded, then scroll from there
+            self.scroll_step += step
+            return
+        step = max(-self.view_offset, min(step, self.view_count - self.page_size - self.view_offset))
+        if step == 0 or not self.view_rows or abs(step) >= self.page_size:
+            self.scroll_to(self.view_offset + step)
+            return
+        view_filter = dict(self.view_filter)
+        order_by = self.view_order or "id"
+        if step > 0:
+            after = page_key(self.view_rows[-1], order_by)
+            load = lambda tracker: tracker.query_page(order_by=order_by, limit=step, after=after, **view_filter)
+        else:
+            before = page_key(self.view_rows[0], order_by)
+            load = lambda tracker: tracker.query_page(order_by=order_by, limit=-step, before=before, **view_filter)
+        self.worker.submit(load, lambda rows: self.shift_window(step, rows), key="view")
+
+    # Drop the rows scrolled out of view and add the ones scrolled in
+    def shift_window(self, step, rows):
+        if step > 0:
+            dropped = self.view_rows[:len(rows)]
+            self.view_rows = self.view_rows[len(rows):] + rows
+            self.view_offset += len(rows)
+        else:
+            keep = max(0, self.page_size - len(rows))
+            dropped = self.view_rows[keep:]
+            self.view_rows = rows + self.view_rows[:keep]
+            self.view_offset -= len(rows)
+        self.treeview.delete(*[expense[0] for expense in dropped])
+        for index, expense in enumerate(rows):
+            position = "end" if step > 0 else index
+            self.treeview.insert("", position, iid=expense[0], text=expense[0], values=self.format_expense(expense))
+        self.update_scrollbar()
+        self.scroll_pending()
+
+    # Apply scrolling that arrived while a window was loading
+    def scroll_pending(self):
+        step, self.scroll_step = self.scroll_step, 0
+        if step:
+            self.scroll_by(step)
+
+    def on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_by(-3)
+        else:
+            self.scroll_by(3)
+        return "break"
+
+    # Load as many rows as fit in the Treeview after it is resized
+    def on_treeview_resize(self, event):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        page_size = max(1, (event.height - TREEVIEW_HEADING_HEIGHT) // row_height + 1)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.update_treeview()
+
+    def sort_by_data(self):
+        self.update_treeview(sort_column="Date")
+
+    def sort_by_price(self):
+        self.update_treeview(sort_column="Amount")
+
+    # Open a new window for adding an expense
+    def open_add_expense_window(self):
+        self.add_window = tk.Toplevel(self.root)
+        self.add_window.title("Add Expense")
+
+        date_label = ttk.Label(self.add_window, text="Date:")
+        date_label.grid(row=0, column=0, padx=5, pady=5)
+
+        self.date_picker = DateEntry(self.add_window)
+        self.date_picker.grid(row=0, column=1, padx=5, pady=5)
+
+        category_label = ttk.Label(self.add_window, text="Category:")
+        category_label.grid(row=1, column=0, padx=5, pady=5)
+        self.category_entry = ttk.Entry(self.add_window)
+        self.category_entry.grid(row=1, column=1, padx=5, pady=5)
+
+        amount_label = ttk.Label(self.add_window, text="Amount:")
+        amount_label.grid(row=2, column=0, padx=5, pady=5)
+        self.amount_entry = ttk.Entry(self.add_window)
+        self.amount_entry.grid(row=2, column=1, padx=5, pady=5)
+
+        description_label = ttk.Label(self.add_window, text="Description:")
+        description_label.grid(row=3, column=0, padx=5, pady=5)
+        self.description_entry = ttk.Entry(self.add_window)
+        self.description_entry.grid(row=3, column=1, padx=5, pady=5)
+
+        location_label = ttk.Label(self.add_window, text="Location:")
+        location_label.grid(row=4, column=0, padx=5, pady=5)
+        self.location_entry = ttk.Entry(self.add_window)
+        self.location_entry.grid(row=4, column=1, padx=5, pady=5)
+
+        currency_label = ttk.Label(self.add_window, text="Currency:")
+        currency_label.grid(row=5, column=0, padx=5, pady=5)
+        self.currency_entry = ttk.Entry(self.add_window)
+        self.currency_entry.grid(row=5, column=1, padx=5, pady=5)
+        self.currency_entry.insert(tk.END, LEDGER_CURRENCY)
+
+        add_button = ttk.Button(self.add_window, text="Add", style='Accent.TButton', command=lambda: self.add_expense(
+            self.date_picker.get_date(),
+            self.category_entry.get(),
+            self.amount_entry.get(),
+            self.description_entry.get(),
+            self.location_entry.get(),
+            self.currency_entry.get()
+        ))
+        add_button.grid(row=6, column=0, columnspan=2, padx=5, pady=5)
+
+        clear_button = ttk.Button(self.add_window, text="Clear", style='Accent.TButton', command=self.clear_fields)
+        clear_button.grid(row=7, column=0, columnspan=2, padx=5, pady=5)
+
+    # Clear all the entry fields in the add expense window
+    def clear_fields(self):
+        self.date_picker.set_date(None)  # Clear the date picker
+        self.category_entry.delete(0, tk.END)
+        self.amount_entry.delete(0, tk.END)
+        self.description_entry.delete(0, tk.END)
+        self.location_entry.delete(0, tk.END)
+
+    # Add the expense to the tracker
+    def add_expense(self, date, category, amount, description, location, currency=None):
+        def add(tracker):
+            tracker.add_expense(date, category, amount, description, location, currency)
+            return self.pull_changes(tracker), tracker.over_budget(date, category)
+
+        def added(result):
+            changes, over = result
+            self.apply_changes(changes)
+            self.warn_over_budget(over)
+
+        self.worker.submit(add, added)
+
+    # Tell the user about budgets the last change went over
+    def warn_over_budget(self, over):
+        if over:
+            messagebox.showwarning("Budget", "\n".join(
+                "%s is %s over its %s budget." % (category, format_amount(-remaining), format_amount(budget))
+                for category, budget, spent, remaining in over
+            ))
+            
+    # Ids of the expenses selected in the Treeview
+    def selected_expense_ids(self):
+        return [self.treeview.item(item)["text"] for item in self.treeview.selection()]
+
+    # Remove the selected expenses, all in one transaction
+    def remove_selected_expense(self):
+        expense_ids = self.selected_expense_ids()
+        if expense_ids:
+            def remove(tracker):
+                tracker.remove_expenses(expense_ids)
+                return self.pull_changes(tracker)
+
+            self.worker.submit(remove, self.apply_changes)
+
+    # Update the total expenses label with the formatted total expenses
+    def update_total_expenses(self, total_expenses):
+        self.total_expenses_label.config(text="Total Expenses: " + format_amount(total_expenses, self.report_currency))
+
+    # Read the total of the current view again, converted to the reporting currency
+    def refresh_total(self):
+        view_filter = dict(self.view_filter)
+        currency = self.report_currency
+
+        def shown(total):
+            self.view_total = total
+            self.update_total_expenses(total)
+
+        self.worker.submit(lambda tracker: tracker.get_summary(currency=currency, **view_filter)[1], shown, key="total")
+
+    # Show the total and the chart on screen in the currency picked
+    def set_report_currency(self, event=None):
+        self.report_currency = to_currency(self.report_currency_combobox.get())
+        self.update_expenses()
+        if self.shown_chart is not None:
+            self.shown_chart()
+        
+    # Edit the selected expense, or all of the selected expenses together
+    def edit_selected_expense(self):
+        expense_ids = self.selected_expense_ids()
+        selected_item = self.treeview.focus()
+        if len(expense_ids) > 1:
+            self.open_batch_edit_window(expense_ids)
+        elif selected_item:
+            expense_id = self.treeview.item(selected_item)["text"]
+            self.worker.submit(lambda tracker: tracker.get_expense_by_id(expense_id), self.open_found_expense)
+        else:
+            messagebox.showerror("Error", "No expense selected.")
+
+    def open_found_expense(self, expense):
+        if expense:
+            self.open_edit_expense_window(expense)
+        else:
+            messagebox.showerror("Error", "Expense not found.")
+            
+    # Open a new window for editing an expense
+    def open_edit_expense_window(self, expense):
+        self.edit_window = tk.Toplevel(self.root)
+        self.edit_window.title("Edit Expense")
+
+        date_label = ttk.Label(self.edit_window, text="Date:")
+        date_label.pack()
+
+        self.date_picker = DateEntry(self.edit_window)
+        self.date_picker.pack()
+        self.date_picker.set_date(dt_date.fromordinal(expense[1]))
+
+        category_label = ttk.Label(self.edit_window, text="Category:")
+        category_label.pack()
+
+        self.category_entry = ttk.Entry(self.edit_window)
+        self.category_entry.pack()
+        self.category_entry.insert(tk.END, expense[2])
+
+        amount_label = ttk.Label(self.edit_window, text="Amount:")
+        amount_label.pack()
+
+        self.amount_entry = ttk.Entry(self.edit_window)
+        self.amount_entry.pack()
+        self.amount_entry.insert(tk.END, cents_to_text(expense[3] if expense[8] is None else expense[9]))
+
+        description_label = ttk.Label(self.edit_window, text="Description:")
+        description_label.pack()
+
+        self.description_entry = ttk.Entry(self.edit_window)
+        self.description_entry.pack()
+        self.description_entry.insert(tk.END, expense[4])
+
+        location_label = ttk.Label(self.edit_window, text="Location:")
+        location_label.pack()
+
+        self.location_text = tk.StringVar()
+        self.location_entry = ttk.Entry(self.edit_window, textvariable=self.location_text)
+        self.location_entry.pack()
+        self.location_text.set(expense[5])
+
+        currency_label = ttk.Label(self.edit_window, text="Currency:")
+        currency_label.pack()
+
+        self.currency_entry = ttk.Entry(self.edit_window)
+        self.currency_entry.pack()
+        self.currency_entry.insert(tk.END, expense[8] or LEDGER_CURRENCY)
+
+        save_button = ttk.Button(self.edit_window, text="Save", style='Accent.TButton', command=self.save_changes)
+        save_button.pack(pady=10)
+
+        # Store the expense ID and the version it was opened at for save_changes, so
+        # saving does not overwrite changes made meanwhile by another tracker
+        self.edit_window.expense_id = expense[0]
+        self.edit_window.expense_version = expense[7]
+
+    # Save the changes made to an expense
+    def save_changes(self):
+        expense_id = self.edit_window.expense_id
+        expense_version = self.edit_window.expense_version
+        date = self.date_picker.get_date()
+        category = self.category_entry.get()
+        amount = self.amount_entry.get()
+        description = self.description_entry.get()
+        location = self.location_entry.get()
+        currency = self.currency_entry.get()
+
+        edit_window = self.edit_window
+
+        def edit(tracker):
+            tracker.edit_expense(expense_id, date, category, amount, description, location, expense_version, currency)
+            return self.pull_changes(tracker), tracker.over_budget(date, category)
+
+        def saved(result):
+            changes, over = result
+            edit_window.destroy()
+            self.apply_changes(changes)
+            self.warn_over_budget(over)
+
+        self.worker.submit(edit, saved)
+
+    # Window for changing several expenses at once. Only the fields filled in are
+    # changed, so entering just a category re-categorizes the selection.
+    def open_batch_edit_window(self, expense_ids):
+        batch_window = tk.Toplevel(self.root)
+        batch_window.title("Edit %d Expenses" % len(expense_ids))
+        entries = {}
+        for row, (field, text) in enumerate((
+            ("date", "Date (YYYY-MM-DD):"),
+            ("category", "Category:"),
+            ("amount", "Amount:"),
+            ("description", "Description:"),
+            ("location", "Location:"),
+            ("currency", "Currency:"),
+        )):
+            label = ttk.Label(batch_window, text=text)
+            label.grid(row=row, column=0, padx=5, pady=5, sticky="e")
+            entries[field] = ttk.Entry(batch_window)
+            entries[field].grid(row=row, column=1, padx=5, pady=5)
+        note_label = ttk.Label(batch_window, text="Fields left empty are not changed.")
+        note_label.grid(row=6, column=0, columnspan=2, padx=5, pady=5)
+
+        def save():
+            fields = {field: entry.get().strip() or None for field, entry in entries.items()}
+
+            def edit(tracker):
+                tracker.edit_expenses(expense_ids, **fields)
+                return self.pull_changes(tracker)
+
+            def saved(changes):
+                batch_window.destroy()
+                self.apply_changes(changes)
+
+            self.worker.submit(edit, saved)
+
+        save_button = ttk.Button(batch_window, text="Save", style='Accent.TButton', command=save)
+        save_button.grid(row=7, column=0, columnspan=2, pady=10)
+
+    # Undo the last change batch, whoever made it. Ctrl+Z pressed while typing is
+    # left to the text field.
+    def undo(self, event=None):
+        if event is not None and edits_text(event.widget):
+            return
+        def undo(tracker):
+            return tracker.undo(), self.pull_changes(tracker)
+        self.worker.submit(undo, self.show_undone)
+
+    def redo(self, event=None):
+        if event is not None and edits_text(event.widget):
+            return
+        def redo(tracker):
+            return tracker.redo(), self.pull_changes(tracker)
+        self.worker.submit(redo, self.show_undone)
+
+    def show_undone(self, result):
+        label, changes = result
+        self.apply_changes(changes)
+        if label is None:
+            self.root.bell()
+    
+    def load_expenses(self):
+        # Reload the current view from the database
+        self.update_expenses()
+        
+    # Charts are drawn in a panel below the buttons from ExpenseAnalytics results,
+    # which are only recomputed after the expenses change, in the reporting currency
+    def show_bar_chart(self):
+        self.shown_chart = self.show_bar_chart
+        currency = self.report_currency
+        self.worker.submit(lambda tracker: tracker.analytics.totals("category", currency=currency), lambda totals: self.show_chart("bar", totals), key="chart")
+
+    def show_line_chart(self):
+        self.shown_chart = self.show_line_chart
+        currency = self.report_currency
+
+        def trends(tracker):
+            return tracker.analytics.monthly_totals(currency=currency), tracker.analytics.rolling_average(3, currency=currency)
+
+        self.worker.submit(trends, lambda result: self.show_chart("line", result), key="chart")
+
+    def show_pie_chart(self):
+        self.shown_chart = self.show_pie_chart
+        currency = self.report_currency
+        self.worker.submit(lambda tracker: tracker.analytics.totals("category", currency=currency), lambda totals: self.show_chart("pie", totals), key="chart")
+
+    def show_chart(self, kind, data):
+        if self.charts is None:
+            self.charts = chart_panel(self.root)
+            self.charts.widget.grid(row=8, column=0, columnspan=8, padx=5, pady=5, sticky="nsew")
+        self.charts.show(kind, data)
+
+    # Stream the expenses in the current filtered view to a CSV, JSONL or Parquet file
+    def export_view(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet")],
+        )
+        if not path:
+            return
+        view_filter = dict(self.view_filter)
+
+        def export(tracker):
+            return export_expenses(tracker, path, **view_filter)
+
+        def exported(count):
+            messagebox.showinfo("Export", "Exported %d expenses to %s" % (count, path))
+
+        self.worker.submit(export, exported)
+        
+        
+    # Busy indicator callback from the database worker
+    def set_busy(self, busy):
+        if busy:
+            self.busy_indicator.start(10)
+        else:
+            self.busy_indicator.stop()
+
+    def show_error(self, error):
+        messagebox.showerror("Error", str(error))
+
+    # Debug window with the query and refresh statistics collected so far
+    def show_stats(self, event=None):
+        stats_window = tk.Toplevel(self.root)
+        stats_window.title("Query Statistics")
+        stats_text = tk.Text(stats_window, width=160, height=40, wrap="none", font="TkFixedFont")
+        stats_text.grid(row=0, column=0, sticky="nsew")
+        stats_window.grid_rowconfigure(0, weight=1)
+        stats_window.grid_columnconfigure(0, weight=1)
+
+        def refresh():
+            stats_text.delete("1.0", "end")
+            stats_text.insert("1.0", format_stats(self.profiler.snapshot()))
+        refresh_button = ttk.Button(stats_window, text="Refresh", style='Accent.TButton', command=refresh)
+        refresh_button.grid(row=1, column=0, pady=5)
+        refresh()
+
+    # Let queued writes finish before the window goes away
+    def close(self):
+        self.root.after_cancel(self.journal_poll_id)
+        self.worker.close()
+        self.root.destroy()
+
+    def run(self):
+        self.root.mainloop()
+
+
+# Start the Tk application on the given database
+def run_gui(database=DATABASE_PATH, profile=DEFAULT_STORAGE_PROFILE, commit_window=0, profiler=None, busy_timeout=DEFAULT_BUSY_TIMEOUT):
+    root = tk.Tk()
+    root.tk.call('source', r'C:\Users\Josh\Downloads\Forest-ttk-theme-master\Forest-ttk-theme-master\forest-dark.tcl')
+    ttk.Style().theme_use('forest-dark')
+    root.grid_rowconfigure(1, weight=1)  # Make the expenses listbox row expand vertically
+    root.grid_columnconfigure((0, 1), weight=1)  # Make the columns expand horizontally
+    try:
+        app = ExpenseTrackerGUI(root, database, profile, commit_window, profiler, busy_timeout)
+    except Exception as e:
+        messagebox.showerror("Error", "Cannot open %s: %s" % (database, e))
+        root.destroy()
+        raise
+    app.run()
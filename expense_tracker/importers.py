@@ -0,0 +1,100 @@
+import csv
+import json
+import os
+import re
+
+# Category given to OFX transactions, which carry no category of their own
+OFX_DEFAULT_CATEGORY = "Uncategorized"
+
+# Stream expenses from a CSV file with a header row naming the expense fields
+def iter_csv_expenses(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [name.strip().lower() for name in header]
+        for row in reader:
+            if not row:
+                continue
+            yield reader.line_num, dict(zip(columns, row))
+
+# Stream expenses from a file holding one JSON object per line
+def iter_jsonl_expenses(path):
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                record = None
+            yield line_no, record
+
+# Stream debit transactions from an OFX bank statement (SGML or XML flavour).
+# Debits become positive amounts; credits come through negative and are rejected.
+def iter_ofx_expenses(path, category=OFX_DEFAULT_CATEGORY):
+    tag = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+    transaction = None
+    start_line = 0
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line_no, line in enumerate(f, 1):
+            for closing, name, value in tag.findall(line):
+                name = name.upper()
+                if name == 'STMTTRN':
+                    if not closing:
+                        transaction = {}
+                        start_line = line_no
+                    elif transaction is not None:
+                        yield start_line, ofx_transaction_to_expense(transaction, category)
+                        transaction = None
+                elif transaction is not None and not closing:
+                    transaction[name] = value.strip()
+
+def ofx_transaction_to_expense(transaction, category):
+    posted = transaction.get('DTPOSTED', '')[:8]
+    if len(posted) == 8:
+        posted = posted[:4] + '-' + posted[4:6] + '-' + posted[6:]
+    amount = transaction.get('TRNAMT', '')
+    try:
+        amount = -float(amount)
+    except ValueError:
+        pass
+    name = transaction.get('NAME') or transaction.get('PAYEE', '')
+    return {
+        "date": posted,
+        "category": category,
+        "amount": amount,
+        "description": transaction.get('MEMO') or name,
+        "location": name,
+    }
+
+IMPORT_READERS = {
+    "csv": iter_csv_expenses,
+    "jsonl": iter_jsonl_expenses,
+    "ofx": iter_ofx_expenses,
+}
+
+# Pick a reader from the file extension unless a format is given explicitly
+def read_expense_file(path, file_format=None):
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format in ("json", "ndjson"):
+            file_format = "jsonl"
+        elif file_format == "qfx":
+            file_format = "ofx"
+    if file_format not in IMPORT_READERS:
+        raise ValueError("Unsupported import format: %s" % file_format)
+    return IMPORT_READERS[file_format](path)
+
+# Exchange rates come as CSV or JSON Lines records with date, currency and rate fields
+def read_rate_file(path):
+    file_format = os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format in ("jsonl", "json", "ndjson"):
+        return iter_jsonl_expenses(path)
+    if file_format == "csv":
+        return iter_csv_expenses(path)
+    raise ValueError("Exchange rates must be a .csv or .jsonl file, not %s" % path)
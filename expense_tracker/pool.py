@@ -0,0 +1,90 @@
+import queue
+import threading
+
+from .core import DATABASE_PATH, DEFAULT_BUSY_TIMEOUT, DEFAULT_STORAGE_PROFILE, ExpenseTracker
+
+# Shares one database between threads. Each thread reads through a read-only
+# tracker of its own, opened on first use, so queries run side by side under WAL;
+# every write goes to a single writer thread that applies them one at a time, in
+# the order they were submitted, with group commit if commit_window is set.
+class TrackerPool:
+    def __init__(self, database=DATABASE_PATH, profile=DEFAULT_STORAGE_PROFILE, commit_window=0, profiler=None, busy_timeout=DEFAULT_BUSY_TIMEOUT):
+        self.database = database
+        self.profile = profile
+        self.commit_window = commit_window
+        self.profiler = profiler
+        self.busy_timeout = busy_timeout
+        self.local = threading.local()
+        self.readers = []
+        self.readers_lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.opened = queue.Queue()
+        # The writer opens first so the schema is up to date before any reader
+        self.thread = threading.Thread(target=self.run, name="expense-writer", daemon=True)
+        self.thread.start()
+        error = self.opened.get()
+        if error is not None:
+            self.thread.join()
+            raise error
+
+    # The calling thread's read-only tracker
+    def reader(self):
+        tracker = getattr(self.local, "tracker", None)
+        if tracker is None:
+            tracker = ExpenseTracker(self.database, self.profile, profiler=self.profiler, busy_timeout=self.busy_timeout, read_only=True)
+            self.local.tracker = tracker
+            with self.readers_lock:
+                self.readers.append(tracker)
+        return tracker
+
+    # Call job(tracker) with the calling thread's reader and return its result
+    def read(self, job):
+        return job(self.reader())
+
+    # Call job(tracker) on the writer thread and wait for it; its return value is
+    # returned and any exception it raised is raised here
+    def write(self, job):
+        done = threading.Event()
+        outcome = []
+        self.requests.put((job, done, outcome))
+        done.wait()
+        result, error = outcome[0]
+        if error is not None:
+            raise error
+        return result
+
+    # Writer thread: apply queued writes in order until close() is called
+    def run(self):
+        try:
+            tracker = ExpenseTracker(self.database, self.profile, self.commit_window, self.profiler, self.busy_timeout)
+        except Exception as e:
+            self.opened.put(e)
+            return
+        self.opened.put(None)
+        while True:
+            try:
+                # Wake up to commit grouped writes once their window has passed
+                request = self.requests.get(timeout=tracker.commit_delay())
+            except queue.Empty:
+                tracker.flush()
+                continue
+            if request is None:
+                break
+            job, done, outcome = request
+            try:
+                outcome.append((job(tracker), None))
+            except Exception as e:
+                # Tracker writes undo their own partial changes when they fail
+                outcome.append((None, e))
+            done.set()
+        tracker.close()
+
+    # Commit the queued writes and close every connection. Reader threads must
+    # have finished with the pool.
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+        with self.readers_lock:
+            for tracker in self.readers:
+                tracker.close()
+            self.readers = []
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in seconds; the last bucket is open
+HISTOGRAM_BOUNDS = (0.0001, 0.001, 0.01, 0.1, 1.0)
+HISTOGRAM_LABELS = ("<0.1ms", "<1ms", "<10ms", "<100ms", "<1s", ">=1s")
+
+# Statements slower than this are logged, in milliseconds
+DEFAULT_SLOW_QUERY_MS = 100
+
+slow_query_log = logging.getLogger("expense_tracker.slow_queries")
+
+# One SQL statement per line, however it was laid out in the source
+def normalize_sql(sql):
+    return " ".join(sql.split())
+
+def new_stats():
+    return {"calls": 0, "seconds": 0.0, "max": 0.0, "rows": 0, "histogram": [0] * len(HISTOGRAM_LABELS)}
+
+def add_stats(stats, seconds, rows=0, calls=1):
+    stats["calls"] += calls
+    stats["seconds"] += seconds
+    stats["max"] = max(stats["max"], seconds)
+    stats["rows"] += rows
+    bucket = len(HISTOGRAM_BOUNDS)
+    for index, bound in enumerate(HISTOGRAM_BOUNDS):
+        if seconds < bound:
+            bucket = index
+            break
+    stats["histogram"][bucket] += calls
+
+# Opt-in instrumentation. Connections from connect() time every statement, counting
+# execute and fetches together, and count the rows it returned or changed; code can
+# time anything else, such as a GUI refresh, with timer() or record_timer().
+# Statements at or over slow_query_ms are logged to "expense_tracker.slow_queries".
+# Safe to share between the GUI and database threads.
+class Profiler:
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.lock = threading.Lock()
+        self.queries = {}
+        self.timers = {}
+
+    def connect(self, database, **options):
+        connection = sqlite3.connect(database, factory=ProfilingConnection, **options)
+        connection.profiler = self
+        return connection
+
+    def record_query(self, sql, seconds, rows):
+        sql = normalize_sql(sql)
+        with self.lock:
+            add_stats(self.queries.setdefault(sql, new_stats()), seconds, rows)
+        if seconds >= self.slow_query_seconds:
+            slow_query_log.warning("slow query %.1f ms, %d rows: %s", seconds * 1000, rows, sql)
+
+    def record_timer(self, name, seconds):
+        with self.lock:
+            add_stats(self.timers.setdefault(name, new_stats()), seconds)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_timer(name, time.perf_counter() - started)
+
+    # Copy of the collected statistics as {"queries": {sql: stats}, "timers": {name: stats}}
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps({"queries": self.queries, "timers": self.timers}))
+
+    # Add this run's statistics to those already saved at path
+    def save(self, path):
+        saved = load_stats(path)
+        for section, entries in self.snapshot().items():
+            for name, stats in entries.items():
+                total = saved[section].setdefault(name, new_stats())
+                total["calls"] += stats["calls"]
+                total["seconds"] += stats["seconds"]
+                total["max"] = max(total["max"], stats["max"])
+                total["rows"] += stats["rows"]
+                total["histogram"] = [a + b for a, b in zip(total["histogram"], stats["histogram"])]
+        with open(path, "w", encoding="utf-8") as out:
+            json.dump(saved, out, indent=1)
+
+def load_stats(path):
+    if not os.path.exists(path):
+        return {"queries": {}, "timers": {}}
+    with open(path, encoding="utf-8") as stats_file:
+        return json.load(stats_file)
+
+# Text table of a snapshot: the limit statements with the most total time, then
+# the timers, each with call count, total, mean and max time, rows and histogram
+def format_stats(snapshot, limit=20):
+    lines = []
+    header = "%8s %10s %9s %9s %9s  %s" % ("calls", "total ms", "mean ms", "max ms", "rows", "  ".join("%6s" % label for label in HISTOGRAM_LABELS))
+    for section, title in (("queries", "Queries by total time"), ("timers", "Timers")):
+        entries = sorted(snapshot[section].items(), key=lambda entry: entry[1]["seconds"], reverse=True)
+        if section == "queries":
+            entries = entries[:limit]
+        lines.append("%s (%d)" % (title, len(snapshot[section])))
+        lines.append(header)
+        for name, stats in entries:
+            lines.append("%8d %10.1f %9.3f %9.3f %9d  %s  %s" % (
+                stats["calls"],
+                stats["seconds"] * 1000,
+                stats["seconds"] * 1000 / stats["calls"] if stats["calls"] else 0,
+                stats["max"] * 1000,
+                stats["rows"],
+                "  ".join("%6d" % count for count in stats["histogram"]),
+                name if len(name) <= 120 else name[:117] + "...",
+            ))
+        lines.append("")
+    return "\n".join(lines)
+
+# A connection whose cursors, including the ones behind execute(), are ProfilingCursors
+class ProfilingConnection(sqlite3.Connection):
+    profiler = None
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or ProfilingCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+# Times each statement from execute until its rows are used up (or the cursor moves
+# on to another statement) and reports it to the connection's profiler
+class ProfilingCursor(sqlite3.Cursor):
+    current = None
+
+    def finish(self):
+        if self.current is not None:
+            sql, seconds, rows = self.current
+            self.current = None
+            self.connection.profiler.record_query(sql, seconds, rows)
+
+    def run(self, method, sql, parameters):
+        self.finish()
+        started = time.perf_counter()
+        try:
+            method(sql, parameters)
+        finally:
+            self.current = [sql, time.perf_counter() - started, 0]
+        if self.description is None:
+            self.current[2] = max(self.rowcount, 0)
+            self.finish()
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self.run(super().execute, sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.run(super().executemany, sql, parameters)
+
+    def fetched(self, started, rows, exhausted):
+        if self.current is not None:
+            self.current[1] += time.perf_counter() - started
+            self.current[2] += rows
+            if exhausted:
+                self.finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.fetched(started, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(started, len(rows), True)
+        return rows
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    # A cursor dropped after fetchone(), as in execute(...).fetchone(), still reports
+    def __del__(self):
+        self.finish()
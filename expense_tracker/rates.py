@@ -0,0 +1,71 @@
+import bisect
+from array import array
+from datetime import date as dt_date
+
+from .analytics import load_numpy
+
+# SQL expression for the rate of currency on day: the rate of the latest day on
+# or before it, found by a seek on the (currency, day) primary key. NULL before
+# the first rate of the currency.
+RATE_AS_OF = "(SELECT rate FROM exchange_rates WHERE exchange_rates.currency = {currency} AND exchange_rates.day <= {day} ORDER BY exchange_rates.day DESC LIMIT 1)"
+
+# The error for an amount dated before the first rate of its currency
+def no_rate_error(currency, day):
+    return ValueError("No %s exchange rate on or before %s. Please import rates for it first." % (currency, dt_date.fromordinal(day).isoformat()))
+
+# Daily exchange rates of a tracker's database, read once per currency into
+# sorted day and rate lists and read again only after the database has changed.
+# A rate is how many units of the ledger currency one unit of the currency buys;
+# the rate for a day is the one of the latest day on or before it, found by
+# binary search, or for many days at once with NumPy's searchsorted.
+class RateCache:
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.loaded_version = None
+        self.tables = {}
+
+    # Changes made through the tracker's connection and, by data_version, any other
+    def version(self):
+        data_version = self.tracker.db.execute("PRAGMA data_version").fetchone()[0]
+        return self.tracker.db.total_changes, data_version
+
+    # (days, rates) of a currency, both in day order
+    def table(self, currency):
+        version = self.version()
+        if version != self.loaded_version:
+            self.tables = {}
+            self.loaded_version = version
+        if currency not in self.tables:
+            rows = self.tracker.db.execute("SELECT day, rate FROM exchange_rates WHERE currency = ? ORDER BY day", (currency,)).fetchall()
+            self.tables[currency] = ([day for day, _ in rows], [rate for _, rate in rows])
+        return self.tables[currency]
+
+    # Rate of currency on day
+    def rate(self, currency, day):
+        days, rates = self.table(currency)
+        position = bisect.bisect_right(days, day) - 1
+        if position < 0:
+            raise no_rate_error(currency, day)
+        return rates[position]
+
+    # Ledger cents converted to cents of currency at the rate of each one's day.
+    # days and cents are matching arrays; the result is a float64 NumPy array when
+    # NumPy is installed, otherwise an array('d'), left unrounded so that sums of
+    # it round once, like the totals converted in SQL.
+    def from_ledger(self, currency, days, cents):
+        numpy = load_numpy()
+        if numpy is not None:
+            table_days, table_rates = self.table(currency)
+            days = numpy.asarray(days, dtype=numpy.int64)
+            positions = numpy.searchsorted(numpy.asarray(table_days, dtype=numpy.int64), days, side="right") - 1
+            if len(positions) and positions.min() < 0:
+                raise no_rate_error(currency, int(days[positions < 0].min()))
+            rates = numpy.asarray(table_rates, dtype=numpy.float64)[positions]
+            return numpy.asarray(cents, dtype=numpy.int64) / rates
+        # One lookup per distinct day
+        rates = {}
+        for day in days:
+            if day not in rates:
+                rates[day] = self.rate(currency, day)
+        return array('d', (amount / rates[day] for day, amount in zip(days, cents)))
+
@@ -0,0 +1,168 @@
+import csv
+import html
+import math
+import os
+from datetime import date as dt_date
+
+from .exporters import open_output
+from .values import LEDGER_CURRENCY, cents_to_text, format_amount, format_day, period_range, to_currency, to_day
+
+# Locations listed in each statement, largest total first
+REPORT_TOP_LOCATIONS = 5
+
+# Fields of a statement row in CSV. Every period has a total row, two average rows
+# (per expense and per day) and a row per category and top location.
+REPORT_FIELDS = ("period", "start", "end", "section", "name", "count", "amount", "share", "change", "change_percent", "currency")
+
+# Headings of statements, by period kind
+REPORT_TITLES = {"month": "Monthly statements", "quarter": "Quarterly statements", "year": "Yearly statements"}
+
+# Statements for each period of kind ("month", "quarter" or "year") from the one
+# holding start to the one holding the day before end, built on
+# ExpenseTracker.period_figures. Each is a dict with the period's figures, its
+# averages per expense and per day, and its change from the period before it,
+# overall and per category (None when there is no period before it). Days after
+# today do not count towards the average per day.
+def period_statements(tracker, kind, start=None, end=None, currency=None, top=REPORT_TOP_LOCATIONS):
+    currency = to_currency(currency)
+    previous = None
+    if start is not None:
+        # The period before the first one is read only for the changes
+        start = period_range(kind, period_range(kind, to_day(start))[0] - 1)[0]
+    figures = tracker.period_figures(kind, start, end, currency)
+    if start is not None and figures:
+        previous, figures = figures[0], figures[1:]
+    today = dt_date.today().toordinal()
+    statements = []
+    for period, first, after, count, total, categories, locations in figures:
+        days = max(1, min(after, today + 1) - first)
+        previous_total = None if previous is None else previous[4]
+        previous_categories = {} if previous is None else {name: amount for name, _, amount in previous[5]}
+        statements.append({
+            "period": period,
+            "start": first,
+            "end": after,
+            "currency": currency or LEDGER_CURRENCY,
+            "count": count,
+            "total": total,
+            "average": math.floor(total / count + 0.5) if count else 0,
+            "daily_average": math.floor(total / days + 0.5),
+            "previous_period": None if previous is None else previous[0],
+            "change": None if previous_total is None else total - previous_total,
+            "change_percent": 100.0 * (total - previous_total) / previous_total if previous_total else None,
+            "categories": [
+                (name, category_count, amount, share(amount, total), None if previous is None else amount - previous_categories.get(name, 0))
+                for name, category_count, amount in categories
+            ],
+            "locations": [(name, location_count, amount, share(amount, total)) for name, location_count, amount in locations[:top]],
+        })
+        previous = (period, first, after, count, total, categories, locations)
+    return statements
+
+# Percentage of total that amount is
+def share(amount, total):
+    return 100.0 * amount / total if total else 0.0
+
+# Optional numbers as CSV text, empty when missing
+def percent_text(value):
+    return "" if value is None else "%.1f" % value
+
+def change_text(cents):
+    return "" if cents is None else cents_to_text(cents)
+
+# Signed currency text of a change, e.g. "+$12.00 (+3.1%)", or "" when missing
+def format_change(cents, currency, percent=None):
+    if cents is None:
+        return ""
+    text = ("+" if cents > 0 else "") + format_amount(cents, currency)
+    if percent is not None:
+        text += " (%+.1f%%)" % percent
+    return text
+
+# The REPORT_FIELDS rows of one statement
+def statement_rows(statement):
+    head = (statement["period"], format_day(statement["start"], "%Y-%m-%d"), format_day(statement["end"], "%Y-%m-%d"))
+    currency = statement["currency"]
+    yield head + ("total", "", statement["count"], cents_to_text(statement["total"]), "100.0", change_text(statement["change"]), percent_text(statement["change_percent"]), currency)
+    yield head + ("average", "per expense", "", cents_to_text(statement["average"]), "", "", "", currency)
+    yield head + ("average", "per day", "", cents_to_text(statement["daily_average"]), "", "", "", currency)
+    for name, count, amount, category_share, change in statement["categories"]:
+        yield head + ("category", name, count, cents_to_text(amount), percent_text(category_share), change_text(change), "", currency)
+    for name, count, amount, location_share in statement["locations"]:
+        yield head + ("location", name, count, cents_to_text(amount), percent_text(location_share), "", "", currency)
+
+def write_report_csv(statements, path, kind):
+    with open_output(path) as out:
+        writer = csv.writer(out)
+        writer.writerow(REPORT_FIELDS)
+        for statement in statements:
+            writer.writerows(statement_rows(statement))
+
+# One self-contained page with a section per statement
+def write_report_html(statements, path, kind):
+    title = REPORT_TITLES[kind]
+    with open_output(path) as out:
+        out.write(
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>%s</title>\n<style>\n"
+            "body { font-family: sans-serif; margin: 2em; }\n"
+            "table { border-collapse: collapse; margin: 0.5em 0 1.5em; }\n"
+            "th, td { padding: 0.2em 0.8em; border-bottom: 1px solid #ddd; text-align: left; }\n"
+            "td.amount { text-align: right; }\n"
+            "</style>\n</head>\n<body>\n<h1>%s</h1>\n" % (title, title)
+        )
+        for statement in statements:
+            currency = statement["currency"]
+            last_day = format_day(statement["end"] - 1, "%d %b %Y")
+            out.write("<section>\n<h2>%s</h2>\n<p>%s to %s</p>\n<table>\n" % (
+                html.escape(statement["period"]), format_day(statement["start"], "%d %b %Y"), last_day,
+            ))
+            summary = [
+                ("Expenses", str(statement["count"])),
+                ("Total", format_amount(statement["total"], currency)),
+                ("Average per expense", format_amount(statement["average"], currency)),
+                ("Average per day", format_amount(statement["daily_average"], currency)),
+            ]
+            if statement["previous_period"] is not None:
+                summary.append((
+                    "Change from %s" % statement["previous_period"],
+                    format_change(statement["change"], currency, statement["change_percent"]),
+                ))
+            for label, value in summary:
+                out.write("<tr><th>%s</th><td class=\"amount\">%s</td></tr>\n" % (html.escape(label), html.escape(value)))
+            out.write("</table>\n")
+            if statement["categories"]:
+                out.write("<table>\n<tr><th>Category</th><th>Expenses</th><th>Total</th><th>Share</th><th>Change</th></tr>\n")
+                for name, count, amount, category_share, change in statement["categories"]:
+                    out.write("<tr><td>%s</td><td class=\"amount\">%d</td><td class=\"amount\">%s</td><td class=\"amount\">%.1f%%</td><td class=\"amount\">%s</td></tr>\n" % (
+                        html.escape(name), count, html.escape(format_amount(amount, currency)), category_share, html.escape(format_change(change, currency)),
+                    ))
+                out.write("</table>\n")
+            if statement["locations"]:
+                out.write("<table>\n<tr><th>Top locations</th><th>Expenses</th><th>Total</th><th>Share</th></tr>\n")
+                for name, count, amount, location_share in statement["locations"]:
+                    out.write("<tr><td>%s</td><td class=\"amount\">%d</td><td class=\"amount\">%s</td><td class=\"amount\">%.1f%%</td></tr>\n" % (
+                        html.escape(name), count, html.escape(format_amount(amount, currency)), location_share,
+                    ))
+                out.write("</table>\n")
+            out.write("</section>\n")
+        out.write("</body>\n</html>\n")
+
+REPORT_WRITERS = {
+    "csv": write_report_csv,
+    "html": write_report_html,
+}
+
+# Write the statements of each period of kind from start up to end to path as CSV
+# or HTML, by default from its extension, and return how many were written
+def export_report(tracker, path, kind="month", file_format=None, start=None, end=None, currency=None, top=REPORT_TOP_LOCATIONS):
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lower().lstrip(".")
+        if file_format == "htm":
+            file_format = "html"
+        if file_format not in REPORT_WRITERS:
+            file_format = "csv"
+    if file_format not in REPORT_WRITERS:
+        raise ValueError("Cannot write statements as %s" % file_format)
+    statements = period_statements(tracker, kind, start, end, currency, top)
+    REPORT_WRITERS[file_format](statements, path, kind)
+    return len(statements)
@@ -0,0 +1,118 @@
+import re
+from datetime import datetime, date as dt_date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}$')
+
+# First day of the given month and of the month after it, for half-open date ranges
+def month_range(year, month):
+    start = dt_date(year, month, 1)
+    if month == 12:
+        end = dt_date(year + 1, 1, 1)
+    else:
+        end = dt_date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+# Calendar periods statements are made of, as the months each one spans
+PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+
+# Day numbers of the first day of the period of the given kind holding day and of
+# the first day after it
+def period_range(kind, day):
+    if kind not in PERIOD_MONTHS:
+        raise ValueError("Statements cover a month, quarter or year, not %s" % kind)
+    length = PERIOD_MONTHS[kind]
+    date = dt_date.fromordinal(day)
+    first = (date.year * 12 + date.month - 1) // length * length
+    after = first + length
+    return dt_date(first // 12, first % 12 + 1, 1).toordinal(), dt_date(after // 12, after % 12 + 1, 1).toordinal()
+
+# Name of the period of the given kind starting on day: 2024-03, 2024-Q1 or 2024
+def period_label(kind, day):
+    date = dt_date.fromordinal(day)
+    if kind == "month":
+        return "%04d-%02d" % (date.year, date.month)
+    if kind == "quarter":
+        return "%04d-Q%d" % (date.year, (date.month + 2) // 3)
+    return "%04d" % date.year
+
+# Expenses store the date as a day number (date.toordinal(), so 1 is 0001-01-01)
+# and the amount as integer cents. In SQL, day + 1721424.5 is the Julian day that
+# SQLite's date functions accept. Values are only turned back into text for display.
+def to_day(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, dt_date):
+        return value.toordinal()
+    value = str(value).strip()
+    if not ISO_DATE.match(value):
+        raise ValueError("Invalid date: %s" % value)
+    return dt_date.fromisoformat(value).toordinal()
+
+# Largest amount in cents SQLite can store as an INTEGER
+MAX_CENTS = 2 ** 63 - 1
+
+def to_cents(amount):
+    try:
+        amount = Decimal(str(amount).strip())
+    except InvalidOperation:
+        raise ValueError("Invalid amount: %s" % amount)
+    if not amount.is_finite():
+        raise ValueError("Invalid amount: %s" % amount)
+    try:
+        cents = int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError("Amount is too large: %s" % amount)
+    if abs(cents) > MAX_CENTS:
+        raise ValueError("Amount is too large: %s" % amount)
+    return cents
+
+def format_day(day, date_format="%d-%b-%Y"):
+    return dt_date.fromordinal(day).strftime(date_format)
+
+# Plain decimal text for an amount in cents, e.g. 123456 -> "1234.56"
+def cents_to_text(cents):
+    sign = "-" if cents < 0 else ""
+    return "%s%d.%02d" % (sign, abs(cents) // 100, abs(cents) % 100)
+
+# Currency every total is kept in. Expenses entered in another currency are
+# converted to it when written, and their entered amount is kept alongside.
+LEDGER_CURRENCY = "USD"
+
+# Symbols shown in front of amounts; other currencies show their code
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "INR": "₹"}
+
+ISO_CURRENCY = re.compile(r'[A-Z]{3}$')
+
+# ISO 4217 code of a currency, or None for the ledger currency (or no currency)
+def to_currency(value):
+    if value is None:
+        return None
+    value = str(value).strip().upper()
+    if not value or value == LEDGER_CURRENCY:
+        return None
+    if not ISO_CURRENCY.match(value):
+        raise ValueError("Invalid currency: %s. Please use a three-letter code such as EUR." % value)
+    return value
+
+# Currency text for an amount in cents, e.g. 123456 -> "$1,234.56"; currency
+# defaults to the ledger currency. Every currency is shown with two decimals.
+def format_amount(cents, currency=None):
+    sign = "-" if cents < 0 else ""
+    currency = currency or LEDGER_CURRENCY
+    symbol = CURRENCY_SYMBOLS.get(currency, currency + " ")
+    return "%s%s{:,}.{:02d}".format(abs(cents) // 100, abs(cents) % 100) % (sign, symbol)
+
+# An expense's amount as entered, followed for another currency by the ledger
+# amount it was converted to, e.g. "€10.00 ($10.85)"
+def format_entered_amount(cents, currency=None, entered_cents=None):
+    if currency is None:
+        return format_amount(cents)
+    return "%s (%s)" % (format_amount(entered_cents, currency), format_amount(cents))
+
+# YYYY-MM text of a month counted as year * 12 + month - 1
+def month_key(month):
+    year, month = divmod(month, 12)
+    return "%04d-%02d" % (year, month + 1)
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from expense_tracker.core import ExpenseTracker
+from expense_tracker.values import MAX_CENTS, to_cents
+
+# Amounts are parsed to integer cents, and only amounts SQLite can store are accepted
+class AmountTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    def test_to_cents(self):
+        self.assertEqual(to_cents("12.345"), 1235)
+        self.assertEqual(to_cents(" 7 "), 700)
+        self.assertEqual(to_cents("92233720368547758.07"), MAX_CENTS)
+        for amount in ("abc", "nan", "inf", "1e30", "1e17", "92233720368547758.08", "-1e17"):
+            with self.assertRaises(ValueError, msg=amount):
+                to_cents(amount)
+
+    def test_add_rejects_amounts_too_large(self):
+        for amount in ("1e30", "1e17"):
+            with self.assertRaises(ValueError, msg=amount):
+                self.tracker.add_expense("2024-03-05", "Food", amount, "Lunch", "Cafe")
+        self.assertEqual(self.tracker.get_summary(), (0, 0))
+
+    def test_import_rejects_only_the_bad_rows(self):
+        records = enumerate([
+            {"date": "2024-03-05", "category": "Food", "amount": "12.50", "description": "Lunch", "location": "Cafe"},
+            {"date": "2024-03-06", "category": "Food", "amount": "1e30", "description": "Lunch", "location": "Cafe"},
+            {"date": "2024-03-07", "category": "Food", "amount": "1e17", "description": "Lunch", "location": "Cafe"},
+            {"date": "2024-03-08", "category": "Food", "amount": "2", "description": "Tea", "location": "Cafe"},
+        ], 2)
+        imported, rejects = self.tracker.import_expenses(records)
+        self.assertEqual(imported, 2)
+        self.assertEqual([line_no for line_no, _ in rejects], [3, 4])
+        self.assertEqual(self.tracker.get_summary(), (2, 1450))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+from expense_tracker.core import ExpenseTracker
+
+# Budget status per category, with month budgets replacing standing ones
+class BudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    def test_category_filter_with_two_month_budgets(self):
+        self.tracker.set_budget("Food", "300", "2024-03")
+        self.tracker.set_budget("Rent", "1000", "2024-03")
+        self.tracker.add_expense("2024-03-05", "Food", "50", "Groceries", "Market")
+        self.tracker.add_expense("2024-03-01", "Rent", "1200", "Flat", "Home")
+        self.assertEqual(self.tracker.budget_status("2024-03", "Food"), [("Food", 30000, 5000, 25000)])
+        self.assertEqual(self.tracker.over_budget("2024-03", "Food"), [])
+        self.assertEqual(self.tracker.over_budget("2024-03", "Rent"), [("Rent", 100000, 120000, -20000)])
+        self.assertEqual([row[0] for row in self.tracker.budget_status("2024-03")], ["Food", "Rent"])
+
+    def test_category_filter_with_standing_and_month_budgets(self):
+        self.tracker.set_budget("Food", "300")
+        self.tracker.set_budget("Food", "100", "2024-03")
+        self.tracker.set_budget("Rent", "1000")
+        self.tracker.add_expense("2024-03-01", "Rent", "1200", "Flat", "Home")
+        self.assertEqual(self.tracker.budget_status("2024-03", "Food"), [("Food", 10000, 0, 10000)])
+        self.assertEqual(self.tracker.budget_status("2024-04", "Food"), [("Food", 30000, 0, 30000)])
+        self.assertEqual(self.tracker.over_budget("2024-03", "Food"), [])
+        self.assertEqual(self.tracker.over_budget("2024-03"), [("Rent", 100000, 120000, -20000)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from expense_tracker.cli import main
+from expense_tracker.core import ExpenseTracker
+
+# Commands run against a scratch database, reading it back with a tracker of
+# their own to see what was committed
+class CommandLineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, "expenses.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_command(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            status = main(["--database", self.database, "--commit-window", "60"] + list(argv))
+        return status, output.getvalue()
+
+    def test_grouped_writes_are_committed_when_commands_end(self):
+        self.assertEqual(self.run_command("add", "Food", "12.50", "Lunch", "Cafe", "--date", "2024-03-05")[0], 0)
+        self.assertEqual(self.run_command("budget", "set", "Food", "10")[0], 0)
+        with ExpenseTracker(self.database) as tracker:
+            self.assertEqual(tracker.get_summary(), (1, 1250))
+            self.assertEqual(tracker.get_budgets(), [("Food", "", 1000)])
+        status, output = self.run_command("budget", "status", "--month", "2024-03")
+        self.assertEqual(status, 1)
+        self.assertIn("1 of 1 budgets over", output)
+
+    def test_failed_command_closes_the_tracker(self):
+        self.assertEqual(self.run_command("add", "Food", "12.50", "Lunch", "Cafe", "--date", "2024-03-05")[0], 0)
+        self.assertEqual(self.run_command("add", "Food", "abc", "Lunch", "Cafe")[0], 1)
+        status, output = self.run_command("query")
+        self.assertEqual(status, 0)
+        self.assertIn("1 expenses, total $12.50", output)
+
+    def test_file_and_database_errors_are_reported(self):
+        status, _ = self.run_command("import", os.path.join(self.directory.name, "missing.csv"))
+        self.assertEqual(status, 1)
+        errors = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(errors):
+            status = main(["--database", os.path.join(self.directory.name, "missing", "expenses.db"), "query"])
+        self.assertEqual(status, 1)
+        self.assertIn("error: unable to open database file", errors.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from expense_tracker.benchmarks import benchmark_concurrency
+from expense_tracker.core import SCHEMA_MIGRATIONS, ExpenseConflict, ExpenseTracker
+from expense_tracker.pool import TrackerPool
+
+# Several trackers and threads writing to one database file
+class ConcurrencyTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, "expenses.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Run target(index) on count threads at once and re-raise the first error
+    def run_threads(self, count, target):
+        start = threading.Barrier(count)
+        errors = []
+
+        def run(index):
+            start.wait()
+            try:
+                target(index)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def test_concurrent_migrations_apply_each_step_once(self):
+        self.run_threads(4, lambda index: ExpenseTracker(self.database).close())
+        with ExpenseTracker(self.database) as tracker:
+            self.assertEqual(tracker.cursor.execute("PRAGMA user_version").fetchone()[0], len(SCHEMA_MIGRATIONS))
+            tracker.add_expense("2024-03-05", "Food", "12.50", "Lunch", "Cafe")
+            self.assertEqual(tracker.check_summaries(), [])
+
+    def test_two_writers(self):
+        def write(index):
+            with ExpenseTracker(self.database, busy_timeout=0.05) as tracker:
+                for day in range(1, 29):
+                    tracker.add_expense("2024-03-%02d" % day, "Writer %d" % index, "1", "Expense", "Home")
+
+        ExpenseTracker(self.database).close()
+        self.run_threads(2, write)
+        with ExpenseTracker(self.database) as tracker:
+            self.assertEqual(tracker.get_summary(), (56, 5600))
+            self.assertEqual(tracker.get_summary(category="Writer 0"), (28, 2800))
+            self.assertEqual(tracker.check_summaries(), [])
+
+    def test_stale_edit_raises_conflict(self):
+        with ExpenseTracker(self.database) as first, ExpenseTracker(self.database) as second:
+            expense_id = first.add_expense("2024-03-05", "Food", "12.50", "Lunch", "Cafe")
+            version = second.get_expense_by_id(expense_id)[7]
+            first.edit_expense(expense_id, "2024-03-05", "Food", "13", "Lunch", "Cafe", expected_version=version)
+            with self.assertRaises(ExpenseConflict):
+                second.edit_expense(expense_id, "2024-03-05", "Food", "14", "Lunch", "Cafe", expected_version=version)
+            self.assertEqual(second.get_expense_by_id(expense_id)[3], 1300)
+
+    def test_busy_writer_backs_off_until_the_lock_is_free(self):
+        with ExpenseTracker(self.database, busy_timeout=0.05) as tracker:
+            holder = sqlite3.connect(self.database, check_same_thread=False)
+            holder.execute("BEGIN IMMEDIATE")
+            release = threading.Timer(0.3, holder.commit)
+            release.start()
+            try:
+                tracker.add_expense("2024-03-05", "Food", "12.50", "Lunch", "Cafe")
+            finally:
+                release.join()
+                holder.close()
+            self.assertEqual(tracker.get_summary(), (1, 1250))
+
+    def test_pool_serializes_writers(self):
+        pool = TrackerPool(self.database)
+        try:
+            expense_id = pool.write(lambda tracker: tracker.add_expense("2024-03-05", "Food", "1", "Lunch", "Cafe"))
+            version = pool.read(lambda tracker: tracker.get_expense_by_id(expense_id)[7])
+            outcomes = []
+
+            def edit(index):
+                try:
+                    pool.write(lambda tracker: tracker.edit_expense(expense_id, "2024-03-05", "Food", str(index + 2), "Lunch", "Cafe", expected_version=version))
+                    outcomes.append("edited")
+                except ExpenseConflict:
+                    outcomes.append("conflict")
+
+            self.run_threads(2, edit)
+            self.assertEqual(sorted(outcomes), ["conflict", "edited"])
+            self.assertEqual(pool.read(lambda tracker: tracker.get_expense_by_id(expense_id)[7]), version + 1)
+        finally:
+            pool.close()
+
+    def test_stress_run_has_no_errors(self):
+        report = benchmark_concurrency(writers=2, readers=2, seconds=0.5, threads=True, rows=200)
+        self.assertEqual(report["errors"], {})
+        self.assertGreater(report["writes"] + report["edits"], 0)
+        self.assertGreater(report["reads"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
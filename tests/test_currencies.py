@@ -0,0 +1,98 @@
+import contextlib
+import os
+import tempfile
+import unittest
+from array import array
+from unittest import mock
+
+from expense_tracker import analytics
+from expense_tracker.core import ExpenseTracker
+from expense_tracker.values import to_day
+
+# Expenses in other currencies, exchange rates and totals reported in a currency
+class CurrencyTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+        stored, rejects, repriced = self.tracker.import_rates(enumerate([
+            {"date": "2024-01-01", "currency": "EUR", "rate": "1.10"},
+            {"date": "2024-02-01", "currency": "EUR", "rate": "1.20"},
+            {"date": "2024-03-01", "currency": "EUR", "rate": "1.00"},
+            {"date": "2024-01-01", "currency": "GBP", "rate": "1.25"},
+            {"date": "2024-01-01", "currency": "USD", "rate": "1"},
+        ], 2))
+        self.assertEqual((stored, [line_no for line_no, _ in rejects], repriced), (4, [6], 0))
+        self.january = self.tracker.add_expense("2024-01-15", "Food", "10", "Lunch", "Paris", "EUR")
+        self.february = self.tracker.add_expense("2024-02-10", "Food", "10", "Dinner", "Paris", "eur")
+        self.tracker.add_expense("2024-02-20", "Travel", "8", "Train", "London", "GBP")
+        self.tracker.add_expense("2024-03-05", "Food", "12", "Lunch", "Home")
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    # Run with NumPy, or with the plain Python fallback as if it were not installed
+    @contextlib.contextmanager
+    def numpy_path(self, installed):
+        with contextlib.ExitStack() as stack:
+            if not installed:
+                stack.enter_context(mock.patch.object(analytics, "numpy", None))
+                stack.enter_context(mock.patch.object(analytics, "numpy_checked", True))
+            self.tracker.analytics.loaded_version = None
+            yield
+        self.tracker.analytics.loaded_version = None
+
+    def test_amounts_are_converted_when_written(self):
+        rows = {row[0]: row for row in self.tracker.query(order_by="id", with_total=False)[0]}
+        self.assertEqual(rows[self.january][3], 1100)
+        self.assertEqual(rows[self.january][6:8], ("EUR", 1000))
+        self.assertEqual(rows[self.february][3], 1200)
+        self.assertEqual(self.tracker.get_summary(), (4, 4500))
+        with self.assertRaises(ValueError):
+            self.tracker.add_expense("2023-12-31", "Food", "10", "Lunch", "Paris", "EUR")
+        with self.assertRaises(ValueError):
+            self.tracker.add_expense("2024-01-15", "Food", "10", "Lunch", "Tokyo", "JPY")
+
+    def test_totals_in_another_currency(self):
+        # 1100 / 1.1 + 1200 / 1.2 + 1000 / 1.2 + 1200 / 1.0
+        self.assertEqual(self.tracker.get_summary(currency="EUR"), (4, 4033))
+        self.assertEqual(self.tracker.get_summary(category="Food", currency="EUR"), (3, 3200))
+        self.assertEqual(self.tracker.get_summary(currency="USD"), (4, 4500))
+        self.assertEqual(
+            self.tracker.aggregate("month", ("sum", "count"), currency="EUR"),
+            [("2024-01", 1000, 1), ("2024-02", 1833, 2), ("2024-03", 1200, 1)],
+        )
+        self.assertEqual(self.tracker.aggregate("location", currency="GBP"), [("Home", 960), ("London", 800), ("Paris", 1840)])
+        with self.assertRaises(ValueError):
+            self.tracker.get_summary(currency="JPY")
+
+    def test_charts_convert_on_both_paths(self):
+        expected = [("2024-01", 1000, 1), ("2024-02", 1833, 2), ("2024-03", 1200, 1)]
+        for installed in (True, False):
+            with self.subTest(numpy=installed), self.numpy_path(installed):
+                self.assertEqual(self.tracker.analytics.totals("month", currency="EUR"), expected)
+                self.assertEqual(self.tracker.analytics.totals("category", currency="EUR"), [("Food", 3200, 3), ("Travel", 833, 1)])
+                days = [to_day("2024-01-15"), to_day("2024-02-01"), to_day("2024-02-29"), to_day("2024-03-01")]
+                converted = self.tracker.rates.from_ledger("EUR", days, [1100, 1200, 600, 700])
+                self.assertEqual(isinstance(converted, array), not installed)
+                self.assertEqual([round(value, 6) for value in converted], [1000, 1000, 500, 700])
+                with self.assertRaises(ValueError):
+                    self.tracker.rates.from_ledger("EUR", [to_day("2023-12-31")], [100])
+
+    def test_rate_import_converts_again(self):
+        stored, _, repriced = self.tracker.import_rates([(2, {"date": "2024-02-01", "currency": "EUR", "rate": "1.5"})])
+        self.assertEqual((stored, repriced), (1, 1))
+        self.assertEqual(self.tracker.rates.rate("EUR", to_day("2024-02-10")), 1.5)
+        self.assertEqual(self.tracker.get_expense_by_id(self.february)[3], 1500)
+        self.assertEqual(self.tracker.get_expense_by_id(self.january)[3], 1100)
+        self.assertEqual(self.tracker.get_summary(), (4, 4800))
+        self.assertEqual(self.tracker.check_summaries(), [])
+        # 1000 + (1500 + 1000) / 1.5 + 1200
+        self.assertEqual(self.tracker.get_summary(currency="EUR"), (4, 3867))
+        for installed in (True, False):
+            with self.subTest(numpy=installed), self.numpy_path(installed):
+                self.assertEqual(self.tracker.analytics.totals("month", currency="EUR"), [("2024-01", 1000, 1), ("2024-02", 1667, 2), ("2024-03", 1200, 1)])
+                self.assertEqual(self.tracker.aggregate("month", currency="EUR"), [("2024-01", 1000), ("2024-02", 1667), ("2024-03", 1200)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import csv
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from expense_tracker.core import ExpenseTracker
+from expense_tracker.exporters import export_expenses
+
+# Exports, and incremental exports that only write what changed since the last one
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+        self.ids = [
+            self.tracker.add_expense("2024-03-05", "Food", "12.50", "Lunch", "Cafe"),
+            self.tracker.add_expense("2024-03-06", "Food", "30", "Dinner", "Bistro"),
+            self.tracker.add_expense("2024-03-07", "Travel", "4", "Bus", "Town"),
+        ]
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    # (id, amount) of every row of an exported file
+    def exported(self, path):
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as lines:
+                return [(int(row["id"]), row["amount"]) for row in map(json.loads, lines)]
+        if path.endswith(".parquet"):
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(path).to_pydict()
+            return [(expense_id, "%.2f" % amount) for expense_id, amount in zip(table["id"], table["amount"])]
+        with open(path, newline="", encoding="utf-8") as rows:
+            return [(int(row["id"]), row["amount"]) for row in csv.DictReader(rows)]
+
+    def test_only_changes_are_written_again(self):
+        formats = ["csv", "jsonl"]
+        if importlib.util.find_spec("pyarrow"):
+            formats.append("parquet")
+        # Each format gets a mark of its own, and the dinner one more dollar
+        for dinner, file_format in enumerate(formats, 30):
+            with self.subTest(file_format=file_format):
+                path = self.path("changes." + file_format)
+                self.assertEqual(export_expenses(self.tracker, path, since="modified"), 3)
+                self.assertEqual(sorted(self.exported(path)), [(self.ids[0], "12.50"), (self.ids[1], "%d.00" % dinner), (self.ids[2], "4.00")])
+                first_mark = self.tracker.get_export_mark(path, "modified")
+
+                self.tracker.edit_expense(self.ids[1], "2024-03-06", "Food", str(dinner + 1), "Dinner", "Bistro")
+                self.assertEqual(export_expenses(self.tracker, path, since="modified"), 1)
+                self.assertEqual(self.exported(path), [(self.ids[1], "%d.00" % (dinner + 1))])
+                mark = self.tracker.get_export_mark(path, "modified")
+                self.assertGreater(mark, first_mark)
+                self.assertEqual(mark, self.tracker.get_expense_by_id(self.ids[1])[6])
+
+                self.assertEqual(export_expenses(self.tracker, path, since="modified"), 0)
+                self.assertEqual(self.tracker.get_export_mark(path, "modified"), mark)
+                self.assertFalse(os.path.exists(path + ".partial"))
+
+    def test_id_marks_follow_new_rows_only(self):
+        path = self.path("added.csv")
+        self.assertEqual(export_expenses(self.tracker, path, since="id"), 3)
+        self.assertEqual(self.tracker.get_export_mark(path, "id"), self.ids[2])
+        self.tracker.edit_expense(self.ids[0], "2024-03-05", "Food", "13", "Lunch", "Cafe")
+        self.assertEqual(export_expenses(self.tracker, path, since="id"), 0)
+        added = self.tracker.add_expense("2024-03-08", "Food", "2", "Tea", "Cafe")
+        self.assertEqual(export_expenses(self.tracker, path, since="id"), 1)
+        self.assertEqual(self.exported(path), [(added, "2.00")])
+        # Marks are kept per name
+        self.assertEqual(export_expenses(self.tracker, self.path("other.csv"), since="id", mark="other"), 4)
+
+    def test_failed_export_keeps_the_file_and_the_mark(self):
+        path = self.path("changes.csv")
+        export_expenses(self.tracker, path, since="modified")
+        mark = self.tracker.get_export_mark(path, "modified")
+        self.tracker.edit_expense(self.ids[0], "2024-03-05", "Food", "13", "Lunch", "Cafe")
+        self.tracker.edit_expense(self.ids[2], "2024-03-07", "Travel", "5", "Bus", "Town")
+        chunks = self.tracker.iter_expense_chunks
+
+        def failing_chunks(*args, **options):
+            for rows in chunks(*args, **options):
+                yield rows
+                raise OSError("disk full")
+
+        with mock.patch.object(self.tracker, "iter_expense_chunks", failing_chunks):
+            with self.assertRaises(OSError):
+                export_expenses(self.tracker, path, since="modified", chunk_size=1)
+        self.assertFalse(os.path.exists(path + ".partial"))
+        self.assertEqual(len(self.exported(path)), 3)
+        self.assertEqual(self.tracker.get_export_mark(path, "modified"), mark)
+        self.assertEqual(export_expenses(self.tracker, path, since="modified", chunk_size=1), 2)
+        self.assertEqual(self.exported(path), [(self.ids[0], "13.00"), (self.ids[2], "5.00")])
+
+if __name__ == "__main__":
+    unittest.main()
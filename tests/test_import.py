@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+
+from expense_tracker.benchmarks import IMPORT_RATE_FLOOR, benchmark_import, generate_ledger
+from expense_tracker.core import ExpenseTracker
+
+# Bulk imports into empty and non-empty ledgers
+class ImportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    def test_totals_and_search_follow_imports(self):
+        imported, rejects = self.tracker.import_expenses(generate_ledger(5000, 3))
+        self.assertEqual((imported, rejects), (5000, []))
+        self.tracker.add_expense("2020-01-01", "Category 0", "5", "first coffee", "Location 0")
+        imported, _ = self.tracker.import_expenses(generate_ledger(2000, 4), batch_size=500)
+        self.assertEqual(imported, 2000)
+        self.assertEqual(self.tracker.check_summaries(), [])
+        self.assertEqual(self.tracker.get_summary()[0], 7001)
+        self.assertEqual(len(self.tracker.search("coffee", limit=10000)), self.tracker.get_summary(text="coffee")[0])
+
+    def test_import_rate(self):
+        rate = benchmark_import(50000)
+        self.assertGreaterEqual(rate, IMPORT_RATE_FLOOR, "bulk import ran at %.0f rows/sec" % rate)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+from expense_tracker.core import ExpenseConflict, ExpenseTracker
+
+# Undo, redo and the change feed other windows follow, all read from the journal
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, "expenses.db")
+        self.tracker = ExpenseTracker(self.database)
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    # (day, category, cents, description, location) of every expense, by id
+    def rows(self):
+        return {row[0]: tuple(row[1:6]) for row in self.tracker.query(order_by="id", with_total=False)[0]}
+
+    def test_undo_and_redo_round_trip(self):
+        lunch = self.tracker.add_expense("2024-03-05", "Food", "12.50", "Lunch", "Cafe")
+        bus = self.tracker.add_expense("2024-03-06", "Travel", "3", "Bus", "Town")
+        tea = self.tracker.add_expense("2024-03-07", "Food", "2", "Tea", "Cafe")
+        added = self.rows()
+        self.tracker.edit_expense(lunch, "2024-03-05", "Food", "14", "Lunch", "Bistro")
+        self.assertEqual(self.tracker.edit_expenses([bus, tea], category="Other"), 2)
+        edited = self.rows()
+        self.tracker.remove_expense(tea)
+        removed = self.rows()
+
+        lunch_edited = dict(added)
+        lunch_edited[lunch] = edited[lunch]
+        states = [removed, edited, lunch_edited, added]
+        for state, label in zip(states[1:], ["Remove 1 expense", "Edit 2 expenses", "Edit expense"]):
+            self.assertEqual(self.tracker.undo(), label)
+            self.assertEqual(self.rows(), state)
+            self.assertEqual(self.tracker.check_summaries(), [])
+        for state in reversed(states[:-1]):
+            self.assertIsNotNone(self.tracker.redo())
+            self.assertEqual(self.rows(), state)
+            self.assertEqual(self.tracker.check_summaries(), [])
+        self.assertIsNone(self.tracker.redo())
+        self.assertEqual(self.tracker.get_summary(), (2, 1700))
+
+    def test_new_change_ends_redo(self):
+        expense_id = self.tracker.add_expense("2024-03-05", "Food", "12.50", "Lunch", "Cafe")
+        self.tracker.undo()
+        self.tracker.add_expense("2024-03-06", "Food", "3", "Tea", "Cafe")
+        self.assertIsNone(self.tracker.redo())
+        self.assertIsNone(self.tracker.get_expense_by_id(expense_id))
+
+    def test_undo_refuses_an_expense_changed_since(self):
+        expense_id = self.tracker.add_expense("2024-03-05", "Food", "12.50", "Lunch", "Cafe")
+        self.tracker.edit_expense(expense_id, "2024-03-05", "Food", "13", "Lunch", "Cafe")
+        batch = self.tracker.cursor.execute("SELECT MAX(id) FROM change_batches").fetchone()[0]
+        self.tracker.edit_expense(expense_id, "2024-03-05", "Food", "15", "Lunch", "Cafe")
+        with self.assertRaises(ExpenseConflict):
+            with self.tracker.write():
+                self.tracker.revert_batch(batch, "undo")
+        self.assertEqual(self.tracker.get_expense_by_id(expense_id)[3], 1500)
+        self.assertEqual(self.tracker.check_summaries(), [])
+
+    def test_changes_since_follows_another_tracker(self):
+        with ExpenseTracker(self.database) as other:
+            position = other.journal_position()
+            expense_id = self.tracker.add_expense("2024-03-05", "Food", "12.50", "Lunch", "Cafe")
+            self.tracker.edit_expense(expense_id, "2024-03-05", "Food", "14", "Lunch", "Cafe")
+            self.tracker.undo()
+            self.tracker.remove_expense(expense_id)
+            position, changes = other.changes_since(position)
+            self.assertEqual(position, other.journal_position())
+            amounts = [tuple(None if side is None else side[3] for side in change) for change in changes]
+            self.assertEqual(amounts, [(None, 1250), (1250, 1400), (1400, 1250), (1250, None)])
+            self.assertTrue(all(side is None or side[0] == expense_id for change in changes for side in change))
+            self.assertEqual(other.changes_since(position), (position, []))
+
+            self.tracker.import_expenses([(2, {"date": "2024-03-06", "category": "Food", "amount": "3", "description": "Tea", "location": "Cafe"})])
+            self.assertEqual(other.changes_since(position)[1], None)
+
+if __name__ == "__main__":
+    unittest.main()
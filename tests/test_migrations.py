@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from expense_tracker.core import SCHEMA_MIGRATIONS, ExpenseTracker
+from expense_tracker.values import to_day
+
+# Databases written by the first version of the tracker, before any migration
+class LegacyDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, "expenses.db")
+        db = sqlite3.connect(self.database)
+        db.execute('''
+        CREATE TABLE IF NOT EXISTS my_expenses (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          date DATE,
+          category TEXT,
+          amount REAL,
+          description TEXT,
+          location TEXT
+        )
+        ''')
+        # Amounts were stored as typed, in a REAL column
+        db.executemany(
+            "INSERT INTO my_expenses (date, category, amount, description, location) VALUES (?, ?, ?, ?, ?)",
+            [
+                ("2023-12-31", "Food", "12.50", "Dinner", "Bistro"),
+                ("2024-01-02", "Food", 0.1 + 0.2, "Gum", "Kiosk"),
+                ("2024-01-15", "Travel", "1.005", "Ticket", "Station"),
+                ("2024-02-29", "Travel", 2.675, "Ticket", "Station"),
+                ("2024-03-01", "Home", "19.99", "Lamp", "Store"),
+                ("2024-03-02", "Home", 40, "Chair", "Store"),
+            ],
+        )
+        # The highest id was deleted; it must not be handed out again
+        db.execute("DELETE FROM my_expenses WHERE id = 6")
+        db.commit()
+        db.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_migrates_to_cents_and_day_numbers(self):
+        with ExpenseTracker(self.database) as tracker:
+            self.assertEqual(tracker.cursor.execute("PRAGMA user_version").fetchone()[0], len(SCHEMA_MIGRATIONS))
+            rows = [row[:6] for row in tracker.query(order_by="id", with_total=False)[0]]
+            self.assertEqual(rows, [
+                (1, to_day("2023-12-31"), "Food", 1250, "Dinner", "Bistro"),
+                (2, to_day("2024-01-02"), "Food", 30, "Gum", "Kiosk"),
+                (3, to_day("2024-01-15"), "Travel", 101, "Ticket", "Station"),
+                (4, to_day("2024-02-29"), "Travel", 268, "Ticket", "Station"),
+                (5, to_day("2024-03-01"), "Home", 1999, "Lamp", "Store"),
+            ])
+            self.assertEqual(tracker.get_summary(), (5, 3648))
+            self.assertEqual(tracker.get_summary(start="2024-01-01", end="2024-02-01"), (2, 131))
+            self.assertEqual(tracker.get_expense_trends(), [("2023-12", 1250), ("2024-01", 131), ("2024-02", 268), ("2024-03", 1999)])
+            self.assertEqual(tracker.check_summaries(), [])
+            self.assertEqual(tracker.add_expense("2024-03-03", "Home", "5", "Bulb", "Store"), 7)
+
+        with ExpenseTracker(self.database) as tracker:
+            self.assertEqual(tracker.cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'my_expenses'").fetchone()[0], 7)
+            self.assertEqual(len(tracker.search("ticket")), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from expense_tracker.core import ExpenseTracker
+
+# Query plans of the filters and pages the list view runs. A filter has to search
+# an index rather than scan my_expenses, and a page has to come out of an index
+# in order, without sorting the matched rows in a temp B-tree.
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+        for day in range(1, 29):
+            self.tracker.add_expense("2024-03-%02d" % day, "Food", "12.50", "Lunch", "Cafe")
+            self.tracker.add_expense("2024-04-%02d" % day, "Rent", "100", "Flat", "Home")
+        self.statements = []
+        self.tracker.db.set_trace_callback(self.statements.append)
+
+    def tearDown(self):
+        self.tracker.db.set_trace_callback(None)
+        self.tracker.close()
+        self.directory.cleanup()
+
+    # Plan details of the one SELECT on my_expenses that call makes
+    def plan(self, call):
+        self.statements.clear()
+        call()
+        selects = [sql for sql in self.statements if sql.lstrip().upper().startswith("SELECT") and "my_expenses" in sql]
+        self.assertEqual(len(selects), 1, selects)
+        return [row[3] for row in self.tracker.db.execute("EXPLAIN QUERY PLAN " + selects[0])]
+
+    def assertSearches(self, plan, index):
+        self.assertTrue(any(detail.startswith("SEARCH my_expenses USING") and index in detail for detail in plan), plan)
+        self.assertFalse(any(detail.startswith("SCAN my_expenses") for detail in plan), plan)
+
+    def assertNoSort(self, plan):
+        self.assertFalse(any("USE TEMP B-TREE" in detail for detail in plan), plan)
+
+    def test_category_and_location_filter(self):
+        plan = self.plan(lambda: self.tracker.get_expenses_by_category_and_location("Food", "Cafe"))
+        self.assertSearches(plan, "idx_my_expenses_category_location_day")
+
+    def test_category_filter(self):
+        self.assertSearches(self.plan(lambda: self.tracker.get_expenses_by_category("Food")), "idx_my_expenses_category_location_day")
+
+    def test_location_filter(self):
+        self.assertSearches(self.plan(lambda: self.tracker.get_expenses_by_location("Cafe")), "idx_my_expenses_location_day")
+
+    def test_date_range_filter(self):
+        self.assertSearches(self.plan(lambda: self.tracker.get_expenses_between("2024-03-01", "2024-03-15")), "idx_my_expenses_day")
+        self.assertSearches(self.plan(lambda: self.tracker.get_expenses_by_date("2024-03-05")), "idx_my_expenses_day")
+
+    def test_month_filter(self):
+        self.assertSearches(self.plan(lambda: self.tracker.get_expenses_by_month("03", "2024")), "idx_my_expenses_day")
+
+    def test_filtered_query(self):
+        plan = self.plan(lambda: self.tracker.query(category="Food", location="Cafe", start="2024-03-01", end="2024-04-01", with_total=False))
+        self.assertSearches(plan, "idx_my_expenses_category_location_day")
+
+    def test_date_pages(self):
+        for order_by in ("date", "-date"):
+            for filters in ({}, {"start": "2024-03-01", "end": "2024-04-01"}):
+                first = self.tracker.query_page(order_by=order_by, limit=10, **filters)
+                for page in (
+                    lambda: self.tracker.query_page(order_by=order_by, limit=10, **filters),
+                    lambda: self.tracker.query_page(order_by=order_by, limit=10, after=(first[-1][1], first[-1][0]), **filters),
+                    lambda: self.tracker.query_page(order_by=order_by, limit=10, before=(first[-1][1], first[-1][0]), **filters),
+                    lambda: self.tracker.query_page(order_by=order_by, limit=10, last=True, **filters),
+                ):
+                    plan = self.plan(page)
+                    self.assertNoSort(plan)
+                    self.assertTrue(any("idx_my_expenses_day" in detail for detail in plan), plan)
+                    if filters:
+                        self.assertSearches(plan, "idx_my_expenses_day")
+
+    def test_id_and_amount_pages(self):
+        for order_by in ("id", "-id", "amount", "-amount"):
+            first = self.tracker.query_page(order_by=order_by, limit=10)
+            key = (first[-1][3], first[-1][0])
+            self.assertNoSort(self.plan(lambda: self.tracker.query_page(order_by=order_by, limit=10)))
+            self.assertNoSort(self.plan(lambda: self.tracker.query_page(order_by=order_by, limit=10, after=key)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from expense_tracker.core import ExpenseTracker
+
+# Writing out recurring expenses as they fall due
+class RecurringTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+        self.statements = []
+        self.tracker.db.set_trace_callback(self.statements.append)
+
+    def tearDown(self):
+        self.tracker.db.set_trace_callback(None)
+        self.tracker.close()
+        self.directory.cleanup()
+
+    def writes(self):
+        return [sql for sql in self.statements if not sql.lstrip().upper().startswith("SELECT")]
+
+    def test_nothing_due_takes_no_write_lock(self):
+        self.assertEqual(self.tracker.materialize_recurring("2024-06-30"), 0)
+        self.tracker.add_recurring("2024-07-31", "monthly", "Rent", "1200", "Flat rent", "Home")
+        self.statements.clear()
+        self.assertEqual(self.tracker.materialize_recurring("2024-06-30"), 0)
+        self.assertEqual(self.writes(), [])
+
+    def test_due_expenses_are_written_once(self):
+        self.tracker.add_recurring("2024-01-31", "monthly", "Rent", "1200", "Flat rent", "Home")
+        self.assertEqual(self.tracker.materialize_recurring("2024-04-30"), 4)
+        self.assertEqual(self.tracker.materialize_recurring("2024-04-30"), 0)
+        days = [row[1] for row in self.tracker.search("flat")]
+        self.assertEqual(len(days), 4)
+        self.assertEqual(self.tracker.get_summary(category="Rent"), (4, 480000))
+        self.assertEqual(self.tracker.check_summaries(), [])
+
+if __name__ == "__main__":
+    unittest.main()
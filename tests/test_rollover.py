@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from expense_tracker.benchmarks import generate_ledger
+from expense_tracker.core import ExpenseTracker
+
+# Closing past years into read-only archives
+class RolloverTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+        # Three years of expenses, 2020 to 2022
+        self.tracker.import_expenses(generate_ledger(3000, 5))
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    # What the lists, totals, reports and search show of the ledger
+    def results(self):
+        tracker = self.tracker
+        filters = [{}, {"category": "Category 3"}, {"location": "Location 2", "start": "2020-06-01", "end": "2022-02-01"}, {"text": "coffee"}]
+        return [
+            [
+                tracker.query(order_by="id", **where),
+                tracker.query(order_by="-amount", limit=20, offset=5, **where),
+                tracker.query_page(order_by="date", limit=30, **where),
+                tracker.query_page(order_by="date", limit=30, last=True, **where),
+                tracker.get_summary(**where),
+                tracker.aggregate("month", ("sum", "count", "min", "max"), **where),
+                tracker.aggregate("category", ("sum", "avg"), **where),
+            ]
+            for where in filters
+        ] + [
+            tracker.get_expense_trends(),
+            sorted(tracker.search("lunch", limit=5000)),
+            sorted(tracker.get_expenses_by_month("03")),
+        ]
+
+    def test_results_are_unchanged(self):
+        before = self.results()
+        self.assertEqual([year for year, _ in self.tracker.rollover(2021)], [2020, 2021])
+        self.assertEqual(self.results(), before)
+        self.assertEqual(self.tracker.check_summaries(), [])
+        self.assertEqual(self.tracker.rollover(2021), [])
+        self.assertEqual(self.results(), before)
+
+    def test_archived_expenses_are_read_only(self):
+        archived = self.tracker.query(end="2021-01-01", order_by="id", limit=1, with_total=False)[0][0][0]
+        open_id = self.tracker.query(start="2022-01-01", order_by="id", limit=1, with_total=False)[0][0][0]
+        self.tracker.rollover(2021)
+        before = self.results()
+        with self.assertRaises(ValueError):
+            self.tracker.edit_expense(archived, "2022-03-05", "Food", "1", "Lunch", "Cafe")
+        with self.assertRaises(ValueError):
+            self.tracker.edit_expenses([open_id, archived], category="Food")
+        with self.assertRaises(ValueError):
+            self.tracker.remove_expense(archived)
+        with self.assertRaises(ValueError):
+            self.tracker.add_expense("2021-12-31", "Food", "1", "Lunch", "Cafe")
+        with self.assertRaises(ValueError):
+            self.tracker.edit_expense(open_id, "2021-12-31", "Food", "1", "Lunch", "Cafe")
+        with self.assertRaises(sqlite3.DatabaseError):
+            with self.tracker.write():
+                self.tracker.cursor.execute("UPDATE archive_2020 SET cents = 1 WHERE id = ?", (archived,))
+        self.assertEqual(self.results(), before)
+
+    def test_undo_stops_at_a_closed_year(self):
+        expense_id = self.tracker.add_expense("2021-05-01", "Food", "1", "Lunch", "Cafe")
+        self.tracker.rollover(2021)
+        with self.assertRaises(ValueError):
+            self.tracker.undo()
+        self.assertEqual(self.tracker.get_expense_by_id(expense_id)[3], 100)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from expense_tracker.core import ExpenseTracker, matches_search
+
+# Full-text search over descriptions and the filters that take search text
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+        self.tracker.add_expense("2024-03-05", "Food", "12.50", "Lunch with Ana", "Cafe")
+        self.tracker.add_expense("2024-03-06", "Food", "30", "Dinner", "Bistro")
+        self.tracker.add_expense("2024-03-07", "Travel", "4", "Bus to lunch", "Town")
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    def test_filters_keep_their_positions(self):
+        rows, total = self.tracker.query("Food", None, None, None, "-amount")
+        self.assertEqual([row[3] for row in rows], [3000, 1250])
+        self.assertEqual(total, 4250)
+        self.assertEqual([row[3] for row in self.tracker.query_page("Food", None, None, None, "-amount")], [3000, 1250])
+        self.assertEqual(self.tracker.get_summary("Food", None, "2024-03-01", "2024-03-06"), (1, 1250))
+        self.assertEqual(self.tracker.aggregate("category", ("sum",), None, "Cafe"), [("Food", 1250)])
+        self.assertEqual(self.tracker.get_summary(text="lunch"), (2, 1650))
+        self.assertEqual([row[3] for row in self.tracker.query("Food", text="lunch")[0]], [1250])
+
+    # Ids of the expenses search finds, and of those the filters find with the text
+    def hits(self, text):
+        found = sorted(row[0] for row in self.tracker.search(text))
+        self.assertEqual(sorted(row[0] for row in self.tracker.query(text=text, with_total=False)[0]), found)
+        return found
+
+    def test_index_follows_edits_removals_and_undo(self):
+        coffee = self.tracker.add_expense("2024-03-08", "Food", "3", "Morning coffee", "Cafe")
+        self.assertEqual(self.hits("coff"), [coffee])
+        self.tracker.edit_expense(coffee, "2024-03-08", "Food", "3", "Morning tea", "Cafe")
+        self.assertEqual(self.hits("coff"), [])
+        self.assertEqual(self.hits("tea"), [coffee])
+        self.tracker.remove_expense(coffee)
+        self.assertEqual(self.hits("tea"), [])
+        self.tracker.undo()
+        self.assertEqual(self.hits("tea morn"), [coffee])
+        self.tracker.undo()
+        self.assertEqual(self.hits("tea"), [])
+        self.assertEqual(self.hits("coffee"), [coffee])
+        self.tracker.redo()
+        self.assertEqual(self.hits("coffee"), [])
+        self.assertEqual(self.hits("lunch"), [1, 3])
+
+    def test_python_matching_agrees_with_the_index(self):
+        descriptions = ["Café crème", "Crème brûlée at Zoë's", "naïve ÅNGSTRÖM_test", "Straße 5b", "Lunch with Ana"]
+        ids = {self.tracker.add_expense("2024-04-01", "Food", "1", description, "Cafe"): description for description in descriptions}
+        for text in ["cafe", "CAFÉ", "creme", "brûl", "zoe", "zoë s", "naive", "angstrom", "test", "strasse", "straße", "5b", "lunch ana", "ana lunch x"]:
+            with self.subTest(text=text):
+                expected = [expense_id for expense_id, description in sorted(ids.items()) if matches_search(text, description)]
+                self.assertEqual([expense_id for expense_id in self.hits(text) if expense_id in ids], expected)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from expense_tracker.core import ExpenseTracker
+from expense_tracker.values import to_day
+
+# Statement figures, and the snapshots kept of those of closed years
+class StatementTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = ExpenseTracker(os.path.join(self.directory.name, "expenses.db"))
+        self.tracker.import_rates([(2, {"date": "2020-01-01", "currency": "EUR", "rate": "1"})])
+        self.tracker.add_expense("2021-03-10", "Home", "100", "Chair", "Store")
+        self.tracker.add_expense("2021-08-10", "Food", "10", "Lunch", "Paris", "EUR")
+        self.tracker.add_expense("2022-02-01", "Food", "5", "Tea", "Cafe")
+        self.tracker.rollover(2021)
+
+    def tearDown(self):
+        self.tracker.close()
+        self.directory.cleanup()
+
+    # {(kind, currency, period): figures} of the stored snapshots
+    def snapshots(self):
+        rows = self.tracker.cursor.execute("SELECT kind, currency, period, figures FROM report_snapshots").fetchall()
+        return {(kind, currency, period): json.loads(figures) for kind, currency, period, figures in rows}
+
+    # (period, count, total) of each period
+    def totals(self, kind, currency=None):
+        return [(period, count, total) for period, _, _, count, total, _, _ in self.tracker.period_figures(kind, currency=currency)]
+
+    def test_closed_periods_are_read_from_snapshots(self):
+        figures = self.tracker.period_figures("quarter")
+        self.assertEqual([(period, count, total) for period, _, _, count, total, _, _ in figures], [
+            ("2021-Q1", 1, 10000), ("2021-Q2", 0, 0), ("2021-Q3", 1, 1000), ("2021-Q4", 0, 0), ("2022-Q1", 1, 500),
+        ])
+        self.assertEqual(sorted(self.snapshots()), [("quarter", "USD", "2021-Q%d" % quarter) for quarter in range(1, 5)])
+
+        # Only the open year is worked out again
+        with mock.patch.object(self.tracker, "compute_period_figures", wraps=self.tracker.compute_period_figures) as compute:
+            self.assertEqual(self.tracker.period_figures("quarter"), figures)
+        self.assertEqual([call.args[1] for call in compute.call_args_list], [to_day("2022-01-01")])
+
+        # A stored snapshot is what is reported
+        with self.tracker.write():
+            self.tracker.cursor.execute("DELETE FROM report_snapshots WHERE period = '2021-Q1'")
+            self.tracker.cursor.execute(
+                "INSERT INTO report_snapshots (kind, currency, period, end_day, figures) VALUES ('quarter', 'USD', '2021-Q1', ?, ?)",
+                (to_day("2021-04-01"), json.dumps([7, 700, [], []])),
+            )
+        self.assertEqual(self.totals("quarter")[0], ("2021-Q1", 7, 700))
+
+    def test_snapshots_cannot_be_changed(self):
+        self.tracker.period_figures("year")
+        with self.assertRaises(sqlite3.DatabaseError):
+            with self.tracker.write():
+                self.tracker.cursor.execute("UPDATE report_snapshots SET figures = '[0, 0, [], []]'")
+        self.assertEqual(self.totals("year"), [("2021", 2, 11000), ("2022", 1, 500)])
+
+    def test_rate_import_drops_converted_snapshots(self):
+        self.assertEqual(self.totals("year", "EUR"), [("2021", 2, 11000), ("2022", 1, 500)])
+        self.assertEqual(self.totals("year"), [("2021", 2, 11000), ("2022", 1, 500)])
+        self.assertEqual(sorted(self.snapshots()), [("year", "EUR", "2021"), ("year", "USD", "2021")])
+
+        self.tracker.import_rates([(2, {"date": "2021-06-01", "currency": "EUR", "rate": "2"})])
+        self.assertEqual(sorted(self.snapshots()), [("year", "USD", "2021")])
+        # Closed years keep their ledger amounts; only the conversion changes
+        self.assertEqual(self.totals("year"), [("2021", 2, 11000), ("2022", 1, 500)])
+        self.assertEqual(self.totals("year", "EUR"), [("2021", 2, 10500), ("2022", 1, 250)])
+        self.assertEqual(self.snapshots()[("year", "EUR", "2021")][:2], [2, 10500])
+
+if __name__ == "__main__":
+    unittest.main()